@@ -1,19 +1,31 @@
 #!/usr/bin/env python3
 import eventlet
+# before anything else is imported: the threading locks, time.sleep and sockets used by the caches, the rate
+# limiter, the circuit breaker and the upstream client become green, waiting on them only parks the greenlet
 eventlet.monkey_patch()
 
 
-from flask import Flask, request, render_template
+from flask import Flask, Response, request, session, render_template, send_from_directory, jsonify, stream_with_context
 from logging.config import dictConfig
-from src.models.extensions import db  # Import the db object
+from src.models.extensions import db, DEFAULT_DATABASE_URI, engine_options, sqlite_pragmas, configure_sqlite
+from src.models.migrations import upgrade
 from src.models.model import Word
-from src.util.api import process_request
+from src.util.api import search_word, search_many, reverse_search, related_words, WordNotFound, dump_payload
+from src.util.upstream import client as upstream
+from src.util.cache import word_cache, not_found_cache
+from src.util.snapshot import word_snapshot
+from src.util.suggest import suggest_index
+from src.util.fuzzy import spell_index
+from src.util.responses import cacheable_response
+from src.util.wire import FORMATS, FULL, encode_payload, observe_size
+from src.util.instrumentation import observed, greenlet_sampler
+from src.util.profiler import request_profiler
 from prometheus_flask_exporter.multiprocess import GunicornPrometheusMetrics
 from prometheus_client import generate_latest
 from flask_socketio import SocketIO, emit
-from google import genai
-from io import BytesIO
-import base64
+from src.util.images import image_generator, image_store
+from src.cli import register_commands
+import hmac
 import os
 
 
@@ -21,15 +33,29 @@ app = Flask(__name__)
 
 app.config.from_prefixed_env("FLASK")
 
-API_KEY = app.config.get("API_KEY")
+upstream.init_app(app)
+word_cache.init_app(app)
+not_found_cache.init_app(app)
+word_snapshot.init_app(app)
+suggest_index.init_app(app)
+spell_index.init_app(app)
+image_store.init_app(app)
+image_generator.init_app(app)
+greenlet_sampler.init_app(app)
+request_profiler.init_app(app)
+register_commands(app)
 
 metrics = GunicornPrometheusMetrics(app)
 
 async_mode = None
+# websocket messages are compressed with permessage-deflate whenever the client offers it (eventlet negotiates it),
+# long-polling responses are compressed from SOCKETIO_COMPRESSION_THRESHOLD bytes
 socketio = SocketIO(
     app,
     cors_allowed_origins="*",
     async_mode=async_mode,
+    http_compression=True,
+    compression_threshold=int(app.config.get("SOCKETIO_COMPRESSION_THRESHOLD", 1024)),
 )
 
 dictConfig(
@@ -56,10 +82,18 @@ dictConfig(
     }
 )
 
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///project.db"  # Example URI
+# FLASK_SQLALCHEMY_DATABASE_URI overrides the default database
+app.config.setdefault("SQLALCHEMY_DATABASE_URI", DEFAULT_DATABASE_URI)
+app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config))
 db.init_app(app)  # Initialize db with the Flask app
 with app.app_context():  # Create tables within the app context
+    configure_sqlite(db.engine, sqlite_pragmas(app.config))
     db.create_all()
+    upgrade(db.engine)  # Add columns introduced after the tables were first created
+    stored_words = db.session.execute(db.select(Word.word)).scalars().all()
+    suggest_index.load(stored_words)
+    spell_index.load(stored_words)
+    del stored_words
 
 
 @app.route("/")
@@ -67,43 +101,181 @@ def main():
     return render_template("index.html", sync_mode=socketio.async_mode)
 
 
+@socketio.on("connect", namespace="/test")
+@observed("connect")
+def connect_callback(auth=None):
+    # the wire format of the word payloads is chosen once per connection, io('/test', {auth: {format: 'compact'}})
+    wire_format = (auth or {}).get("format", FULL)
+    session["wire_format"] = wire_format if wire_format in FORMATS else FULL
+
+
+def emit_word(event, data, payload=None):
+    # the payload is encoded in the client's wire format and the size of the response is recorded
+    wire_format = session.get("wire_format", FULL)
+    if payload is not None:
+        data = dict(data, data=encode_payload(payload, wire_format))
+    observe_size(event, wire_format, data, float(app.config.get("SOCKET_COMPRESSION_SAMPLE", 0.05)))
+    emit(event, data)
+
+
 @socketio.on("search", namespace="/test")
+@observed("search")
 def fetch_word_callback(data):
+    input_word = data.get("wordInput")
     try:
-        input_word = data.get("wordInput")
-        word = process_request(input_word)
-        emit("text_response", {"data": word.to_dict()})
-    except Exception as e:
-        app.logger.error(msg=e)
+        payload = search_word(input_word)
+    except WordNotFound as e:
+        # misspellings and gibberish never cost an image model call
+        emit("did_you_mean", {"word": e.word, "suggestions": e.suggestions})
+        return
+    # queued before the text response is sent so the image is generated while the client renders it
+    fetch_image_for_word(payload["word"], request.sid, data)
+    emit_word("text_response", {}, payload)
 
 
-@socketio.on("search", namespace="/test")
-def fetch_image_for_word(data):
+def fetch_image_for_word(input_word, sid, data):
+    # the image may be emitted from a background worker, outside of the request context
+    def emit_image(name):
+        socketio.emit('image_data', f"/images/{name}", to=sid, namespace="/test")
+
     try:
-        # fetch image and emit
-        input_word = data.get("wordInput")
-        prompt = (
-            f"As a teacher, create a picture that can teach a stundent to learn the english word {input_word} such that they will never forget"
-        )
-
-        if API_KEY:
-            client = genai.Client(api_key=API_KEY)
-            response = client.models.generate_content(
-                model="gemini-2.5-flash-image",
-                contents=[prompt],
-            )
-            for part in response.candidates[0].content.parts:
-                if part.inline_data is not None:
-                    bytes_io_object = BytesIO(part.inline_data.data)
-                    binary_data = bytes_io_object.getvalue()
-                    encoded_bytes = base64.b64encode(binary_data)
-                    base64_image = encoded_bytes.decode('utf-8')
-                    emit('image_data', 'data:image/png;base64,' + base64_image)
-                    break
+        variant, fmt = image_generator.choose(data.get("imageSize"), data.get("imageFormats"))
+        image_generator.submit(input_word, emit_image, variant, fmt)
     except Exception as e:
         app.logger.error(e)
 
 
+def batch_item(word, payload, suggestions):
+    if payload is None:
+        return {"word": word, "found": False, "suggestions": suggestions}
+    return {"word": word, "found": True, "data": payload}
+
+
+@socketio.on("search_many", namespace="/test")
+@observed("search_many")
+def search_many_callback(data):
+    try:
+        count = 0
+        words = data.get("words", []) if isinstance(data, dict) else None
+        for word, payload, suggestions in search_many(words):
+            item = batch_item(word, payload, suggestions)
+            emit_word("search_many_response", item, item.pop("data", None))
+            count += 1
+        emit("search_many_done", {"count": count})
+    except ValueError as e:
+        emit("search_many_done", {"count": 0, "error": str(e)})
+
+
+@app.route("/words", methods=["GET", "POST"])
+def words_route():
+    # GET /words?w=cat&w=dog or ?words=cat,dog, POST {"words": ["cat", "dog"]}
+    if request.method == "POST":
+        body = request.get_json(silent=True) or {}
+        # anything but {"words": [...]} is refused by search_many
+        words = body.get("words", []) if isinstance(body, dict) else None
+    else:
+        words = request.args.getlist("w") + [w for value in request.args.getlist("words") for w in value.split(",")]
+    try:
+        # the input and the limit are checked before the first result, so they are reported as an error
+        # instead of a broken stream
+        results = search_many(words)
+        first = next(results, None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def stream():
+        # one JSON object per line, written as soon as the word is resolved
+        if first is not None:
+            yield dump_payload(batch_item(*first)) + "\n"
+        for item in results:
+            yield dump_payload(batch_item(*item)) + "\n"
+
+    return Response(stream_with_context(stream()), mimetype="application/x-ndjson")
+
+
+@socketio.on("suggest", namespace="/test")
+@observed("suggest")
+def suggest_callback(data):
+    emit("suggestions", {"prefix": data.get("prefix", ""), "data": suggest_index.suggest(data.get("prefix", ""), data.get("limit"))})
+
+
+@socketio.on("reverse_search", namespace="/test")
+@observed("reverse_search")
+def reverse_search_callback(data):
+    emit("reverse_search_response", {
+        "data": reverse_search(data.get("query", ""), data.get("page", 1), data.get("perPage", 10))
+    })
+
+
+@app.route("/api/words/<word>", methods=["GET"])
+def word_route(word):
+    try:
+        payload = search_word(word)
+    except WordNotFound as e:
+        response = jsonify({"error": str(e), "word": e.word, "suggestions": e.suggestions})
+        response.status_code = 404
+        return response
+    body = dump_payload(payload).encode("utf-8")
+    return cacheable_response(body, "application/json", int(app.config.get("API_WORD_MAX_AGE", 300)))
+
+
+@app.route("/reverse-search", methods=["GET"])
+def reverse_search_route():
+    return jsonify(reverse_search(
+        request.args.get("q", ""),
+        request.args.get("page", 1, type=int),
+        request.args.get("per_page", 10, type=int),
+    ))
+
+
+@socketio.on("related", namespace="/test")
+@observed("related")
+def related_callback(data):
+    emit("related_response", {
+        "word": data.get("word", ""),
+        "data": related_words(data.get("word", ""), data.get("hops", 1), data.get("kind", "synonym"), data.get("limit", 20)),
+    })
+
+
+@app.route("/related/<word>", methods=["GET"])
+def related_route(word):
+    return jsonify(related_words(
+        word,
+        request.args.get("hops", 1, type=int),
+        request.args.get("kind", "synonym"),
+        request.args.get("limit", 20, type=int),
+    ))
+
+
+@app.route("/images/<path:name>", methods=["GET"])
+def image(name):
+    # the file name is a content hash, so the file never changes and can be cached for good
+    response = send_from_directory(image_store.directory, name, max_age=31536000, conditional=True, etag=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def admin_allowed():
+    # the admin routes only exist when ADMIN_TOKEN is set, and are called with the header X-Admin-Token
+    token = app.config.get("ADMIN_TOKEN")
+    return bool(token) and hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token)
+
+
+@app.route("/admin/profiles", methods=["GET"])
+def list_profiles():
+    if not admin_allowed():
+        return "Not Found", 404
+    return jsonify({"enabled": request_profiler.enabled, "profiles": request_profiler.list()})
+
+
+@app.route("/admin/profiles/<name>", methods=["GET"])
+def download_profile(name):
+    if not admin_allowed() or not request_profiler.directory:
+        return "Not Found", 404
+    return send_from_directory(request_profiler.directory, name, as_attachment=True, mimetype="application/octet-stream")
+
+
 @app.route("/health", methods=["GET"])
 def health_check():
     return "OK", 200
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the bulk insert path of parse_word against the ORM unit of work path
+Usage: python -m benchmarks.bench_parse_word [words] [meanings] [definitions]
+"""
+from flask import Flask
+from src.models.extensions import db, configure_sqlite, sqlite_pragmas
+from src.util.api import parse_word, parse_word_orm, store_word
+import os
+import sys
+import tempfile
+import time
+
+
+def make_response(i, meanings, definitions):
+    return [{
+        "word": f"word{i}",
+        "phonetic": f"/w{i}/",
+        "phonetics": [{"text": f"/w{i}/", "audio": f"https://example.com/{i}.mp3"}, {"text": f"/w{i % 50}ə/"}],
+        "meanings": [{
+            "partOfSpeech": f"pos{m}",
+            "synonyms": [f"syn{m}"],
+            "antonyms": [],
+            "definitions": [{"definition": f"definition {m}.{d} of word{i}", "example": f"an example {d}"}
+                            for d in range(definitions)],
+        } for m in range(meanings)],
+    }]
+
+
+def store_only(response):
+    # the bulk insert without loading the Word object parse_word returns
+    store_word(response)
+    db.session.commit()
+
+
+def run(store, responses):
+    db_fd, db_path = tempfile.mkstemp(suffix=".db")
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+    db.init_app(app)
+    try:
+        with app.app_context():
+            configure_sqlite(db.engine, sqlite_pragmas(app.config))
+            db.create_all()
+            start = time.perf_counter()
+            for response in responses:
+                store(response)
+                db.session.expunge_all()
+            return time.perf_counter() - start
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == "__main__":
+    words, meanings, definitions = (int(arg) for arg in (sys.argv[1:] + ["200", "5", "8"][len(sys.argv) - 1:]))
+    responses = [make_response(i, meanings, definitions) for i in range(words)]
+    print(f"{words} words x {meanings} meanings x {definitions} definitions")
+    results = {name: run(store, responses) for name, store in (("orm", parse_word_orm), ("bulk", parse_word), ("store", store_only))}
+    for name, elapsed in results.items():
+        print(f"{name:>6}: {elapsed:8.3f}s total {elapsed / words * 1000:8.2f}ms/word")
+    print(f"speedup: {results['orm'] / results['bulk']:.2f}x")
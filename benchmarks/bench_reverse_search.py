@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the full-text reverse search against a LIKE scan of the definitions
+Usage: python -m benchmarks.bench_reverse_search [definitions] [queries]
+"""
+from flask import Flask
+from sqlalchemy import insert, text
+from src.models.extensions import db, configure_sqlite, sqlite_pragmas
+from src.models.model import Word, Meaning, Definition
+from src.util.api import reverse_search
+import os
+import random
+import sys
+import tempfile
+import time
+
+
+VOCABULARY = [f"term{i}" for i in range(5000)]
+
+
+def fill(definitions):
+    rng = random.Random(0)
+    words = definitions // 10
+    db.session.execute(insert(Word), [{"id": i + 1, "word": f"word{i}", "phonetic": ""} for i in range(words)])
+    db.session.execute(insert(Meaning), [{"id": i + 1, "partOfSpeech": "noun", "word_id": i + 1} for i in range(words)])
+    db.session.execute(insert(Definition), [{
+        "definition": " ".join(rng.choices(VOCABULARY, k=12)),
+        "example": " ".join(rng.choices(VOCABULARY, k=8)),
+        "meaning_id": i % words + 1,
+    } for i in range(definitions)])
+    db.session.commit()
+
+
+def like_scan(query):
+    # what a reverse search costs without the index
+    terms = query.split()
+    where = " AND ".join(f"(definition LIKE :t{i} OR example LIKE :t{i})" for i in range(len(terms)))
+    return db.session.execute(
+        text(f"SELECT id FROM definition WHERE {where} LIMIT 10"), {f"t{i}": f"%{t}%" for i, t in enumerate(terms)}
+    ).all()
+
+
+def timed(search, queries):
+    start = time.perf_counter()
+    for query in queries:
+        search(query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+if __name__ == "__main__":
+    definitions, queries = (int(arg) for arg in (sys.argv[1:] + ["100000", "200"][len(sys.argv) - 1:]))
+    rng = random.Random(1)
+    sample = [" ".join(rng.sample(VOCABULARY, 2)) for _ in range(queries)]
+    db_fd, db_path = tempfile.mkstemp(suffix=".db")
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+    db.init_app(app)
+    try:
+        with app.app_context():
+            configure_sqlite(db.engine, sqlite_pragmas(app.config))
+            db.create_all()
+            start = time.perf_counter()
+            fill(definitions)
+            print(f"{definitions} definitions stored and indexed in {time.perf_counter() - start:.1f}s")
+            results = {"fts5": timed(reverse_search, sample), "like": timed(like_scan, sample)}
+            for name, elapsed in results.items():
+                print(f"{name:>6}: {elapsed * 1000:8.2f}ms/query")
+            print(f"speedup: {results['like'] / results['fts5']:.1f}x")
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the did you mean index: build time, memory and lookup latency by index size
+compared with computing the edit distance to every stored word
+Usage: python -m benchmarks.bench_spelling [lookups]
+"""
+from src.util.fuzzy import SpellIndex, edit_distance
+import random
+import string
+import sys
+import time
+
+
+def make_words(count):
+    rng = random.Random(0)
+    return ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 12))) for _ in range(count)]
+
+
+def misspell(word, rng):
+    i = rng.randrange(len(word))
+    return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+
+
+def linear_scan(words, word, max_distance=2):
+    return sorted((d, w) for w in words if (d := edit_distance(word, w, max_distance)) <= max_distance)[:5]
+
+
+if __name__ == "__main__":
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = random.Random(1)
+    for max_distance in (1, 2):
+        print(f"max distance {max_distance}")
+        for size in (1000, 10000, 100000):
+            words = make_words(size)
+            queries = [misspell(rng.choice(words), rng) for _ in range(lookups)]
+            index = SpellIndex()
+            index.max_distance = max_distance
+            start = time.perf_counter()
+            index.load(words)
+            built = time.perf_counter() - start
+            start = time.perf_counter()
+            for query in queries:
+                index.lookup(query)
+            indexed = (time.perf_counter() - start) / lookups
+            scanned = queries[:max(lookups // 20, 1)]
+            start = time.perf_counter()
+            for query in scanned:
+                linear_scan(words, query, max_distance)
+            scan = (time.perf_counter() - start) / len(scanned)
+            print(f"{size:>7} words: built in {built:5.2f}s, {index.memory_bytes / 2 ** 20:6.1f}MiB, "
+                  f"lookup {indexed * 1000:6.3f}ms, linear scan {scan * 1000:8.2f}ms")
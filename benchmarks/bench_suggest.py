@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the prefix index used for autocompletion: memory per word and latency of a lookup
+Usage: python -m benchmarks.bench_suggest [words] [lookups]
+"""
+from src.util.suggest import PrefixIndex
+import random
+import string
+import sys
+import time
+
+
+def make_words(count):
+    rng = random.Random(0)
+    return [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 12))) + ("" if rng.random() < 0.9 else "-X")
+        for _ in range(count)
+    ]
+
+
+if __name__ == "__main__":
+    words, lookups = (int(arg) for arg in (sys.argv[1:] + ["100000", "100000"][len(sys.argv) - 1:]))
+    index = PrefixIndex()
+    sample = make_words(words)
+    start = time.perf_counter()
+    index.load(sample)
+    print(f"{len(index)} words loaded in {(time.perf_counter() - start) * 1000:.0f}ms, "
+          f"{index.memory_bytes / 2 ** 20:.1f}MiB ({index.memory_bytes / len(index):.0f} bytes/word)")
+
+    rng = random.Random(1)
+    prefixes = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(1, 3))) for _ in range(lookups)]
+    start = time.perf_counter()
+    for prefix in prefixes:
+        index.suggest(prefix, 10)
+    print(f"suggest: {(time.perf_counter() - start) / lookups * 1e6:.2f}us/lookup")
+
+    start = time.perf_counter()
+    for word in make_words(1000):
+        index.add(word + "z")
+    print(f"    add: {(time.perf_counter() - start) / 1000 * 1e6:.2f}us/word")
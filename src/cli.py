@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+from flask import Flask
+from flask.cli import with_appcontext
+from sqlalchemy import select
+from src.models.extensions import db
+from src.models.fulltext import create_fulltext, has_fulltext, rebuild_fulltext
+from src.models.model import Word
+from src.util.api import fetch_word, store_word, store_many, normalize_word, get_word_payload, dump_payload, with_related
+from src.util.api import UPSERT_DIALECTS
+from src.util.cache import word_cache
+from src.util.ratelimit import TokenBucket
+from src.util.snapshot import write_snapshot
+from src.util.upstream import client as upstream
+from typing import List, Optional
+import click
+import eventlet
+import gzip
+import json
+import os
+import time
+import logging
+
+
+logger = logging.getLogger("root")
+
+
+'''
+helper function to read a word list, one word per line, blank lines and lines starting with # are skipped
+@param path: the path to the word list
+@return: the normalized words without duplicates, in file order
+'''
+def read_word_list(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        words = (normalize_word(line) for line in f if line.strip() and not line.lstrip().startswith("#"))
+        return list(dict.fromkeys(words))
+
+
+'''
+helper function to stop a bulk command before its first write on a database store_word cannot write to,
+the words would otherwise all fail one by one
+@return: None
+'''
+def require_upsert():
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in UPSERT_DIALECTS:
+        raise click.ClickException(f"Bulk loading needs INSERT ... ON CONFLICT, which the {dialect} database does not support")
+
+
+'''
+helper functions to read and atomically write the checkpoint of a prewarm run
+the checkpoint records how many words of the list are done, so a crashed run resumes after them,
+the words the API could not be reached for (failed, retried by the next run) and the words it
+answered with a malformed response (listed only, asking again gives the same answer)
+'''
+def load_checkpoint(path: str, word_list: str) -> dict:
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("word_list") == os.path.abspath(word_list):
+            checkpoint.setdefault("malformed", [])
+            return checkpoint
+    return {"word_list": os.path.abspath(word_list), "position": 0, "failed": [], "malformed": []}
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+'''
+prewarm the database from a word list before a node takes traffic
+words already stored are skipped, the others are fetched concurrently by a bounded green pool and every
+batch is stored in one transaction before the checkpoint moves on; --rate replaces the UPSTREAM_RATE limit
+of the dictionary API client for the run, a node serving traffic from the same address shares the quota
+the words that failed in a previous run are retried first
+'''
+@click.command("prewarm")
+@click.argument("word_list", type=click.Path(exists=True, dir_okay=False))
+@click.option("--concurrency", default=10, show_default=True, help="Upstream requests in flight.")
+@click.option("--rate", default=5.0, show_default=True, help="Upstream requests per second, 0 for no limit.")
+@click.option("--batch-size", default=100, show_default=True, help="Words stored per transaction.")
+@click.option("--checkpoint", "checkpoint_path", default=None, help="Checkpoint file, defaults to <word list>.checkpoint.")
+@with_appcontext
+def prewarm_command(word_list: str, concurrency: int, rate: float, batch_size: int, checkpoint_path: Optional[str]):
+    require_upsert()
+    checkpoint_path = checkpoint_path or f"{word_list}.checkpoint"
+    words = read_word_list(word_list)
+    checkpoint = load_checkpoint(checkpoint_path, word_list)
+    retry = checkpoint["failed"]
+    checkpoint["failed"] = []
+    if checkpoint["position"] or retry:
+        click.echo(f"Resuming after {checkpoint['position']} of {len(words)} words, retrying {len(retry)} failed words")
+
+    pool = eventlet.GreenPool(concurrency)
+    totals = {"stored": 0, "skipped": 0, "missing": 0, "failed": 0, "malformed": 0}
+    start = time.perf_counter()
+
+    def fetch(word):
+        try:
+            return word, fetch_word(word), None
+        except Exception as e:
+            return word, None, e
+
+    def store_batch(batch):
+        stored = set(db.session.execute(select(Word.word).where(Word.word.in_(batch))).scalars())
+        totals["skipped"] += len(stored)
+
+        found = []
+        for word, response, error in pool.imap(fetch, [w for w in batch if w not in stored]):
+            if error is not None:
+                logger.warning(f"Failed to fetch {word}: {error}")
+                checkpoint["failed"].append(word)
+                totals["failed"] += 1
+            elif not response:
+                totals["missing"] += 1
+            else:
+                found.append((word, response))
+
+        # written once every fetch of the batch is done, a node serving traffic from the same database
+        # would otherwise wait on the lock for as long as the fetches take
+        headwords = store_many(found)
+        for word, _ in found:
+            if word not in headwords:
+                checkpoint["malformed"].append(word)
+                totals["malformed"] += 1
+        totals["stored"] += len(headwords)
+
+    def report(progress: str):
+        click.echo(f"{progress} " + " ".join(f"{key}={value}" for key, value in totals.items())
+                   + f" ({time.perf_counter() - start:.1f}s)")
+
+    limiter = upstream.limiter
+    upstream.limiter = TokenBucket(rate=rate, burst=concurrency)
+    try:
+        for offset in range(0, len(retry), batch_size):
+            store_batch(retry[offset:offset + batch_size])
+            # the words not retried yet stay in the checkpoint in case this run is interrupted too
+            save_checkpoint(checkpoint_path, dict(checkpoint, failed=checkpoint["failed"] + retry[offset + batch_size:]))
+            report(f"{min(offset + batch_size, len(retry))}/{len(retry)} retried words")
+
+        while checkpoint["position"] < len(words):
+            batch = words[checkpoint["position"]:checkpoint["position"] + batch_size]
+            store_batch(batch)
+            checkpoint["position"] += len(batch)
+            save_checkpoint(checkpoint_path, checkpoint)
+            report(f"{checkpoint['position']}/{len(words)} words")
+    finally:
+        upstream.limiter = limiter
+
+    if checkpoint["malformed"]:
+        click.echo(f"{len(checkpoint['malformed'])} words had a malformed response: {', '.join(checkpoint['malformed'])}")
+    if checkpoint["failed"]:
+        click.echo(f"{len(checkpoint['failed'])} words failed, run the command again to retry them ({checkpoint_path})")
+    else:
+        os.remove(checkpoint_path)
+    click.echo("Prewarm done")
+
+
+'''
+helper function to open a dictionary dump for streaming, gzip compressed dumps are detected by their magic bytes
+@param path: the path to the dump
+@return: a text file object to iterate line by line
+'''
+def open_dump(path: str):
+    with open(path, "rb") as f:
+        compressed = f.read(2) == b"\x1f\x8b"
+    if compressed:
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+'''
+import a local dictionary dump so the app can run without the dictionary API (OFFLINE_MODE)
+the dump is JSONL, optionally gzip compressed, one word per line in the shape parse_word consumes
+(the API response list, or a single entry object); it is streamed line by line so memory stays
+constant and stored in batched transactions, words already stored are left untouched
+'''
+@click.command("import-dump")
+@click.argument("dump", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", default=500, show_default=True, help="Words stored per transaction.")
+@click.option("--progress-every", default=10000, show_default=True, help="Lines between progress reports.")
+@with_appcontext
+def import_dump_command(dump: str, batch_size: int, progress_every: int):
+    require_upsert()
+    totals = {"stored": 0, "skipped": 0, "malformed": 0, "invalid": 0}
+    start = time.perf_counter()
+    line_number = 0
+
+    def report():
+        elapsed = time.perf_counter() - start
+        click.echo(f"{line_number} lines " + " ".join(f"{key}={value}" for key, value in totals.items())
+                   + f" ({elapsed:.1f}s, {line_number / elapsed if elapsed else 0:.0f} lines/s)")
+
+    with open_dump(dump) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                response = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Skipping malformed line {line_number} of {dump}: {e}")
+                totals["malformed"] += 1
+            else:
+                if isinstance(response, dict):
+                    response = [response]
+                try:
+                    _, created = store_word(response)
+                    totals["stored" if created else "skipped"] += 1
+                except (KeyError, IndexError, TypeError) as e:
+                    # nothing of the entry was written, the lines before it stay in the batch
+                    logger.warning(f"Skipping line {line_number} of {dump}, not a dictionary entry: {e!r}")
+                    totals["invalid"] += 1
+            if line_number % batch_size == 0:
+                db.session.commit()
+                db.session.expunge_all()
+            if line_number % progress_every == 0:
+                report()
+    db.session.commit()
+    # cheaper than invalidating each imported word, the cache only holds what was served before the import
+    word_cache.clear()
+    report()
+    click.echo("Import done")
+
+
+'''
+export every stored word to a read-only snapshot that read-heavy nodes memory-map (WORD_SNAPSHOT)
+payloads are read in pages of stored words and rebuilt for the words stored before payloads were cached
+'''
+@click.command("export-snapshot")
+@click.argument("path", type=click.Path(dir_okay=False, writable=True))
+@click.option("--page-size", default=1000, show_default=True, help="Words read per query.")
+@with_appcontext
+def export_snapshot_command(path: str, page_size: int):
+    start = time.perf_counter()
+
+    def payloads():
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                select(Word.id, Word.word, Word.payload).where(Word.id > last_id).order_by(Word.id).limit(page_size)
+            ).all()
+            if not rows:
+                return
+            for row in rows:
+                payload = json.loads(row.payload) if row.payload else get_word_payload(row.word)
+                # the snapshot is served as is, the related words search_word adds are included at export
+                yield row.word, dump_payload(with_related(payload)).encode("utf-8")
+            last_id = rows[-1].id
+            # ends the read transaction of the page, with the payloads get_word_payload rebuilt
+            db.session.commit()
+            db.session.expunge_all()
+
+    count = write_snapshot(path, payloads())
+    click.echo(f"Exported {count} words to {path} ({time.perf_counter() - start:.1f}s)")
+
+
+'''
+rebuild the full-text index of the definitions used by the reverse search, e.g. after restoring a backup
+the triggers keep it in sync otherwise, the index is created first on databases that do not have it yet
+'''
+@click.command("rebuild-fulltext")
+@with_appcontext
+def rebuild_fulltext_command():
+    start = time.perf_counter()
+    with db.engine.begin() as connection:
+        create_fulltext(connection)
+        if not has_fulltext(connection):
+            raise click.ClickException("The database does not support the full-text index (sqlite with FTS5)")
+        rebuild_fulltext(connection)
+    click.echo(f"Full-text index rebuilt ({time.perf_counter() - start:.1f}s)")
+
+
+'''
+helper function to register the CLI commands on the app, e.g. `flask --app app prewarm words.txt`
+@param app: the Flask app
+@return: None
+'''
+def register_commands(app: Flask):
+    app.cli.add_command(prewarm_command)
+    app.cli.add_command(import_dump_command)
+    app.cli.add_command(export_snapshot_command)
+    app.cli.add_command(rebuild_fulltext_command)
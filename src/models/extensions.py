@@ -1,5 +1,6 @@
 # extensions.py
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from sqlalchemy.orm import DeclarativeBase, MappedAsDataclass
 
 
@@ -8,3 +9,59 @@ class Base(DeclarativeBase, MappedAsDataclass):
 
 db = SQLAlchemy(model_class=Base)
 
+DEFAULT_DATABASE_URI = "sqlite:///project.db"
+
+
+'''
+helper function to build the SQLAlchemy engine options from the flask config
+DB_POOL_SIZE, DB_MAX_OVERFLOW and DB_POOL_TIMEOUT size the connection pool, in-memory sqlite
+databases keep the single connection pool flask-sqlalchemy sets up for them
+@param config: the flask config
+@return: the options passed to create_engine
+'''
+def engine_options(config) -> dict:
+    uri = config.get("SQLALCHEMY_DATABASE_URI", DEFAULT_DATABASE_URI)
+    if uri.startswith("sqlite") and (uri.endswith(":memory:") or uri.rstrip("/") == "sqlite:"):
+        return {}
+    return {
+        "pool_size": int(config.get("DB_POOL_SIZE", 10)),
+        "max_overflow": int(config.get("DB_MAX_OVERFLOW", 20)),
+        "pool_timeout": float(config.get("DB_POOL_TIMEOUT", 10)),
+        "pool_pre_ping": True,
+    }
+
+
+'''
+helper function to read the sqlite pragmas from the flask config
+WAL lets readers proceed while parse_word writes, synchronous=NORMAL is safe with WAL and skips an fsync
+per commit, busy_timeout makes a writer wait for the lock instead of failing with "database is locked"
+and mmap_size serves reads from the page cache without copying
+(the busy wait blocks the whole OS thread, so write transactions must not yield to other greenlets)
+@param config: the flask config
+@return: the pragmas to run on every new connection
+'''
+def sqlite_pragmas(config) -> dict:
+    return {
+        "journal_mode": config.get("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": config.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": int(config.get("SQLITE_BUSY_TIMEOUT", 5000)),
+        "mmap_size": int(config.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    }
+
+
+'''
+helper function to run the pragmas on every connection the engine opens, it does nothing for other databases
+@param engine: the engine to configure, before it opens its first connection
+@param pragmas: the pragmas from sqlite_pragmas
+@return: None
+'''
+def configure_sqlite(engine, pragmas: dict):
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
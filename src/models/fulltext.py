@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+from sqlalchemy import DDL, event, inspect, text
+from src.models.model import Definition
+import logging
+
+
+logger = logging.getLogger("root")
+
+
+'''
+sqlite FTS5 index of Definition.definition and Definition.example for the reverse dictionary search
+it is an external content table, the text is only stored once in the definition table and the index is
+kept in sync by triggers, so rows written by the ORM, by the bulk inserts of store_word or by hand are all indexed
+the table and the triggers are created and dropped with the definition table (db.create_all / db.drop_all),
+databases created before the index existed get it from migrations.upgrade, other dialects have no index
+'''
+FULLTEXT_TABLE = "definition_fts"
+
+CREATE_STATEMENTS = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FULLTEXT_TABLE} USING fts5("
+    "definition, example, content='definition', content_rowid='id', tokenize='porter unicode61')",
+    f"CREATE TRIGGER IF NOT EXISTS {FULLTEXT_TABLE}_insert AFTER INSERT ON definition BEGIN "
+    f"INSERT INTO {FULLTEXT_TABLE}(rowid, definition, example) VALUES (new.id, new.definition, new.example); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FULLTEXT_TABLE}_delete AFTER DELETE ON definition BEGIN "
+    f"INSERT INTO {FULLTEXT_TABLE}({FULLTEXT_TABLE}, rowid, definition, example) "
+    "VALUES ('delete', old.id, old.definition, old.example); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FULLTEXT_TABLE}_update AFTER UPDATE OF definition, example ON definition BEGIN "
+    f"INSERT INTO {FULLTEXT_TABLE}({FULLTEXT_TABLE}, rowid, definition, example) "
+    "VALUES ('delete', old.id, old.definition, old.example); "
+    f"INSERT INTO {FULLTEXT_TABLE}(rowid, definition, example) VALUES (new.id, new.definition, new.example); END",
+]
+
+
+'''
+helper function to check the sqlite library was built with FTS5
+@param connection: a connection to the database
+@return: True when the full-text index can be created
+'''
+def fulltext_supported(connection) -> bool:
+    if connection.dialect.name != "sqlite":
+        return False
+    options = {row[0] for row in connection.exec_driver_sql("PRAGMA compile_options")}
+    return "ENABLE_FTS5" in options
+
+
+def has_fulltext(connection) -> bool:
+    return connection.dialect.name == "sqlite" and inspect(connection).has_table(FULLTEXT_TABLE)
+
+
+'''
+helper function to create the full-text index and its triggers if they are missing
+@param connection: a connection to the database
+@return: True when the index was created by this call
+'''
+def create_fulltext(connection) -> bool:
+    if not fulltext_supported(connection) or has_fulltext(connection):
+        return False
+    if not inspect(connection).has_table(Definition.__tablename__):
+        return False
+    for statement in CREATE_STATEMENTS:
+        connection.exec_driver_sql(statement)
+    return True
+
+
+'''
+helper function to rebuild the full-text index from the definition table
+@param connection: a connection to the database
+@return: None
+'''
+def rebuild_fulltext(connection):
+    connection.execute(text(f"INSERT INTO {FULLTEXT_TABLE}({FULLTEXT_TABLE}) VALUES ('rebuild')"))
+
+
+@event.listens_for(Definition.__table__, "after_create")
+def _create_fulltext(target, connection, **kw):
+    create_fulltext(connection)
+
+
+# the triggers go with the definition table, the virtual table has to be dropped explicitly
+event.listen(
+    Definition.__table__,
+    "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {FULLTEXT_TABLE}").execute_if(dialect="sqlite"),
+)
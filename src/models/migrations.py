@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+from sqlalchemy import inspect, text
+from src.models.extensions import db
+from src.models.fulltext import create_fulltext, rebuild_fulltext
+import src.models.model  # registers the tables on db.metadata
+import json
+import logging
+
+
+logger = logging.getLogger("root")
+
+
+'''
+columns added to existing tables after the first release, db.create_all() only creates missing tables
+so databases created by an older version (e.g. an existing project.db) get these through ALTER TABLE
+'''
+ADDED_COLUMNS = {
+    'word': {
+        'payload': 'TEXT',
+    },
+}
+
+
+'''
+helper function to bring an existing database up to date with the models
+@param engine: the engine of the database to upgrade, after db.create_all() has run
+@return: None
+'''
+def upgrade(engine):
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {column['name'] for column in inspector.get_columns(table)}
+            for column, ddl in columns.items():
+                if column not in existing:
+                    logger.info(f"Adding column {table}.{column}")
+                    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+        existing_indexes = {
+            table: {index['name'] for index in inspector.get_indexes(table)}
+            for table in db.metadata.tables if inspector.has_table(table)
+        }
+        if 'phonetic' in existing_indexes and 'ix_phonetic_phonetic' not in existing_indexes['phonetic']:
+            merge_duplicate_phonetics(connection)
+        for table, indexes in existing_indexes.items():
+            for index in db.metadata.tables[table].indexes:
+                if index.name not in indexes:
+                    logger.info(f"Creating index {index.name}")
+                    index.create(connection)
+
+        if inspector.has_table('word_relation') and inspector.has_table('meaning') and needs_relations(connection):
+            logger.info("Indexing the synonyms and antonyms of the stored words")
+            backfill_relations(connection)
+
+        if create_fulltext(connection):
+            logger.info("Indexing the stored definitions for full-text search")
+            rebuild_fulltext(connection)
+
+
+'''
+helper function to merge phonetics stored more than once, older versions of parse_word could insert
+the same phonetic twice which would make the unique index on phonetic.phonetic fail to build
+a word linked to several copies ends up linked twice to the merged one, the extra links are dropped
+and the payload of the word, which lists the phonetic twice, is rebuilt on its next read
+@param connection: the connection of the running upgrade
+@return: None
+'''
+def merge_duplicate_phonetics(connection):
+    keep = "SELECT MIN(id) FROM phonetic GROUP BY phonetic"
+    connection.execute(text(f"""
+        UPDATE word SET payload = NULL WHERE id IN (
+            SELECT word_id FROM word_phonetic_association WHERE phonetic_id NOT IN ({keep})
+        )
+    """))
+    connection.execute(text(f"""
+        UPDATE word_phonetic_association
+        SET phonetic_id = (
+            SELECT MIN(duplicate.id) FROM phonetic AS original
+            JOIN phonetic AS duplicate ON duplicate.phonetic = original.phonetic
+            WHERE original.id = word_phonetic_association.phonetic_id
+        )
+        WHERE phonetic_id NOT IN ({keep})
+    """))
+    connection.execute(text(f"DELETE FROM phonetic WHERE id NOT IN ({keep})"))
+    # the association table has no key to tell the copies apart, each duplicated link is replaced by one row
+    duplicates = connection.execute(text("""
+        SELECT word_id, phonetic_id FROM word_phonetic_association
+        GROUP BY word_id, phonetic_id HAVING COUNT(*) > 1
+    """)).all()
+    if duplicates:
+        links = [{'word_id': word_id, 'phonetic_id': phonetic_id} for word_id, phonetic_id in duplicates]
+        connection.execute(text("DELETE FROM word_phonetic_association WHERE word_id = :word_id AND phonetic_id = :phonetic_id"), links)
+        connection.execute(text("INSERT INTO word_phonetic_association (word_id, phonetic_id) VALUES (:word_id, :phonetic_id)"), links)
+
+
+'''
+helper function to check the word_relation table has to be filled from the synonyms and antonyms stored
+as JSON lists, which is the case when it was just created on a database with words listing some
+@param connection: the connection of the running upgrade
+@return: True when the table is empty and some meaning or definition lists a synonym or an antonym
+'''
+def needs_relations(connection) -> bool:
+    if connection.execute(text("SELECT 1 FROM word_relation LIMIT 1")).first():
+        return False
+    listed = "(synonyms IS NOT NULL AND synonyms != '[]') OR (antonyms IS NOT NULL AND antonyms != '[]')"
+    return bool(
+        connection.execute(text(f"SELECT 1 FROM meaning WHERE {listed} LIMIT 1")).first()
+        or connection.execute(text(f"SELECT 1 FROM definition WHERE {listed} LIMIT 1")).first()
+    )
+
+
+'''
+helper function to fill the word_relation table from the synonyms and antonyms stored as JSON lists
+@param connection: the connection of the running upgrade
+@return: None
+'''
+def backfill_relations(connection):
+    rows = connection.execute(text("""
+        SELECT word.id, word.word, meaning.synonyms, meaning.antonyms FROM meaning JOIN word ON word.id = meaning.word_id
+        UNION ALL
+        SELECT word.id, word.word, definition.synonyms, definition.antonyms FROM definition
+        JOIN meaning ON meaning.id = definition.meaning_id JOIN word ON word.id = meaning.word_id
+    """))
+    relations = {}
+    for word_id, word, synonyms, antonyms in rows:
+        for kind, listed in (('synonym', synonyms), ('antonym', antonyms)):
+            for related in json.loads(listed) if listed else []:
+                if related and related != word:
+                    relations.setdefault((word_id, related, kind), None)
+    if relations:
+        connection.execute(
+            text("INSERT INTO word_relation (word_id, related, kind) VALUES (:word_id, :related, :kind)"),
+            [{'word_id': word_id, 'related': related, 'kind': kind} for word_id, related, kind in relations],
+        )
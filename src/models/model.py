@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 from flask import Flask
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Mapped, mapped_column, Session
 from typing import Optional, List
 from src.models.extensions import Base, db
 from sqlalchemy.types import TypeDecorator, Text
@@ -28,8 +29,8 @@ so it's a many-to-many relationship
 word_phonetic_assoociation = db.Table(
     'word_phonetic_association',
     Base.metadata,
-    db.Column('word_id', db.Integer, db.ForeignKey('word.id')),
-    db.Column('phonetic_id', db.Integer, db.ForeignKey('phonetic.id'))
+    db.Column('word_id', db.Integer, db.ForeignKey('word.id'), index=True),
+    db.Column('phonetic_id', db.Integer, db.ForeignKey('phonetic.id'), index=True)
 )
 
 class Word(db.Model):
@@ -37,8 +38,11 @@ class Word(db.Model):
     # each word in the dictionary is unique, length of longest word in english dictionary is 45
     word: Mapped[str] = mapped_column(db.String(45), unique=True)
     phonetic: Mapped[str] = mapped_column() # the phonetic representation can be empty, the primary phonetic representation
-    phonetics: Mapped[Optional[List["Phonetic"]]] = db.relationship("Phonetic", secondary='word_phonetic_association', back_populates="words", cascade="all, delete")
-    meanings: Mapped[Optional[List["Meaning"]]] = db.relationship("Meaning", back_populates="word", cascade="all, delete-orphan")
+    phonetics: Mapped[Optional[List["Phonetic"]]] = db.relationship("Phonetic", secondary='word_phonetic_association', back_populates="words", cascade="all, delete", order_by="Phonetic.id")
+    meanings: Mapped[Optional[List["Meaning"]]] = db.relationship("Meaning", back_populates="word", cascade="all, delete-orphan", order_by="Meaning.id")
+    # the serialized to_dict() output, written when the word is stored and cleared whenever the word or its children change
+    payload: Mapped[Optional[str]] = mapped_column(Text, nullable=True, default=None, repr=False)
+    relations: Mapped[List["WordRelation"]] = db.relationship("WordRelation", cascade="all, delete-orphan", default_factory=list, repr=False)
 
     def __repr__(self) -> str:
         return f"Word(id={self.id!r}, word={self.word!r}, phonetic={self.phonetic!r})"
@@ -53,7 +57,8 @@ class Word(db.Model):
 
 class Phonetic(db.Model):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    phonetic: Mapped[str] = mapped_column()
+    # each phonetic representation is stored once and shared by the words pronounced that way
+    phonetic: Mapped[str] = mapped_column(index=True, unique=True)
     audio_url: Mapped[Optional[str]] = mapped_column(nullable=True) # the url to the audio file can be empty
     words: Mapped[Optional[List["Word"]]] = db.relationship("Word", secondary='word_phonetic_association', back_populates="phonetics", cascade="all, delete")
 
@@ -68,11 +73,11 @@ class Phonetic(db.Model):
 class Meaning(db.Model):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     partOfSpeech: Mapped[str] = mapped_column(db.String(30))
-    definitions: Mapped[List["Definition"]] = db.relationship("Definition", back_populates="meaning", cascade="all, delete-orphan")
+    definitions: Mapped[List["Definition"]] = db.relationship("Definition", back_populates="meaning", cascade="all, delete-orphan", order_by="Definition.id")
     # the synonyms and antonyms are stored as lists of strings for easy access, rather than referencing other words in the dictionary
     synonyms: Mapped[Optional[List[str]]] = mapped_column(StringListType, nullable=True)
     antonyms: Mapped[Optional[List[str]]] = mapped_column(StringListType, nullable=True)
-    word_id: Mapped[int] = mapped_column(db.ForeignKey('word.id'))
+    word_id: Mapped[int] = mapped_column(db.ForeignKey('word.id'), index=True)
     word: Mapped["Word"] = db.relationship(back_populates="meanings")
 
     def to_dict(self):
@@ -90,7 +95,7 @@ class Definition(db.Model):
     example: Mapped[Optional[str]] = mapped_column(nullable=True)
     synonyms: Mapped[Optional[List[str]]] = mapped_column(StringListType, nullable=True)
     antonyms: Mapped[Optional[List[str]]] = mapped_column(StringListType, nullable=True)
-    meaning_id: Mapped[int] = mapped_column(db.ForeignKey('meaning.id'))
+    meaning_id: Mapped[int] = mapped_column(db.ForeignKey('meaning.id'), index=True)
     meaning: Mapped["Meaning"] = db.relationship(back_populates="definitions")
 
     def to_dict(self):
@@ -100,4 +105,55 @@ class Definition(db.Model):
             'example': self.example,
             'synonyms': self.synonyms,
             'antonyms': self.antonyms
-        }
\ No newline at end of file
+        }
+
+
+'''
+the synonyms and antonyms listed by the meanings and definitions of a word, one row per related word and kind,
+they are also kept as JSON lists on Meaning and Definition for the payload but only this table can answer
+"which words list X as a synonym" with an index lookup instead of decoding every row
+the related word is a plain string, it does not have to be stored in the dictionary itself
+'''
+class WordRelation(db.Model):
+    __table_args__ = (db.UniqueConstraint('word_id', 'related', 'kind', name='uq_word_relation'),)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    word_id: Mapped[int] = mapped_column(db.ForeignKey('word.id'))
+    related: Mapped[str] = mapped_column(db.String(45), index=True)
+    kind: Mapped[str] = mapped_column(db.String(10))  # synonym or antonym
+
+
+'''
+the precomputed payload of a word is cleared when the word, one of its meanings, definitions or phonetics
+is changed or deleted so it is rebuilt on the next read instead of serving stale data
+'''
+def _payload_owners(obj):
+    if isinstance(obj, Word):
+        return [obj]
+    if isinstance(obj, Meaning):
+        return [obj.word] if obj.word else []
+    if isinstance(obj, Definition):
+        return [obj.meaning.word] if obj.meaning and obj.meaning.word else []
+    if isinstance(obj, Phonetic):
+        return list(obj.words or [])
+    return []
+
+
+@event.listens_for(Session, "before_flush")
+def invalidate_word_payloads(session, flush_context, instances):
+    changed = list(session.dirty) + list(session.deleted)
+    changed += [obj for obj in session.new if not isinstance(obj, Word)]
+    for obj in changed:
+        if isinstance(obj, Word) and not _word_changed(obj):
+            continue
+        # linking a new word to a stored phonetic only changes its words collection, the other words are unaffected
+        if obj in session.dirty and not isinstance(obj, Word) and not session.is_modified(obj, include_collections=False):
+            continue
+        for word in _payload_owners(obj):
+            if word in session.new or word in session.deleted:
+                continue
+            word.payload = None
+
+
+def _word_changed(word: Word) -> bool:
+    state = inspect(word)
+    return any(attr.history.has_changes() for attr in state.attrs if attr.key != 'payload')
@@ -1,81 +1,821 @@
 #!/usr/bin/env python3
-import requests # typing: ignore
-from flask import jsonify
-from typing import List, Any, Optional
-from src.models.model import Word, Phonetic, Meaning, Definition
+from flask import jsonify, current_app
+from typing import List, Any, Iterator, Optional, Tuple
+from sqlalchemy import select, insert, update, func, and_, or_, text, table, column
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from src.models.model import Word, Phonetic, Meaning, Definition, WordRelation, word_phonetic_assoociation
 from src.models.extensions import db
+from src.models.fulltext import FULLTEXT_TABLE, has_fulltext
+from src.util.metrics import WORD_LOOKUPS, UPSTREAM_FETCH_SECONDS, PARSE_WORD_SECONDS
+from src.util.upstream import client as upstream, UpstreamUnavailable
+from src.util.cache import word_cache, not_found_cache
+from src.util.snapshot import word_snapshot
+from src.util.suggest import suggest_index
+from src.util.fuzzy import spell_index
+from src.util.singleflight import SingleFlight
+import eventlet
+import re
+import requests
 import sys
+import json
+import time
 import logging
 
 
 logger = logging.getLogger("root")
 
+# concurrent searches for the same missing word share one upstream fetch and one insert
+upstream_flight = SingleFlight("upstream")
+
+
+'''
+raised when a word is neither stored nor known to the dictionary API, with the closest stored words
+so the client can offer them instead of the user retyping (and refetching) misspellings
+'''
+class WordNotFound(RuntimeWarning):
+    def __init__(self, word: str, suggestions: List[str] = None):
+        super().__init__(f"No data found for the given word: {word}")
+        self.word = word
+        self.suggestions = suggestions or []
+
 
 '''
-helper function to process the request to fetch the word from the API and store it in the database
+helper function to process the request, the database is checked first and the dictionary API
+is only called when the word (or one of its case variants) is not stored yet and OFFLINE_MODE is off,
+a stored stem of the word is only used once the dictionary API has answered that it does not know it
 @param word: the word to fetch from the API
-@return: None
+@return: the Word object
 '''
 def process_request(word: str) -> Optional[Word]:
-    response = fetch_word(word)
+    normalized = normalize_word(word)
+    stored_word = lookup_word(word)
+    if stored_word:
+        WORD_LOOKUPS.labels(source="db").inc()
+        return stored_word
+
+    if normalized in not_found_cache:
+        # the dictionary API did not know the word recently, asking again would only waste a call
+        stem = lookup_stem(word)
+        if stem:
+            return stem
+        raise WordNotFound(word, did_you_mean(word))
+
+    if current_app.config.get("OFFLINE_MODE"):
+        # the database was loaded from a dump with `flask import-dump`, the dictionary API is never called
+        logger.log(msg=f"No data found for the given word: {word}", level=0)
+        raise WordNotFound(word, did_you_mean(word))
+
+    # the leader stores the word in its own session, every caller then loads it in theirs
+    headword = upstream_flight.do(normalized, fetch_and_store, normalized)
+    return Word.query.filter_by(word=headword).first()
+
+
+'''
+helper function to fetch a missing word from the dictionary API and store it in the database
+@param word: the normalized word to fetch from the API
+@return: the headword as stored in the database
+'''
+def fetch_and_store(word: str) -> str:
+    WORD_LOOKUPS.labels(source="upstream").inc()
+    try:
+        response = fetch_word(word)
+    except (UpstreamUnavailable, requests.RequestException) as e:
+        # the circuit is open or the retries are exhausted, only the stored words can be offered
+        logger.warning(f"Dictionary API unavailable for {word}: {e}")
+        raise WordNotFound(word, did_you_mean(word)) from e
     if not response:
         logger.log(msg=f"No data found for the given word: {word}", level=0)
-        raise RuntimeWarning(f"No data found for the given word: {word}")
-        
+        not_found_cache.add(word)
+        # only now that the exact word is unknown an inflected form may resolve to its stored stem
+        stem = lookup_stem(word)
+        if stem:
+            return stem.word
+        raise WordNotFound(word, did_you_mean(word))
+
     new_word = parse_word(response)
-    return new_word
+    return new_word.word
+
+
+'''
+helper function to resolve the input word to the payload sent to the client,
+served from the in-process cache or the memory-mapped snapshot when possible and otherwise
+through process_request
+@param word: the word as typed by the user
+@return: the Word.to_dict() payload with the related words
+'''
+def search_word(word: str) -> dict:
+    key = normalize_word(word)
+    payload = word_cache.get(key)
+    if payload is not None:
+        return payload
+    payload = word_snapshot.lookup(word_variants(word))
+    if payload is not None:
+        WORD_LOOKUPS.labels(source="snapshot").inc()
+        word_cache.set(key, payload)
+        return payload
+    stored_word = process_request(word)
+    payload = get_word_payload(stored_word.word)
+    commit_backfill()
+    payload = with_related(payload)
+    word_cache.set(key, payload)
+    return payload
+
+
+MAX_BATCH = 100
+
+
+'''
+helper function to resolve a list of words at once, e.g. the vocabulary of a lesson
+cached and snapshot words are answered first, the stored ones are resolved with one IN query over the
+variants of every word, and only the remaining misses are fetched from the dictionary API, concurrently by a
+bounded green pool (BATCH_CONCURRENCY, under the client's rate limit and circuit breaker); the fetched
+words are stored in one transaction once every fetch is done
+outcomes are yielded as they complete, so the order differs from the input for words fetched upstream
+a ValueError is raised before the first result when the words are not a list of strings or too many
+@param words: the words as typed by the user, duplicates are answered once
+@return: (word, payload, suggestions) per distinct word, payload is None when the word is not found
+'''
+def search_many(words: List[str]) -> Iterator[Tuple[str, Optional[dict], List[str]]]:
+    if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+        raise ValueError("words must be a list of strings")
+    limit = int(current_app.config.get("BATCH_MAX_WORDS", MAX_BATCH))
+    unique = {}
+    for word in words:
+        if normalize_word(word):
+            unique.setdefault(normalize_word(word), word)
+    if len(unique) > limit:
+        raise ValueError(f"At most {limit} words can be searched at once, got {len(unique)}")
+
+    pending = {}
+    for key, word in unique.items():
+        payload = word_cache.get(key)
+        if payload is None:
+            payload = word_snapshot.lookup(word_variants(word))
+            if payload is not None:
+                WORD_LOOKUPS.labels(source="snapshot").inc()
+                word_cache.set(key, payload)
+        if payload is not None:
+            yield word, payload, []
+        else:
+            pending[key] = word
+
+    if not pending:
+        return
+    variants = {key: word_variants(word) for key, word in pending.items()}
+    # one IN query over every spelling of every word, the payloads are stored with the words
+    payloads = get_word_payloads(list({v: None for candidates in variants.values() for v in candidates}))
+    commit_backfill()
+    headwords = {}
+    for key, candidates in variants.items():
+        headwords[key] = next((candidate for candidate in candidates if candidate in payloads), None)
+    misses = []
+    for key, word in pending.items():
+        if headwords.get(key) in payloads:
+            WORD_LOOKUPS.labels(source="db").inc()
+            yield word, _cache_payload(key, payloads[headwords[key]]), []
+        elif key in not_found_cache:
+            yield _resolve_stem(key, word)
+        elif current_app.config.get("OFFLINE_MODE"):
+            yield word, None, did_you_mean(word)
+        else:
+            misses.append(key)
+    if misses:
+        yield from _fetch_many(misses, pending)
+
+
+def _cache_payload(key: str, payload: dict) -> dict:
+    payload = with_related(payload)
+    word_cache.set(key, payload)
+    return payload
+
+
+'''
+helper function to fetch the misses of search_many concurrently and store them in one transaction
+the fetches run in a green pool while this greenlet, which owns the database session, yields the words the
+API does not know as their answer arrives; the found words are only written once every fetch is done, in one
+short transaction that never waits on the network or on the consumer (a sqlite write transaction must not
+yield to other greenlets, see extensions.sqlite_pragmas), and yielded after it is committed
+@param keys: the normalized words to fetch
+@param words: the words as typed by the user, by normalized word
+@return: (word, payload, suggestions), the missing words in the order the answers arrive, then the found ones
+'''
+def _fetch_many(keys: List[str], words: dict) -> Iterator[Tuple[str, Optional[dict], List[str]]]:
+    pool = eventlet.GreenPool(int(current_app.config.get("BATCH_CONCURRENCY", 10)))
+    results = eventlet.Queue()
+
+    def fetch(key):
+        try:
+            results.put((key, fetch_word(key), None))
+        except Exception as e:
+            results.put((key, None, e))
+
+    for key in keys:
+        WORD_LOOKUPS.labels(source="upstream").inc()
+        pool.spawn_n(fetch, key)
+
+    found = []
+    for _ in keys:
+        key, response, error = results.get()
+        word = words[key]
+        if error is not None:
+            logger.warning(f"Dictionary API unavailable for {key}: {error}")
+            yield word, None, did_you_mean(word)
+        elif not response:
+            not_found_cache.add(key)
+            yield _resolve_stem(key, word)
+        else:
+            found.append((key, response))
+
+    headwords = store_many(found)
+    payloads = get_word_payloads(list(set(headwords.values())))
+    commit_backfill()
+    for key, _ in found:
+        if headwords.get(key) in payloads:
+            yield words[key], _cache_payload(key, payloads[headwords[key]]), []
+        else:
+            yield words[key], None, did_you_mean(words[key])
 
 
 '''
-helper function to fetch the word from the dictionary API
+helper function to answer a word the dictionary API does not know with its stored stem, see word_stems
+@param key: the normalized word
+@param word: the word as typed by the user
+@return: (word, payload, suggestions) like search_many
+'''
+def _resolve_stem(key: str, word: str) -> Tuple[str, Optional[dict], List[str]]:
+    stem = lookup_stem(word)
+    payload = get_word_payload(stem.word) if stem else None
+    commit_backfill()
+    if payload is None:
+        return word, None, did_you_mean(word)
+    return word, _cache_payload(key, payload), []
+
+
+'''
+helper function to store fetched responses in one transaction and update the caches and indexes like
+parse_word once it is committed, malformed responses are skipped; used by _fetch_many and the prewarm
+command, which fetch every response first so the write transaction never waits on the network
+@param found: (normalized word, response) pairs
+@return: the stored headword by normalized word, malformed responses are left out
+'''
+def store_many(found: List[Tuple[str, List[Any]]]) -> dict:
+    if not found:
+        return {}
+    if db.session.get_bind().dialect.name not in UPSERT_DIALECTS:
+        # parse_word_orm commits every word on its own
+        return {key: parse_word_orm(response).word for key, response in found}
+    headwords = {}
+    stored = []
+    try:
+        for key, response in found:
+            try:
+                store_word(response)
+            except (KeyError, IndexError, TypeError) as e:
+                # store_word reads the whole response before writing, a malformed one leaves the batch intact
+                logger.warning(f"Malformed response for {key}: {e!r}")
+                continue
+            headwords[key] = response[0]['word']
+            stored.append(response)
+        db.session.commit()
+    except BaseException:
+        db.session.rollback()
+        raise
+    for response in stored:
+        after_store(response)
+    return headwords
+
+
+'''
+helper function to list the stored words closest to a word that could not be found
+@param word: the word as typed by the user
+@return: the closest stored words, closest first
+'''
+def did_you_mean(word: str) -> List[str]:
+    return [candidate for candidate, _ in spell_index.lookup(word)]
+
+
+'''
+helper function to normalize the input word before it is looked up
+@param word: the word as typed by the user
+@return: the word stripped, lowercased and with inner whitespace collapsed
+'''
+def normalize_word(word: str) -> str:
+    return " ".join(word.split()).lower()
+
+
+'''
+helper function to list the spellings a stored word may have for the given input,
+in order of preference: the exact input and its case variants, so that e.g. "Hello" resolves to a stored "hello"
+@param word: the word as typed by the user
+@return: a list of candidate spellings without duplicates
+'''
+def word_variants(word: str) -> List[str]:
+    stripped = " ".join(word.split())
+    normalized = stripped.lower()
+    candidates = [normalized, stripped, normalized.capitalize(), normalized.upper()]
+    return list(dict.fromkeys(candidate for candidate in candidates if candidate))
+
+
+'''
+helper function to list the naive inflection stems of the input (plural, past tense, gerund), they are
+only a fallback once the dictionary API has answered that it does not know the exact word: tried first,
+"news" would resolve to "new" and "thing" to "the"
+@param word: the word as typed by the user
+@return: a list of candidate stems without duplicates, in order of preference
+'''
+def word_stems(word: str) -> List[str]:
+    normalized = normalize_word(word)
+    stems = []
+    if normalized.endswith("ies") and len(normalized) > 4:
+        stems.append(normalized[:-3] + "y")
+    if normalized.endswith("es") and len(normalized) > 3:
+        stems.append(normalized[:-2])
+    if normalized.endswith("s") and not normalized.endswith("ss") and len(normalized) > 2:
+        stems.append(normalized[:-1])
+    if normalized.endswith("ied") and len(normalized) > 4:
+        stems.append(normalized[:-3] + "y")
+    if normalized.endswith("ed") and len(normalized) > 3:
+        stems.extend([normalized[:-2], normalized[:-1]])
+    if normalized.endswith("ing") and len(normalized) > 4:
+        stems.extend([normalized[:-3], normalized[:-3] + "e"])
+    return list(dict.fromkeys(stem for stem in stems if stem))
+
+
+'''
+helper function to resolve the input word against the database without calling the API
+@param word: the word as typed by the user
+@return: the stored Word matching the best candidate spelling, or None on a miss
+'''
+def lookup_word(word: str) -> Optional[Word]:
+    return _first_stored(word_variants(word))
+
+
+'''
+helper function to resolve the input word to a stored stem, see word_stems
+@param word: the word as typed by the user, unknown to the dictionary API
+@return: the stored Word matching the best stem, or None on a miss
+'''
+def lookup_stem(word: str) -> Optional[Word]:
+    return _first_stored(word_stems(word))
+
+
+def _first_stored(candidates: List[str]) -> Optional[Word]:
+    if not candidates:
+        return None
+    matches = {w.word: w for w in Word.query.filter(Word.word.in_(candidates)).all()}
+    for candidate in candidates:
+        if candidate in matches:
+            return matches[candidate]
+    return None
+
+
+'''
+helper function to fetch the word from the dictionary API through the shared upstream client
 @param word: the word to fetch from the API
-@return: the response from the API as a list of dictionaries
+@return: the response from the API as a list of dictionaries, None if the API does not know the word
 '''
 def fetch_word(word: str) -> List[Any]:
-    response = requests.get(f"https://api.dictionaryapi.dev/api/v2/entries/en/{word}")
-    if not response:
-        return None    
-    return response.json()
+    start = time.perf_counter()
+    outcome = "unavailable"
+    try:
+        response = upstream.get(f"/entries/en/{word}")
+        if response.status_code == 404:
+            outcome = "missing"
+            return None
+        if not response:
+            raise UpstreamUnavailable(f"Dictionary API answered {response.status_code} for {word}")
+        outcome = "found"
+        return response.json()
+    finally:
+        UPSTREAM_FETCH_SECONDS.labels(outcome=outcome).observe(time.perf_counter() - start)
 
 '''
-helper function to parse the response from the API and create a Word object
+dialects whose INSERT supports ON CONFLICT DO NOTHING, parse_word uses the bulk path on these
+'''
+UPSERT_DIALECTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+'''
+helper function to bring the in-process caches and indexes up to date once a stored word is committed:
+its cached payloads and not-found entry are dropped, it is added to the suggest and spell indexes
+and the cached payloads of the words it lists as related are dropped, they now list it back
+@param response: the response from the API the word was stored from
+@return: None
+'''
+def after_store(response: List[Any]):
+    headword = response[0]['word']
+    word_cache.invalidate(headword)
+    not_found_cache.discard(headword)
+    suggest_index.add(headword)
+    spell_index.add(headword)
+    for related, _ in relation_rows(response):
+        word_cache.invalidate(related)
+
+
+'''
+helper function to parse the response from the API and store it in the database
 @param response: the response from the API as a list of dictionaries
-@return: a Word object
+@return: the stored Word object
 '''
 def parse_word(response: List[Any]) -> Word:
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in UPSERT_DIALECTS:
+        with PARSE_WORD_SECONDS.labels(path="orm").time():
+            return parse_word_orm(response)
+    try:
+        with PARSE_WORD_SECONDS.labels(path="bulk").time():
+            word_id, _ = store_word(response)
+            db.session.commit()
+    except BaseException:
+        db.session.rollback()
+        raise
+    after_store(response)
+    # the relationships are only loaded if the caller walks them, the payload is already stored
+    return db.session.get(Word, word_id)
+
+
+'''
+helper function to insert a word with Core statements in the current transaction, the caller commits
+the word and its phonetics are inserted with ON CONFLICT DO NOTHING so concurrent inserts are idempotent,
+meanings, definitions and association rows are inserted with one executemany per table
+and the payload is built from the inserted rows instead of reloading them
+@param response: the response from the API as a list of dictionaries
+@return: the id of the word and whether it was inserted, False if it was already stored
+'''
+def store_word(response: List[Any]) -> Tuple[int, bool]:
+    upsert = UPSERT_DIALECTS[db.session.get_bind().dialect.name]
+    # the response is read completely before the first write so a malformed one fails without side effects
+    headword, primary_phonetic = response[0]['word'], response[0].get('phonetic') or ''
+    relations = relation_rows(response)
+    # the same pronunciation is often listed by several entries of the response
+    phonetic_rows = {}
+    for item in response:
+        for phonetic in phonetic_entries(item):
+            phonetic_rows.setdefault(phonetic['text'], {'phonetic': phonetic['text'], 'audio_url': phonetic.get('audio', None)})
+    meaning_rows = [
+        {'partOfSpeech': meaning['partOfSpeech'],
+         'synonyms': meaning.get('synonyms', None),
+         'antonyms': meaning.get('antonyms', None),
+         'definitions': [
+             {'definition': definition['definition'],
+              'example': definition.get('example', None),
+              'synonyms': definition.get('synonyms', None),
+              'antonyms': definition.get('antonyms', None)}
+             for definition in meaning['definitions']
+         ]}
+        for item in response for meaning in item['meanings']
+    ]
+
+    word_id = db.session.execute(
+        upsert(Word)
+        .values(word=headword, phonetic=primary_phonetic)
+        .on_conflict_do_nothing(index_elements=['word'])
+        .returning(Word.id)
+    ).scalar()
+    if word_id is None:
+        logger.log(msg='Word already in database', level=0)
+        return db.session.execute(select(Word.id).where(Word.word == headword)).scalar_one(), False
+
+    phonetics = []
+    if phonetic_rows:
+        db.session.execute(
+            upsert(Phonetic).on_conflict_do_nothing(index_elements=['phonetic']),
+            list(phonetic_rows.values()),
+        )
+        stored = {p.phonetic: p for p in db.session.execute(
+            select(Phonetic.id, Phonetic.phonetic, Phonetic.audio_url).where(Phonetic.phonetic.in_(phonetic_rows))
+        )}
+        # ordered by id like the Word.phonetics relationship
+        phonetics = sorted(stored.values(), key=lambda p: p.id)
+        db.session.execute(
+            insert(word_phonetic_assoociation),
+            [{'word_id': word_id, 'phonetic_id': p.id} for p in phonetics],
+        )
+
+    meaning_ids = []
+    if meaning_rows:
+        meaning_ids = db.session.execute(
+            insert(Meaning).returning(Meaning.id, sort_by_parameter_order=True),
+            [{'partOfSpeech': meaning['partOfSpeech'],
+              'synonyms': meaning['synonyms'],
+              'antonyms': meaning['antonyms'],
+              'word_id': word_id} for meaning in meaning_rows],
+        ).scalars().all()
+
+    definition_rows = [
+        dict(definition, meaning_id=meaning_id)
+        for meaning, meaning_id in zip(meaning_rows, meaning_ids)
+        for definition in meaning['definitions']
+    ]
+    definition_ids = []
+    if definition_rows:
+        definition_ids = db.session.execute(
+            insert(Definition).returning(Definition.id, sort_by_parameter_order=True),
+            definition_rows,
+        ).scalars().all()
+
+    if relations:
+        db.session.execute(
+            insert(WordRelation),
+            [{'word_id': word_id, 'related': related, 'kind': kind} for related, kind in relations],
+        )
+
+    definitions = {}
+    for row, definition_id in zip(definition_rows, definition_ids):
+        definitions.setdefault(row['meaning_id'], []).append({
+            'id': definition_id,
+            'definition': row['definition'],
+            'example': row['example'],
+            'synonyms': row['synonyms'],
+            'antonyms': row['antonyms'],
+        })
+    payload = {
+        'id': word_id,
+        'word': headword,
+        'phonetic': primary_phonetic,
+        'phonetics': [{'id': p.id, 'phonetic': p.phonetic, 'audio_url': p.audio_url} for p in phonetics],
+        'meanings': [{
+            'id': meaning_id,
+            'partOfSpeech': meaning['partOfSpeech'],
+            'synonyms': meaning['synonyms'],
+            'antonyms': meaning['antonyms'],
+            'definitions': definitions.get(meaning_id, []),
+        } for meaning, meaning_id in zip(meaning_rows, meaning_ids)],
+    }
+    db.session.execute(update(Word).where(Word.id == word_id).values(payload=dump_payload(payload)))
+    logger.log(msg="Word added successfully", level=0)
+    return word_id, True
+
+
+'''
+helper function to parse the response from the API and store it through the ORM unit of work,
+used on databases without ON CONFLICT support and as the baseline of benchmarks/bench_parse_word.py
+@param response: the response from the API as a list of dictionaries
+@return: a Word object
+'''
+def parse_word_orm(response: List[Any]) -> Word:
     # parse the response to get the word, phonetic, phonetics, meanings, definitions, synonyms, antonyms
     # return a Word object
     word_to_update = Word.query.filter_by(word=response[0]['word']).first()
     if word_to_update:
         logger.log(msg='Word already in database', level=0)
         return word_to_update
-    new_word = Word(id=None, word=response[0]['word'], phonetic=response[0]['phonetic'], phonetics=[], meanings=[])
+    new_word = Word(id=None, word=response[0]['word'], phonetic=response[0].get('phonetic') or '', phonetics=[], meanings=[])
+    # the phonetics already stored are resolved with a single IN query
+    phonetic_texts = [phonetic['text'] for item in response for phonetic in phonetic_entries(item)]
+    phonetics = {}
+    if phonetic_texts:
+        phonetics = {p.phonetic: p for p in Phonetic.query.filter(Phonetic.phonetic.in_(phonetic_texts)).all()}
+    linked = set()
     for item in response:
-        for phonetic in item['phonetics']:
-            phonetics_to_update = Phonetic.query.filter_by(phonetic=phonetic['text']).first()
-            if not phonetics_to_update:
-                new_word.phonetics.append(Phonetic(id=None, phonetic=phonetic['text'], audio_url=phonetic.get('audio', None), words=[new_word]))
-            else:
-                phonetics_to_update.words.append(new_word)
-                new_word.phonetics.append(phonetics_to_update)
+        for phonetic in phonetic_entries(item):
+            text = phonetic['text']
+            if text in linked:
+                continue  # the same pronunciation is often listed by several entries of the response
+            if text not in phonetics:
+                phonetics[text] = Phonetic(id=None, phonetic=text, audio_url=phonetic.get('audio', None), words=[])
+            # appending on one side is enough, back_populates keeps Phonetic.words in sync
+            new_word.phonetics.append(phonetics[text])
+            linked.add(text)
         for meaning in item['meanings']:
             new_meaning = Meaning(id=None, partOfSpeech=meaning['partOfSpeech'], 
                                   synonyms=meaning.get('synonyms', None), 
                                   antonyms=meaning.get('antonyms', None), 
-                                  word=new_word, definitions=[], word_id=new_word.id)
+                                  word=None, definitions=[], word_id=new_word.id)
             for definition in meaning['definitions']:
                 new_meaning.definitions.append(
                     Definition(id=None, definition=definition['definition'], 
                                example=definition.get('example', None), 
                                synonyms=definition.get('synonyms', None), 
                                antonyms=definition.get('antonyms', None),
-                               meaning=new_meaning, meaning_id=new_meaning.id))
+                               meaning=None, meaning_id=new_meaning.id))
             new_word.meanings.append(new_meaning)
+    for related, kind in relation_rows(response):
+        new_word.relations.append(WordRelation(id=None, word_id=None, related=related, kind=kind))
     db.session.add(new_word)
-    db.session.commit()
+    db.session.flush()
+    new_word.payload = dump_payload(new_word.to_dict())
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # another worker stored the same word between the check above and this insert
+        db.session.rollback()
+        logger.info(f"Word {response[0]['word']} was stored concurrently")
+        return Word.query.filter_by(word=response[0]['word']).one()
+    after_store(response)
     logger.log(msg="Word added successfully", level=0)
     return new_word
 
+'''
+helper function to list the phonetics of an entry of the response that can be stored,
+the API lists pronunciations without text (only an audio file) which have no row to go in
+@param item: an entry of the response
+@return: the phonetics with a text
+'''
+def phonetic_entries(item: dict) -> List[dict]:
+    return [phonetic for phonetic in item.get('phonetics') or [] if phonetic.get('text')]
+
+'''
+helper function to list the synonyms and antonyms of a response as rows of the word_relation table
+@param response: the response from the API as a list of dictionaries
+@return: (related word, kind) pairs without duplicates, in the order of the response
+'''
+def relation_rows(response: List[Any]) -> List[Tuple[str, str]]:
+    headword = response[0]['word']
+    rows = {}
+    for item in response:
+        for meaning in item['meanings']:
+            for owner in [meaning] + meaning['definitions']:
+                for kind in ('synonym', 'antonym'):
+                    for related in owner.get(f'{kind}s') or []:
+                        if related and related != headword:
+                            rows.setdefault((related, kind), None)
+    return list(rows)
+
+
+MAX_HOPS = 3
+MAX_RELATED = 100
+
+
+'''
+helper function to walk the synonym (or antonym) graph out from a word, breadth first, one indexed query per hop
+a relation goes both ways: the words a word lists and the words listing it are both one hop away
+@param word: the headword to start from
+@param hops: how many relations away to go, at most MAX_HOPS
+@param kind: synonym or antonym
+@param limit: the number of related words to return, at most MAX_RELATED
+@return: the related words with the number of hops to reach them, closest first
+'''
+def related_words(word: str, hops: int = 1, kind: str = 'synonym', limit: int = 20) -> List[dict]:
+    hops = min(max(int(hops), 0), MAX_HOPS)
+    limit = min(max(int(limit), 0), MAX_RELATED)
+    seen = {word}
+    frontier = {word}
+    related = []
+    for hop in range(1, hops + 1):
+        if not frontier or len(related) >= limit:
+            break
+        edges = select(Word.word, WordRelation.related).join(WordRelation, WordRelation.word_id == Word.id)
+        rows = db.session.execute(
+            edges.where(WordRelation.kind == kind, Word.word.in_(frontier))
+            .union(edges.where(WordRelation.kind == kind, WordRelation.related.in_(frontier)))
+        ).all()
+        reached = set()
+        for source, target in rows:
+            for start, end in ((source, target), (target, source)):
+                if start in frontier and end not in seen:
+                    reached.add(end)
+        seen |= reached
+        related.extend({'word': end, 'hops': hop} for end in sorted(reached))
+        frontier = reached
+    return related[:limit]
+
+
+'''
+helper function to add the related words to a payload, the synonyms go RELATED_HOPS out (1 by default)
+and the antonyms one hop, RELATED_LIMIT bounds both lists
+@param payload: the Word.to_dict() payload
+@return: a copy of the payload with the related synonyms and antonyms
+'''
+def with_related(payload: dict) -> dict:
+    hops = int(current_app.config.get("RELATED_HOPS", 1))
+    limit = int(current_app.config.get("RELATED_LIMIT", 20))
+    return dict(payload, related={
+        'synonyms': [r['word'] for r in related_words(payload['word'], hops, 'synonym', limit)],
+        'antonyms': [r['word'] for r in related_words(payload['word'], 1, 'antonym', limit)],
+    })
+
+
+'''
+helper function to serialize a payload the way it is stored in Word.payload
+@param payload: the Word.to_dict() output
+@return: the compact JSON text
+'''
+def dump_payload(payload: dict) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+'''
+helper function to build the nested payload of a stored word for the client
+@param word: the headword as stored in the database
+@return: the Word.to_dict() payload, or None if the word is not stored
+'''
+def get_word_payload(word: str) -> Optional[dict]:
+    return get_word_payloads([word]).get(word)
+
+
+'''
+helper function to build the payloads of several stored words with one query
+the payloads precomputed by parse_word are selected with a single IN query, words stored before they existed
+(or whose payload was invalidated) are rebuilt with one SELECT ... IN per relationship and backfilled,
+the backfill is left pending in the session, the caller owns the transaction (see commit_backfill)
+@param words: the headwords as stored in the database
+@return: the Word.to_dict() payloads by headword, words that are not stored are left out
+'''
+def get_word_payloads(words: List[str]) -> dict:
+    if not words:
+        return {}
+    payloads = {}
+    missing = []
+    for row in db.session.execute(select(Word.id, Word.word, Word.payload).where(Word.word.in_(words))):
+        if row.payload:
+            payloads[row.word] = json.loads(row.payload)
+        else:
+            missing.append(row.id)
+    if not missing:
+        return payloads
+
+    stored_words = (
+        Word.query
+        .options(
+            selectinload(Word.phonetics),
+            selectinload(Word.meanings).selectinload(Meaning.definitions),
+        )
+        .filter(Word.id.in_(missing))
+        .all()
+    )
+    for stored_word in stored_words:
+        payload = stored_word.to_dict()
+        stored_word.payload = dump_payload(payload)
+        payloads[stored_word.word] = payload
+    return payloads
+
+
+'''
+helper function to commit the payloads backfilled by get_word_payloads, nothing is written when every
+payload was already stored; called right after it so no write transaction is left open across a yield
+@return: None
+'''
+def commit_backfill():
+    if db.session.dirty:
+        db.session.commit()
+
+
+MAX_PER_PAGE = 50
+
+# bm25 weights of the indexed columns, a match in the definition ranks above one in the example
+FULLTEXT_RANK = f"bm25({FULLTEXT_TABLE}, 1.0, 0.5)"
+
+
+'''
+helper function to search the definitions and examples for words matching a description (reverse dictionary),
+every term of the query has to match, results are ranked by the FTS5 index (bm25) and paginated
+without the index (other dialects, sqlite built without FTS5) it falls back to an unranked LIKE scan
+@param query: the description, e.g. "large body of water"
+@param page: the page of results, starting at 1
+@param per_page: the number of results per page, at most MAX_PER_PAGE
+@return: the query, paging, the total number of matches and the results (word, partOfSpeech, definition, example)
+'''
+def reverse_search(query: str, page: int = 1, per_page: int = 10) -> dict:
+    page = max(int(page), 1)
+    per_page = min(max(int(per_page), 1), MAX_PER_PAGE)
+    terms = re.findall(r"\w+", query.lower())
+    result = {"query": query, "page": page, "per_page": per_page, "total": 0, "results": []}
+    if not terms:
+        return result
+
+    columns = [Word.word, Meaning.partOfSpeech, Definition.definition, Definition.example]
+    if has_fulltext(db.session.connection()):
+        # every term is quoted so the input is never parsed as FTS5 query syntax
+        match = " ".join(f'"{term}"' for term in terms)
+        matches = text(f"{FULLTEXT_TABLE} MATCH :match").bindparams(match=match)
+        fulltext = table(FULLTEXT_TABLE, column("rowid"))
+        result["total"] = db.session.execute(
+            select(func.count()).select_from(fulltext).where(matches)
+        ).scalar_one()
+        statement = (
+            select(*columns)
+            .select_from(fulltext)
+            .join(Definition, Definition.id == fulltext.c.rowid)
+            .where(matches)
+            .order_by(text(FULLTEXT_RANK))
+        )
+    else:
+        matches = and_(*(
+            or_(Definition.definition.ilike(f"%{term}%"), Definition.example.ilike(f"%{term}%")) for term in terms
+        ))
+        result["total"] = db.session.execute(select(func.count()).select_from(Definition).where(matches)).scalar_one()
+        statement = select(*columns).select_from(Definition).where(matches).order_by(Definition.id)
+
+    rows = db.session.execute(
+        statement
+        .join(Meaning, Meaning.id == Definition.meaning_id)
+        .join(Word, Word.id == Meaning.word_id)
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+    ).all()
+    result["results"] = [
+        {"word": row.word, "partOfSpeech": row.partOfSpeech, "definition": row.definition, "example": row.example}
+        for row in rows
+    ]
+    return result
+
+
 '''
 the main function is implemented so it can be run as a script in isolation
 Usage: python api.py <word>
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+from cachetools import LRUCache, LFUCache, TTLCache
+from src.util.metrics import WORD_CACHE_REQUESTS, WORD_CACHE_EVICTIONS, WORD_CACHE_SIZE, WORD_CACHE_HIT_RATIO
+from src.util.metrics import NOT_FOUND_CACHE_REQUESTS
+from typing import Any, Optional
+import threading
+import time
+
+
+POLICIES = {
+    'lru': LRUCache,
+    'lfu': LFUCache,
+    'ttl': TTLCache,
+}
+
+
+'''
+helper function to subclass a cachetools cache so evictions are counted and reported to on_evict
+popitem is what cachetools calls when the cache is full, expire drops entries past their ttl
+'''
+def _counting(cache_class):
+    class CountingCache(cache_class):
+        on_evict = None
+
+        def popitem(self):
+            item = super().popitem()
+            WORD_CACHE_EVICTIONS.labels(reason="size").inc()
+            if self.on_evict is not None:
+                self.on_evict(*item)
+            return item
+
+        if cache_class is TTLCache:
+            def expire(self, time=None):
+                expired = super().expire(time)
+                if expired:
+                    WORD_CACHE_EVICTIONS.labels(reason="ttl").inc(len(expired))
+                    if self.on_evict is not None:
+                        for key, value in expired:
+                            self.on_evict(key, value)
+                return expired
+
+    return CountingCache
+
+
+'''
+bounded in-process cache of word payloads keyed by the normalized input word
+settings are read from the flask config: WORD_CACHE_MAXSIZE (0 disables the cache),
+WORD_CACHE_TTL in seconds and WORD_CACHE_POLICY (ttl, lru or lfu)
+the keys are also indexed by the headword of their payload so a write invalidates them without a scan
+'''
+class WordCache:
+    def __init__(self, app=None):
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+        self.configure()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.configure(
+            maxsize=int(app.config.get("WORD_CACHE_MAXSIZE", self.maxsize)),
+            ttl=float(app.config.get("WORD_CACHE_TTL", self.ttl)),
+            policy=app.config.get("WORD_CACHE_POLICY", self.policy),
+        )
+
+    def configure(self, maxsize: int = 1024, ttl: float = 600, policy: str = 'ttl', timer=time.monotonic):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown cache policy: {policy}")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.policy = policy
+        cache_class = _counting(POLICIES[policy])
+        with self._lock:
+            self._keys = {}
+            self._headwords = {}
+            if not maxsize:
+                self._cache = None
+            elif policy == 'ttl':
+                self._cache = cache_class(maxsize=maxsize, ttl=ttl, timer=timer)
+            else:
+                self._cache = cache_class(maxsize=maxsize)
+            if self._cache is not None:
+                self._cache.on_evict = self._forget
+            self._update_gauges()
+
+    def get(self, key: str) -> Optional[Any]:
+        if self._cache is None:
+            return None
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self._misses += 1
+                WORD_CACHE_REQUESTS.labels(result="miss").inc()
+            else:
+                self._hits += 1
+                WORD_CACHE_REQUESTS.labels(result="hit").inc()
+            self._update_gauges()
+            return value
+
+    def set(self, key: str, value: Any):
+        if self._cache is None:
+            return
+        with self._lock:
+            self._forget(key)
+            self._cache[key] = value
+            headword = value.get('word') if isinstance(value, dict) else None
+            if headword is not None:
+                self._headwords[key] = headword
+                self._keys.setdefault(headword, set()).add(key)
+            self._update_gauges()
+
+    '''
+    drop every entry for the given headword, including the entries cached under one of its variants
+    @param word: the headword that was written
+    @return: None
+    '''
+    def invalidate(self, word: str):
+        if self._cache is None:
+            return
+        with self._lock:
+            for key in self._keys.get(word, set()) | {word.lower()}:
+                self._cache.pop(key, None)
+                self._forget(key)
+            self._update_gauges()
+
+    # also the on_evict callback of the cache, which passes the evicted value
+    def _forget(self, key: str, value: Any = None):
+        headword = self._headwords.pop(key, None)
+        if headword is not None:
+            self._keys[headword].discard(key)
+            if not self._keys[headword]:
+                del self._keys[headword]
+
+    def clear(self):
+        with self._lock:
+            if self._cache is not None:
+                self._cache.clear()
+            self._keys = {}
+            self._headwords = {}
+            self._hits = 0
+            self._misses = 0
+            self._update_gauges()
+
+    def __len__(self):
+        return len(self._cache) if self._cache is not None else 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self._hits + self._misses
+        return self._hits / total if total else 0.0
+
+    def _update_gauges(self):
+        WORD_CACHE_SIZE.set(len(self))
+        WORD_CACHE_HIT_RATIO.set(self.hit_ratio)
+
+
+word_cache = WordCache()
+
+
+'''
+bounded cache of the normalized words the dictionary API answered 404 for, so a misspelling searched again
+is answered without another upstream call until its entry expires
+settings are read from the flask config: NOT_FOUND_CACHE_MAXSIZE (0 disables the cache) and
+NOT_FOUND_CACHE_TTL in seconds
+'''
+class NotFoundCache:
+    def __init__(self, app=None):
+        self._lock = threading.RLock()
+        self.configure()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.configure(
+            maxsize=int(app.config.get("NOT_FOUND_CACHE_MAXSIZE", self.maxsize)),
+            ttl=float(app.config.get("NOT_FOUND_CACHE_TTL", self.ttl)),
+        )
+
+    def configure(self, maxsize: int = 10000, ttl: float = 3600, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        with self._lock:
+            self._cache = TTLCache(maxsize=maxsize, ttl=ttl, timer=timer) if maxsize else None
+
+    def __contains__(self, word: str) -> bool:
+        if self._cache is None:
+            return False
+        with self._lock:
+            found = word in self._cache
+        NOT_FOUND_CACHE_REQUESTS.labels(result="hit" if found else "miss").inc()
+        return found
+
+    def add(self, word: str):
+        if self._cache is None:
+            return
+        with self._lock:
+            self._cache[word] = True
+
+    def discard(self, word: str):
+        if self._cache is None:
+            return
+        with self._lock:
+            self._cache.pop(word.lower(), None)
+
+    def clear(self):
+        with self._lock:
+            if self._cache is not None:
+                self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache) if self._cache is not None else 0
+
+
+not_found_cache = NotFoundCache()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+from src.util.metrics import CIRCUIT_STATE, CIRCUIT_TRANSITIONS, CIRCUIT_REJECTED
+from collections import deque
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger("root")
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+'''
+circuit breaker failing calls to a dependency fast while it is failing or too slow
+the outcomes of the last `window` calls are kept, a call fails when it raises, returns an error or takes
+longer than `slow_call` seconds; once `min_calls` are recorded and the failed share reaches `failure_ratio`
+the circuit opens and calls are rejected without being made, after `reset_timeout` seconds a single trial
+call is let through (half open) and closes the circuit again if it succeeds
+'''
+class CircuitBreaker:
+    def __init__(self, name: str, failure_ratio: float = 0.5, slow_call: float = 5.0, window: int = 20,
+                 min_calls: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.name = name
+        self._lock = threading.Lock()
+        self._clock = clock
+        self.configure(failure_ratio, slow_call, window, min_calls, reset_timeout)
+
+    def configure(self, failure_ratio: float = 0.5, slow_call: float = 5.0, window: int = 20,
+                  min_calls: int = 5, reset_timeout: float = 30.0):
+        self.failure_ratio = failure_ratio
+        self.slow_call = slow_call
+        self.window = window
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._outcomes = deque(maxlen=self.window)
+            self._opened_at = None
+            self._trial = False
+            self._set_state(CLOSED)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    '''
+    check whether a call may be made now, in half open state only one trial call is in flight at a time
+    @return: True if the call may be made, it has to be followed by record()
+    '''
+    def allow(self) -> bool:
+        if self.failure_ratio <= 0:
+            return True
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._set_state(HALF_OPEN)
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+        CIRCUIT_REJECTED.labels(name=self.name).inc()
+        return False
+
+    '''
+    record the outcome of a call that was allowed
+    @param success: False if the call raised or returned an error
+    @param duration: how long the call took in seconds, slow calls count as failures
+    @return: None
+    '''
+    def record(self, success: bool, duration: float = 0.0):
+        if self.failure_ratio <= 0:
+            return
+        failed = not success or duration > self.slow_call
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._trial = False
+                if failed:
+                    self._open()
+                else:
+                    self._outcomes.clear()
+                    self._set_state(CLOSED)
+                return
+            self._outcomes.append(failed)
+            if (self._state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and sum(self._outcomes) / len(self._outcomes) >= self.failure_ratio):
+                self._open()
+
+    def _open(self):
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self._set_state(OPEN)
+        logger.warning(f"Circuit {self.name} opened, calls are rejected for {self.reset_timeout}s")
+
+    def _set_state(self, state: str):
+        if getattr(self, "_state", state) != state:
+            CIRCUIT_TRANSITIONS.labels(name=self.name, state=state).inc()
+        self._state = state
+        CIRCUIT_STATE.labels(name=self.name).set(STATE_VALUES[state])
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+from google import genai
+from PIL import Image, features
+from src.util.metrics import IMAGE_QUEUE_DEPTH, IMAGE_JOBS, IMAGE_ENCODE_SECONDS, IMAGE_BYTES_SAVED, GEMINI_SECONDS
+from src.util.singleflight import SingleFlight
+from src.util.api import normalize_word
+from io import BytesIO
+from typing import Callable, Dict, Iterable, Optional, Tuple
+import eventlet
+from eventlet import tpool
+from eventlet.queue import LightQueue, Full
+import hashlib
+import os
+import tempfile
+import time
+import logging
+
+
+logger = logging.getLogger("root")
+# pillow logs every png chunk at debug level, from the encoder thread that would take the
+# (green) logging handler lock outside of the hub's thread, so only its warnings are kept
+logging.getLogger("PIL").setLevel(logging.WARNING)
+
+DEFAULT_MODEL = "gemini-2.5-flash-image"
+VARIANTS = ("full", "thumb")
+
+
+'''
+helper function to build the prompt sent to the image model
+@param word: the word to illustrate
+@return: the prompt
+'''
+def image_prompt(word: str) -> str:
+    return f"As a teacher, create a picture that can teach a stundent to learn the english word {word} such that they will never forget"
+
+
+'''
+helper function to resize the generated image and encode it in the formats served to clients,
+it runs in a native thread so it only takes and returns plain bytes
+@param data: the image bytes returned by the model
+@param sizes: the bounding box side in pixels of each variant, e.g. {"full": 1024, "thumb": 256}
+@param formats: the formats to encode each variant in, e.g. ("webp", "avif")
+@param quality: the encoder quality
+@return: the encoded bytes keyed by "<variant>.<format>"
+'''
+def encode_variants(data: bytes, sizes: Dict[str, int], formats: Tuple[str, ...], quality: int = 80) -> Dict[str, bytes]:
+    with Image.open(BytesIO(data)) as original:
+        image = original.convert("RGBA" if "A" in original.getbands() else "RGB")
+    variants = {}
+    for variant, size in sizes.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        for fmt in formats:
+            output = BytesIO()
+            resized.save(output, format=fmt.upper(), quality=quality)
+            variants[f"{variant}.{fmt}"] = output.getvalue()
+    return variants
+
+
+'''
+content-addressed store of generated images on local disk
+files are named after a hash of (word, prompt, model) so an image is generated once and its
+name changes whenever the prompt or the model does, which lets clients cache the files forever
+settings are read from the flask config: IMAGE_CACHE_DIR, defaults to <instance path>/images
+'''
+class ImageStore:
+    def __init__(self, app=None):
+        self.directory = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = app.config.get("IMAGE_CACHE_DIR", os.path.join(app.instance_path, "images"))
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, word: str, prompt: str, model: str) -> str:
+        return hashlib.sha256("\0".join((word, prompt, model)).encode("utf-8")).hexdigest()
+
+    def get(self, name: str) -> Optional[str]:
+        if self.directory and os.path.exists(os.path.join(self.directory, name)):
+            return name
+        return None
+
+    '''
+    write the image atomically so a concurrent reader never serves a partial file
+    @param name: the file name, the key followed by the extension
+    @param data: the image bytes
+    @return: the file name
+    '''
+    def put(self, name: str, data: bytes) -> str:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return name
+
+
+'''
+runs image generation as background jobs so search responses never wait on the image model
+jobs go through a bounded queue consumed by a fixed number of worker greenlets, a burst of searches
+beyond the queue size is rejected instead of piling up greenlets blocked on the model
+generated images are resized and encoded to webp (and avif when IMAGE_AVIF is set and pillow supports it)
+in eventlet's native thread pool, pillow releases the GIL while it resamples and encodes so this neither
+blocks the eventlet hub nor the other greenlets (a process pool is not used, it deadlocks under monkey patching)
+settings are read from the flask config: API_KEY, IMAGE_MODEL, IMAGE_WORKERS, IMAGE_QUEUE_SIZE,
+IMAGE_MAX_SIZE, IMAGE_THUMB_SIZE, IMAGE_QUALITY and IMAGE_AVIF
+'''
+class ImageGenerator:
+    def __init__(self, store: ImageStore, app=None):
+        self.store = store
+        self.api_key = None
+        self.model = DEFAULT_MODEL
+        self.workers = 4
+        self.queue_size = 32
+        self.max_size = 1024
+        self.thumb_size = 256
+        self.quality = 80
+        self.avif = False
+        self._client = None
+        self._queue = None
+        self._flight = SingleFlight("image")
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.api_key = app.config.get("API_KEY", self.api_key)
+        self.model = app.config.get("IMAGE_MODEL", self.model)
+        self.workers = int(app.config.get("IMAGE_WORKERS", self.workers))
+        self.queue_size = int(app.config.get("IMAGE_QUEUE_SIZE", self.queue_size))
+        self.max_size = int(app.config.get("IMAGE_MAX_SIZE", self.max_size))
+        self.thumb_size = int(app.config.get("IMAGE_THUMB_SIZE", self.thumb_size))
+        self.quality = int(app.config.get("IMAGE_QUALITY", self.quality))
+        self.avif = bool(app.config.get("IMAGE_AVIF", self.avif))
+        self._client = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    @property
+    def client(self) -> genai.Client:
+        # one client per process, it keeps its HTTP connections alive between jobs
+        if self._client is None:
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    @property
+    def formats(self) -> Tuple[str, ...]:
+        if self.avif and features.check("avif"):
+            return ("avif", "webp")
+        return ("webp",)
+
+    @property
+    def sizes(self) -> Dict[str, int]:
+        return {"full": self.max_size, "thumb": self.thumb_size}
+
+    '''
+    pick the variant served to a client
+    @param size: the variant the client asked for, full or thumb
+    @param accepted: the formats the client can display, in order of preference
+    @return: the (variant, format) pair, defaulting to the full webp image
+    '''
+    def choose(self, size: Optional[str] = None, accepted: Optional[Iterable[str]] = None) -> Tuple[str, str]:
+        variant = size if size in VARIANTS else "full"
+        fmt = next((f for f in accepted or () if f in self.formats), "webp")
+        return variant, fmt
+
+    def image_name(self, word: str, variant: str = "full", fmt: str = "webp") -> str:
+        return f"{self.store.key(word, image_prompt(word), self.model)}-{variant}.{fmt}"
+
+    '''
+    get the image for the word, from the store when it was generated before or from a background job
+    @param word: the word to illustrate, as stored or as typed
+    @param on_image: called with the stored file name, right away on a store hit or from the worker greenlet
+    @param variant: full or thumb
+    @param fmt: the image format, one of formats
+    @return: True if the image is stored or queued, False if generation is disabled or the queue is full
+    '''
+    def submit(self, word: str, on_image: Callable[[str], None], variant: str = "full", fmt: str = "webp") -> bool:
+        # normalized like search_word so "Hello" and " hello " share one model call and one file
+        word = normalize_word(word)
+        name = self.store.get(self.image_name(word, variant, fmt))
+        if name:
+            IMAGE_JOBS.labels(status="stored").inc()
+            on_image(name)
+            return True
+        if not self.enabled:
+            return False
+        if self._queue is None:
+            self._start()
+        try:
+            self._queue.put_nowait((word, on_image, variant, fmt))
+        except Full:
+            IMAGE_JOBS.labels(status="rejected").inc()
+            logger.warning(f"Image queue is full, skipping image for {word}")
+            return False
+        IMAGE_QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    '''
+    generate an image for the word with the image model
+    @param word: the word to illustrate
+    @return: the image bytes, or None if the model returned no image
+    '''
+    def generate(self, word: str) -> Optional[bytes]:
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = self.client.models.generate_content(
+                model=self.model,
+                contents=[image_prompt(word)],
+            )
+            outcome = "empty"
+            for part in response.candidates[0].content.parts:
+                if part.inline_data is not None:
+                    outcome = "image"
+                    return part.inline_data.data
+            return None
+        finally:
+            GEMINI_SECONDS.labels(outcome=outcome).observe(time.perf_counter() - start)
+
+    def _start(self):
+        self._queue = LightQueue(maxsize=self.queue_size)
+        for _ in range(self.workers):
+            eventlet.spawn_n(self._work, self._queue)
+
+    def _work(self, queue):
+        while True:
+            word, on_image, variant, fmt = queue.get()
+            IMAGE_QUEUE_DEPTH.set(queue.qsize())
+            try:
+                # identical jobs queued before the first one finished share its model call
+                stored = self._flight.do(word, self._generate_and_store, word)
+                if stored:
+                    on_image(self.image_name(word, variant, fmt))
+                IMAGE_JOBS.labels(status="done" if stored else "empty").inc()
+            except Exception as e:
+                IMAGE_JOBS.labels(status="error").inc()
+                logger.error(f"Image generation failed for {word}: {e}")
+
+    def _generate_and_store(self, word: str) -> bool:
+        if all(self.store.get(self.image_name(word, variant, fmt)) for variant in VARIANTS for fmt in self.formats):
+            return True
+        # the original is kept so new variants can be derived later without another model call
+        original = self.store.key(word, image_prompt(word), self.model) + ".png"
+        if self.store.get(original):
+            with open(os.path.join(self.store.directory, original), "rb") as f:
+                image = f.read()
+        else:
+            image = self.generate(word)
+            if not image:
+                return False
+            self.store.put(original, image)
+
+        variants = self.encode(image)
+        for key, data in variants.items():
+            variant, fmt = key.split(".")
+            self.store.put(self.image_name(word, variant, fmt), data)
+        return True
+
+    '''
+    resize and encode the image in a native thread, waiting for it only parks the greenlet
+    @param image: the image bytes returned by the model
+    @return: the encoded bytes keyed by "<variant>.<format>"
+    '''
+    def encode(self, image: bytes) -> Dict[str, bytes]:
+        start = time.perf_counter()
+        variants = tpool.execute(encode_variants, image, self.sizes, self.formats, self.quality)
+        IMAGE_ENCODE_SECONDS.observe(time.perf_counter() - start)
+        for fmt in self.formats:
+            IMAGE_BYTES_SAVED.labels(format=fmt).inc(max(len(image) - len(variants[f"full.{fmt}"]), 0))
+        return variants
+
+
+image_store = ImageStore()
+image_generator = ImageGenerator(image_store)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+from src.util.metrics import SOCKET_EVENT_SECONDS, SOCKET_EVENTS, SOCKET_EVENTS_IN_PROGRESS, SOCKET_EVENT_QUERIES
+from src.util.metrics import SQL_QUERIES, ACTIVE_GREENLETS
+from src.util.profiler import request_profiler
+from contextvars import ContextVar
+from functools import wraps
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import eventlet
+import gc
+import greenlet
+import logging
+import time
+
+
+logger = logging.getLogger("root")
+
+# the statements executed by the current socket event, None outside of one
+# every event runs in its own greenlet and greenlets have their own context, so concurrent events never mix
+_queries = ContextVar("queries", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    SQL_QUERIES.inc()
+    queries = _queries.get()
+    if queries is not None:
+        queries[0] += 1
+
+
+'''
+decorator to observe a Socket.IO handler: end-to-end latency, outcome, events in progress
+and the number of SQL statements it executed, which GunicornPrometheusMetrics cannot see since it only
+hooks the HTTP routes, a sample of the events is also profiled (see profiler.RequestProfiler)
+an exception raised by the handler is logged and counted as an error instead of being propagated
+the decorator goes below @socketio.on
+@param name: the event name used as the metric label
+@return: the decorator
+'''
+def observed(name: str):
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            queries = [0]
+            token = _queries.set(queries)
+            start = time.perf_counter()
+            status = "error"
+            SOCKET_EVENTS_IN_PROGRESS.labels(event=name).inc()
+            try:
+                with request_profiler.profile("socket", name):
+                    result = handler(*args, **kwargs)
+                status = "ok"
+                return result
+            except Exception as e:
+                # the client gets no answer either way, the error is logged and counted instead of
+                # ending up in the socketio server's log without the event it came from
+                logger.error(f"Socket event {name} failed: {e!r}")
+            finally:
+                SOCKET_EVENTS_IN_PROGRESS.labels(event=name).dec()
+                SOCKET_EVENT_SECONDS.labels(event=name).observe(time.perf_counter() - start)
+                SOCKET_EVENTS.labels(event=name, status=status).inc()
+                SOCKET_EVENT_QUERIES.labels(event=name).observe(queries[0])
+                _queries.reset(token)
+                # a handler called from another one also counts for the outer event
+                outer = _queries.get()
+                if outer is not None:
+                    outer[0] += queries[0]
+        return wrapper
+    return decorator
+
+
+'''
+helper function to count the greenlets alive in this process, walks the objects tracked by the garbage collector
+so it costs a few tens of milliseconds on a large heap and is meant for a periodic sample, not for every request
+@return: the number of started greenlets that have not finished
+'''
+def count_greenlets() -> int:
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, greenlet.greenlet) and obj)
+
+
+'''
+samples the number of alive greenlets into the active_greenlets gauge from a background greenlet
+settings are read from the flask config: METRICS_GREENLET_INTERVAL, seconds between samples (0 disables it)
+'''
+class GreenletSampler:
+    def __init__(self, app=None):
+        self.interval = 30.0
+        self._sampler = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.interval = float(app.config.get("METRICS_GREENLET_INTERVAL", self.interval))
+        if self.interval > 0 and self._sampler is None:
+            self._sampler = eventlet.spawn(self._run)
+
+    def sample(self) -> int:
+        count = count_greenlets()
+        ACTIVE_GREENLETS.set(count)
+        return count
+
+    def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning(f"Failed to count greenlets: {e}")
+            eventlet.sleep(self.interval)
+
+
+greenlet_sampler = GreenletSampler()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+from prometheus_client import Counter, Gauge, Histogram
+
+
+'''
+prometheus metrics shared by the helpers in src/util
+the metrics live in one module so they are registered exactly once per process
+'''
+WORD_LOOKUPS = Counter(
+    "word_lookups_total",
+    "Word lookups by where they were resolved (snapshot, db hit or upstream fetch)",
+    ["source"],
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_seconds",
+    "Latency of each request attempt to the dictionary API",
+    ["status"],
+)
+UPSTREAM_RETRIES = Counter(
+    "upstream_retries_total",
+    "Requests to the dictionary API that were retried",
+)
+UPSTREAM_THROTTLE_SECONDS = Histogram(
+    "upstream_throttle_seconds",
+    "Time requests to the dictionary API waited for the outbound rate limiter",
+)
+CIRCUIT_STATE = Gauge(
+    "circuit_state",
+    "State of the circuit breakers (0 closed, 1 half open, 2 open)",
+    ["name"],
+    multiprocess_mode="livemax",
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "circuit_transitions_total",
+    "Circuit breaker state changes by the state entered",
+    ["name", "state"],
+)
+CIRCUIT_REJECTED = Counter(
+    "circuit_rejected_total",
+    "Calls failed fast by an open circuit breaker",
+    ["name"],
+)
+NOT_FOUND_CACHE_REQUESTS = Counter(
+    "not_found_cache_requests_total",
+    "Lookups in the cache of words the dictionary API does not know",
+    ["result"],
+)
+WORD_CACHE_REQUESTS = Counter(
+    "word_cache_requests_total",
+    "Lookups in the in-process word cache",
+    ["result"],
+)
+WORD_CACHE_EVICTIONS = Counter(
+    "word_cache_evictions_total",
+    "Entries dropped from the in-process word cache",
+    ["reason"],
+)
+WORD_CACHE_SIZE = Gauge(
+    "word_cache_size",
+    "Entries currently held in the in-process word cache",
+    multiprocess_mode="livesum",
+)
+WORD_CACHE_HIT_RATIO = Gauge(
+    "word_cache_hit_ratio",
+    "Hit ratio of the in-process word cache since it was configured",
+    multiprocess_mode="liveall",
+)
+COALESCED_CALLS = Counter(
+    "coalesced_calls_total",
+    "Calls that waited for an identical in-flight call instead of running again",
+    ["name"],
+)
+IMAGE_QUEUE_DEPTH = Gauge(
+    "image_queue_depth",
+    "Image generation jobs waiting for a worker",
+    multiprocess_mode="livesum",
+)
+IMAGE_JOBS = Counter(
+    "image_jobs_total",
+    "Image requests by outcome (stored, done, empty, error, rejected)",
+    ["status"],
+)
+IMAGE_ENCODE_SECONDS = Histogram(
+    "image_encode_seconds",
+    "Time to resize and encode all variants of a generated image",
+)
+IMAGE_BYTES_SAVED = Counter(
+    "image_bytes_saved_total",
+    "Bytes saved by serving the encoded full size variant instead of the generated image",
+    ["format"],
+)
+SUGGEST_INDEX_WORDS = Gauge(
+    "suggest_index_words",
+    "Words held in the in-memory prefix index used for autocompletion",
+    multiprocess_mode="livemax",
+)
+SUGGEST_INDEX_BYTES = Gauge(
+    "suggest_index_bytes",
+    "Approximate memory used by the in-memory prefix index",
+    multiprocess_mode="livemax",
+)
+SPELL_INDEX_WORDS = Gauge(
+    "spell_index_words",
+    "Words held in the in-memory approximate match index used for did you mean suggestions",
+    multiprocess_mode="livemax",
+)
+SOCKET_RESPONSE_BYTES = Histogram(
+    "socket_response_bytes",
+    "Size of the word payloads emitted over Socket.IO, plain and (sampled) deflated like permessage-deflate",
+    ["event", "format", "encoding"],
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, float("inf")),
+)
+SOCKET_EVENT_SECONDS = Histogram(
+    "socket_event_seconds",
+    "End-to-end latency of the Socket.IO event handlers",
+    ["event"],
+)
+SOCKET_EVENTS = Counter(
+    "socket_events_total",
+    "Socket.IO events handled by outcome (ok or error)",
+    ["event", "status"],
+)
+SOCKET_EVENTS_IN_PROGRESS = Gauge(
+    "socket_events_in_progress",
+    "Socket.IO events being handled",
+    ["event"],
+    multiprocess_mode="livesum",
+)
+SOCKET_EVENT_QUERIES = Histogram(
+    "socket_event_queries",
+    "SQL statements executed while handling a Socket.IO event",
+    ["event"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, float("inf")),
+)
+SQL_QUERIES = Counter(
+    "sql_queries_total",
+    "SQL statements executed",
+)
+UPSTREAM_FETCH_SECONDS = Histogram(
+    "upstream_fetch_seconds",
+    "Latency of fetch_word including retries, by outcome (found, missing or unavailable)",
+    ["outcome"],
+)
+PARSE_WORD_SECONDS = Histogram(
+    "parse_word_seconds",
+    "Time parse_word spends storing a word in the database, by path (bulk or orm)",
+    ["path"],
+)
+GEMINI_SECONDS = Histogram(
+    "gemini_request_seconds",
+    "Latency of the image model calls by outcome (image, empty or error)",
+    ["outcome"],
+    buckets=(0.5, 1, 2.5, 5, 10, 15, 20, 30, 45, 60, float("inf")),
+)
+ACTIVE_GREENLETS = Gauge(
+    "active_greenlets",
+    "Greenlets alive in the process, sampled periodically",
+    multiprocess_mode="livesum",
+)
+PROFILES_WRITTEN = Counter(
+    "profiles_written_total",
+    "Profiles of sampled socket events and HTTP requests written to the profile directory",
+    ["kind"],
+)
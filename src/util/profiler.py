@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+from src.util.metrics import PROFILES_WRITTEN
+from contextlib import contextmanager
+from flask import g, request
+from typing import List, Optional
+import cProfile
+import greenlet
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+
+logger = logging.getLogger("root")
+
+PROFILE_SUFFIX = ".prof"
+
+
+'''
+opt-in sampling profiler of live socket events and HTTP requests
+a sampled event runs under cProfile and its stats are written to the profile directory, readable with
+pstats or snakeviz; all greenlets share one OS thread so only one event is profiled at a time and the profiler
+is paused whenever the hub switches to another greenlet (greenlet.settrace), the profile only holds the work
+of the sampled event and the time it spent waiting on I/O shows up as the gap between wall and profiled time
+when disabled the cost is one attribute check per event, when enabled one random draw for the events not sampled
+only the newest PROFILE_KEEP profiles are kept
+settings are read from the flask config: PROFILE_SAMPLE_RATE (share of events to profile, 0 disables it),
+PROFILE_DIR (defaults to instance/profiles), PROFILE_KEEP, PROFILE_MIN_SECONDS (faster events are not written)
+'''
+class RequestProfiler:
+    def __init__(self, app=None):
+        self.rate = 0.0
+        self.directory = None
+        self.keep = 50
+        self.min_seconds = 0.0
+        self._lock = threading.Lock()
+        self._active = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rate = float(app.config.get("PROFILE_SAMPLE_RATE", self.rate))
+        self.directory = app.config.get("PROFILE_DIR", os.path.join(app.instance_path, "profiles"))
+        self.keep = int(app.config.get("PROFILE_KEEP", self.keep))
+        self.min_seconds = float(app.config.get("PROFILE_MIN_SECONDS", self.min_seconds))
+        if self.rate > 0:
+            os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    '''
+    profile the enclosed block if this event is sampled and no other event is being profiled
+    @param kind: socket or http
+    @param name: the event name or the endpoint
+    @return: a context manager
+    '''
+    @contextmanager
+    def profile(self, kind: str, name: str):
+        session = self.start(kind, name)
+        try:
+            yield
+        finally:
+            if session is not None:
+                self.stop(session)
+
+    def start(self, kind: str, name: str) -> Optional[dict]:
+        if not self.rate or random.random() >= self.rate:
+            return None
+        with self._lock:
+            if self._active is not None:
+                return None
+            profiler = cProfile.Profile()
+            self._active = session = {
+                "kind": kind, "name": name, "profiler": profiler,
+                "greenlet": greenlet.getcurrent(), "start": time.perf_counter(),
+            }
+        session["previous_trace"] = greenlet.settrace(self._switch)
+        profiler.enable()
+        return session
+
+    def stop(self, session: dict):
+        session["profiler"].disable()
+        greenlet.settrace(session["previous_trace"])
+        with self._lock:
+            self._active = None
+        elapsed = time.perf_counter() - session["start"]
+        if elapsed < self.min_seconds:
+            return
+        try:
+            self._write(session, elapsed)
+        except OSError as e:
+            logger.warning(f"Failed to write the profile of {session['kind']} {session['name']}: {e}")
+
+    def _switch(self, event, args):
+        session = self._active
+        if session is not None and event in ("switch", "throw"):
+            origin, target = args
+            if origin is session["greenlet"]:
+                session["profiler"].disable()
+            elif target is session["greenlet"]:
+                session["profiler"].enable()
+        previous = session["previous_trace"] if session is not None else None
+        if previous is not None:
+            previous(event, args)
+
+    def _write(self, session: dict, elapsed: float):
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", session["name"])[:60]
+        now = time.time()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f"{now % 1:.3f}"[1:]
+        filename = f"{stamp}-{session['kind']}-{name}-{elapsed * 1000:.0f}ms{PROFILE_SUFFIX}"
+        session["profiler"].dump_stats(os.path.join(self.directory, filename))
+        PROFILES_WRITTEN.labels(kind=session["kind"]).inc()
+        self._rotate()
+
+    def _rotate(self):
+        profiles = self.list()
+        for profile in profiles[self.keep:]:
+            try:
+                os.remove(os.path.join(self.directory, profile["name"]))
+            except FileNotFoundError:
+                pass  # removed by another worker
+
+    '''
+    list the profiles written so far
+    @return: name, size in bytes and modification time of each profile, newest first
+    '''
+    def list(self) -> List[dict]:
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(PROFILE_SUFFIX):
+                stat = entry.stat()
+                profiles.append({"name": entry.name, "size": stat.st_size, "modified": stat.st_mtime})
+        profiles.sort(key=lambda profile: (profile["modified"], profile["name"]), reverse=True)
+        return profiles
+
+    def _before_request(self):
+        # the hooks are registered again when init_app is called again, only the first one starts a profile
+        if self.rate and "profile_session" not in g:
+            g.profile_session = self.start("http", request.endpoint or request.path)
+
+    def _teardown_request(self, exc=None):
+        session = g.pop("profile_session", None)
+        if session is not None:
+            self.stop(session)
+
+
+request_profiler = RequestProfiler()
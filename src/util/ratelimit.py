@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import threading
+import time
+
+
+'''
+token bucket limiting how often an action runs, e.g. calls to the dictionary API
+tokens are added continuously at `rate` per second up to `burst`, a rate of 0 disables the limit
+'''
+class TokenBucket:
+    def __init__(self, rate: float, burst: int = 1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    '''
+    take a token if one is available
+    @return: True if the action may run now
+    '''
+    def try_acquire(self) -> bool:
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    '''
+    wait until a token is available and take it
+    @return: the number of seconds spent waiting
+    '''
+    def acquire(self) -> float:
+        waited = 0.0
+        while not self.try_acquire():
+            with self._lock:
+                delay = (1 - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+        return waited
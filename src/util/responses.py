@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+from cachetools import LRUCache
+from flask import Response, current_app, request
+from typing import Optional
+import gzip
+import hashlib
+import threading
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always offered
+    brotli = None
+
+
+# content-codings offered to clients, best first
+ENCODINGS = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+_compressed = LRUCache(maxsize=512)
+_compressed_lock = threading.Lock()
+
+
+'''
+helper function to compress a body with the given content-coding
+@param body: the encoded body
+@param encoding: br or gzip
+@return: the compressed body
+'''
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    # mtime is fixed so the same body always compresses to the same bytes
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+'''
+helper function to pick the content-coding of the response from the Accept-Encoding header
+@param size: the size of the uncompressed body, bodies below COMPRESS_MIN_SIZE are sent as is
+@return: the content-coding, or None to send the body uncompressed
+'''
+def negotiate_encoding(size: int) -> Optional[str]:
+    if size < int(current_app.config.get("COMPRESS_MIN_SIZE", 500)):
+        return None
+    return request.accept_encodings.best_match(ENCODINGS)
+
+
+'''
+helper function to compress a body once per content and coding, hot entries are read over and over so the
+compressed bytes are kept in a small LRU keyed by the digest of the content
+@param digest: the digest of the body
+@param body: the encoded body
+@param encoding: br or gzip
+@return: the compressed body
+'''
+def compressed_body(digest: str, body: bytes, encoding: str) -> bytes:
+    key = (digest, encoding)
+    with _compressed_lock:
+        compressed = _compressed.get(key)
+    if compressed is None:
+        compressed = compress(body, encoding)
+        with _compressed_lock:
+            _compressed[key] = compressed
+    return compressed
+
+
+'''
+build a response that caches, proxies and browsers can keep: the strong ETag is the digest of the content
+(plus the content-coding, each representation has its own tag), a matching If-None-Match is answered with
+304 and no body, Cache-Control lets shared caches keep it for `max_age` seconds and Vary keeps the
+compressed and plain representations apart
+@param body: the encoded body
+@param mimetype: the media type of the body
+@param max_age: how long the response may be served from a cache without revalidation, in seconds
+@return: the response, a 304 if the client already has this representation
+'''
+def cacheable_response(body: bytes, mimetype: str, max_age: int) -> Response:
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    encoding = negotiate_encoding(len(body))
+    response = Response(mimetype=mimetype)
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if encoding is not None:
+        response.set_data(compressed_body(digest, body, encoding))
+        response.content_encoding = encoding
+        response.set_etag(f"{digest}-{encoding}")
+    else:
+        response.set_data(body)
+        response.set_etag(digest)
+    return response.make_conditional(request)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+from typing import Iterable, List, Optional, Tuple
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+
+
+logger = logging.getLogger("root")
+
+MAGIC = b"WORDSNP1"
+HEADER = struct.Struct("<8sQ")  # magic, number of words
+ENTRY = struct.Struct("<QIQI")  # key offset, key length, payload offset, payload length
+
+
+'''
+helper function to write a read-only snapshot of word payloads
+layout: header, a fixed size index of entries sorted by key, the keys blob and the payloads blob,
+offsets are absolute so the reader resolves an entry with two slices of the mapped file
+payloads are streamed to a temporary file while only the keys and offsets are kept in memory,
+the snapshot is replaced atomically so a node reading the old one never sees a partial file
+@param path: the snapshot file to write
+@param items: (word, payload) pairs, the payload is the Word.to_dict() json encoded as utf-8
+@return: the number of words written
+'''
+def write_snapshot(path: str, items: Iterable[Tuple[str, bytes]]) -> int:
+    directory = os.path.dirname(os.path.abspath(path))
+    entries = []
+    with tempfile.TemporaryFile(dir=directory) as blob:
+        for word, payload in items:
+            entries.append((word.encode("utf-8"), blob.tell(), len(payload)))
+            blob.write(payload)
+        entries.sort(key=lambda entry: entry[0])
+
+        keys_offset = HEADER.size + ENTRY.size * len(entries)
+        payloads_offset = keys_offset + sum(len(key) for key, _, _ in entries)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(MAGIC, len(entries)))
+                key_offset = keys_offset
+                for key, offset, length in entries:
+                    f.write(ENTRY.pack(key_offset, len(key), payloads_offset + offset, length))
+                    key_offset += len(key)
+                for key, _, _ in entries:
+                    f.write(key)
+                blob.seek(0)
+                while chunk := blob.read(1 << 20):
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return len(entries)
+
+
+'''
+memory-mapped reader of a snapshot written by write_snapshot (`flask export-snapshot`)
+lookups binary search the sorted index directly in the mapped file and payloads are served as
+memoryview slices of it, so a read-heavy node resolves stored words without a database session
+the snapshot is read-only and reflects the database when it was exported, words missing from it
+fall back to the database
+settings are read from the flask config: WORD_SNAPSHOT, the path of the snapshot (unset disables it)
+'''
+class WordSnapshot:
+    def __init__(self, app=None):
+        self.path = None
+        self._file = None
+        self._mmap = None
+        self._view = None
+        self._count = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.close()
+        path = app.config.get("WORD_SNAPSHOT")
+        if not path:
+            return
+        if not os.path.exists(path):
+            logger.warning(f"Word snapshot {path} does not exist, lookups use the database")
+            return
+        self.open(path)
+
+    def open(self, path: str):
+        self.close()
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self._count = HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a word snapshot")
+        except BaseException:
+            self.close()
+            raise
+        self._view = memoryview(self._mmap)
+        self.path = path
+
+    def close(self):
+        if self._view is not None:
+            self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+        if self._file is not None:
+            self._file.close()
+        self.path = self._file = self._mmap = self._view = None
+        self._count = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._view is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, index: int) -> Tuple[int, int, int, int]:
+        return ENTRY.unpack_from(self._mmap, HEADER.size + ENTRY.size * index)
+
+    '''
+    binary search the index for the word
+    @param word: the word exactly as stored
+    @return: a zero-copy view of the json payload, or None when the word is not in the snapshot
+    '''
+    def raw(self, word: str) -> Optional[memoryview]:
+        if not self.enabled:
+            return None
+        key = word.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            key_offset, key_length, payload_offset, payload_length = self._entry(middle)
+            # comparing needs bytes, keys are short so only they are copied, never the payloads
+            stored = self._mmap[key_offset:key_offset + key_length]
+            if stored == key:
+                return self._view[payload_offset:payload_offset + payload_length]
+            if stored < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def get(self, word: str) -> Optional[dict]:
+        payload = self.raw(word)
+        return json.loads(str(payload, "utf-8")) if payload is not None else None
+
+    '''
+    resolve the first candidate spelling found in the snapshot
+    @param candidates: the spellings in order of preference, see api.word_variants
+    @return: the Word.to_dict() payload, or None on a miss
+    '''
+    def lookup(self, candidates: List[str]) -> Optional[dict]:
+        for candidate in candidates:
+            payload = self.get(candidate)
+            if payload is not None:
+                return payload
+        return None
+
+
+word_snapshot = WordSnapshot()
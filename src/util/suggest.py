@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+from src.util.metrics import SUGGEST_INDEX_WORDS, SUGGEST_INDEX_BYTES
+from typing import Iterable, List
+import bisect
+import logging
+import sys
+import threading
+
+
+logger = logging.getLogger("root")
+
+
+'''
+in-memory prefix index of the stored words for autocompletion
+the lowercased words are kept in one sorted list, the completions of a prefix are the contiguous run
+starting at its bisect position, so a lookup is a binary search plus a slice of at most `limit` words
+a sorted list of strings costs a pointer and a string object per word (about 75 bytes for a dictionary
+word, see `make bench`), far less than a trie node per character
+the index is loaded from the database at startup and updated by parse_word, it stops growing at
+SUGGEST_MAX_WORDS so its memory stays bounded
+settings are read from the flask config: SUGGEST_MAX_WORDS (0 disables the index), SUGGEST_LIMIT
+'''
+class PrefixIndex:
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.max_words = 500000
+        self.limit = 10
+        self.clear()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_words = int(app.config.get("SUGGEST_MAX_WORDS", self.max_words))
+        self.limit = int(app.config.get("SUGGEST_LIMIT", self.limit))
+
+    def clear(self):
+        with self._lock:
+            self._keys = []
+            # the stored spelling of the words that are not lowercase, e.g. proper nouns
+            self._display = {}
+            self._string_bytes = 0
+            self._update_gauges()
+
+    '''
+    replace the index with the given words
+    @param words: the stored headwords, in any order
+    @return: None
+    '''
+    def load(self, words: Iterable[str]):
+        self.clear()
+        if not self.max_words:
+            return
+        with self._lock:
+            keys = {}
+            for word in words:
+                if len(keys) >= self.max_words:
+                    logger.warning(f"Suggest index is full at {self.max_words} words, the rest is not indexed")
+                    break
+                keys.setdefault(word.lower(), word)
+            self._keys = sorted(keys)
+            for key, word in keys.items():
+                self._account(key, word)
+            self._update_gauges()
+
+    def add(self, word: str):
+        key = word.lower()
+        with self._lock:
+            position = bisect.bisect_left(self._keys, key)
+            if position < len(self._keys) and self._keys[position] == key:
+                return
+            if len(self._keys) >= self.max_words:
+                return
+            self._keys.insert(position, key)
+            self._account(key, word)
+            self._update_gauges()
+
+    '''
+    complete the prefix with the indexed words, in alphabetical order so shorter words come first
+    @param prefix: the start of a word as typed by the user, case-insensitive
+    @param limit: the number of completions, at most the configured SUGGEST_LIMIT
+    @return: the completions as stored
+    '''
+    def suggest(self, prefix: str, limit: int = None) -> List[str]:
+        prefix = " ".join(prefix.split()).lower()
+        limit = min(int(limit or self.limit), self.limit)
+        if not prefix or limit <= 0:
+            return []
+        keys = self._keys
+        position = bisect.bisect_left(keys, prefix)
+        completions = []
+        for key in keys[position:position + limit]:
+            if not key.startswith(prefix):
+                break
+            completions.append(self._display.get(key, key))
+        return completions
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self._keys) + sys.getsizeof(self._display) + self._string_bytes
+
+    def _account(self, key: str, word: str):
+        self._string_bytes += sys.getsizeof(key)
+        if word != key:
+            self._display[key] = word
+            self._string_bytes += sys.getsizeof(word)
+
+    def _update_gauges(self):
+        SUGGEST_INDEX_WORDS.set(len(self._keys))
+        SUGGEST_INDEX_BYTES.set(self.memory_bytes)
+
+
+suggest_index = PrefixIndex()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+import requests # typing: ignore
+from requests.adapters import HTTPAdapter
+from tenacity import Retrying, stop_after_attempt, wait_random_exponential, retry_if_exception_type, retry_if_result
+from src.util.metrics import UPSTREAM_LATENCY, UPSTREAM_RETRIES, UPSTREAM_THROTTLE_SECONDS
+from src.util.ratelimit import TokenBucket
+from src.util.circuit import CircuitBreaker
+import time
+import logging
+
+
+logger = logging.getLogger("root")
+
+DEFAULT_BASE_URL = "https://api.dictionaryapi.dev/api/v2"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+
+'''
+raised instead of calling the dictionary API while its circuit breaker is open, and when it answers
+with an error other than 404 after the retries
+'''
+class UpstreamUnavailable(Exception):
+    pass
+
+
+'''
+shared HTTP client for the dictionary API
+a single requests.Session is reused by every greenlet so TLS connections are kept alive and pooled,
+app.py calls eventlet.monkey_patch() before this module is imported so the pool's sockets and
+locks are green and a slow upstream only parks the calling greenlet until the timeout fires
+settings are read from the flask config (FLASK_UPSTREAM_* environment variables):
+UPSTREAM_BASE_URL, UPSTREAM_POOL_SIZE, UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT,
+UPSTREAM_RETRIES (retries after the first attempt), UPSTREAM_BACKOFF and UPSTREAM_MAX_BACKOFF
+every attempt waits for a token of a bucket shared by all greenlets (UPSTREAM_RATE per second, 0 disables it,
+and UPSTREAM_BURST) and goes through a circuit breaker that fails fast while too many recent attempts errored
+or took longer than UPSTREAM_BREAKER_SLOW_CALL seconds: UPSTREAM_BREAKER_FAILURE_RATIO (0 disables it),
+UPSTREAM_BREAKER_WINDOW, UPSTREAM_BREAKER_MIN_CALLS and UPSTREAM_BREAKER_RESET in seconds
+'''
+class UpstreamClient:
+    def __init__(self, app=None):
+        self.base_url = DEFAULT_BASE_URL
+        self.pool_size = 20
+        self.connect_timeout = 3.05
+        self.read_timeout = 10.0
+        self.retries = 2
+        self.backoff = 0.2
+        self.max_backoff = 2.0
+        self.limiter = TokenBucket(rate=10, burst=20)
+        self.breaker = CircuitBreaker("upstream")
+        self._session = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.base_url = app.config.get("UPSTREAM_BASE_URL", self.base_url).rstrip("/")
+        self.pool_size = int(app.config.get("UPSTREAM_POOL_SIZE", self.pool_size))
+        self.connect_timeout = float(app.config.get("UPSTREAM_CONNECT_TIMEOUT", self.connect_timeout))
+        self.read_timeout = float(app.config.get("UPSTREAM_READ_TIMEOUT", self.read_timeout))
+        self.retries = int(app.config.get("UPSTREAM_RETRIES", self.retries))
+        self.backoff = float(app.config.get("UPSTREAM_BACKOFF", self.backoff))
+        self.max_backoff = float(app.config.get("UPSTREAM_MAX_BACKOFF", self.max_backoff))
+        self.limiter = TokenBucket(
+            rate=float(app.config.get("UPSTREAM_RATE", self.limiter.rate)),
+            burst=int(app.config.get("UPSTREAM_BURST", self.limiter.burst)),
+        )
+        self.breaker.configure(
+            failure_ratio=float(app.config.get("UPSTREAM_BREAKER_FAILURE_RATIO", 0.5)),
+            slow_call=float(app.config.get("UPSTREAM_BREAKER_SLOW_CALL", self.read_timeout / 2)),
+            window=int(app.config.get("UPSTREAM_BREAKER_WINDOW", 20)),
+            min_calls=int(app.config.get("UPSTREAM_BREAKER_MIN_CALLS", 5)),
+            reset_timeout=float(app.config.get("UPSTREAM_BREAKER_RESET", 30)),
+        )
+        self.close()
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    @property
+    def session(self) -> requests.Session:
+        # created lazily so the pool is built after eventlet has patched the socket module
+        if self._session is None:
+            session = requests.Session()
+            # retries are handled by tenacity below, urllib3 must not retry on its own
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+        return self._session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    '''
+    GET a path relative to the base url, retrying connection errors, timeouts and 429/5xx
+    responses with jittered exponential backoff
+    @param path: the path to request, e.g. /entries/en/hello
+    @return: the last response, which may be an error response once retries are exhausted
+    '''
+    def get(self, path: str) -> requests.Response:
+        retrying = Retrying(
+            # the first attempt is not a retry
+            stop=stop_after_attempt(self.retries + 1),
+            wait=wait_random_exponential(multiplier=self.backoff, max=self.max_backoff),
+            retry=(retry_if_exception_type((requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+                   | retry_if_result(lambda response: response.status_code in RETRY_STATUSES)),
+            before_sleep=self._before_sleep,
+            retry_error_callback=lambda state: state.outcome.result(),
+        )
+        return retrying(self._get_once, f"{self.base_url}{path}")
+
+    def _get_once(self, url: str) -> requests.Response:
+        # checked on every attempt so the retries of a request stop as soon as the circuit opens
+        if not self.breaker.allow():
+            raise UpstreamUnavailable(f"Circuit {self.breaker.name} is open, not requesting {url}")
+        waited = self.limiter.acquire()
+        if waited:
+            UPSTREAM_THROTTLE_SECONDS.observe(waited)
+        start = time.perf_counter()
+        status = "error"
+        success = False
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            status = str(response.status_code)
+            success = response.status_code not in RETRY_STATUSES
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            UPSTREAM_LATENCY.labels(status=status).observe(elapsed)
+            self.breaker.record(success, elapsed)
+
+    def _before_sleep(self, state):
+        UPSTREAM_RETRIES.inc()
+        logger.warning(f"Retrying upstream request (attempt {state.attempt_number}): {state.outcome}")
+
+
+client = UpstreamClient()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+from src.util.metrics import SOCKET_RESPONSE_BYTES
+import json
+import random
+import zlib
+
+
+'''
+wire formats of the word payload sent over Socket.IO, chosen by each client when it connects
+full: the Word.to_dict() payload as stored
+compact: ids, nulls and empty lists are dropped, the client treats a missing field as empty
+columnar: compact, and the definitions of a meaning are sent as one list per field instead of
+one object per definition so the keys are not repeated, missing values are null to keep the lists aligned
+'''
+FULL, COMPACT, COLUMNAR = "full", "compact", "columnar"
+FORMATS = (FULL, COMPACT, COLUMNAR)
+
+DEFINITION_FIELDS = ["definition", "example", "synonyms", "antonyms"]
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == [] or value == {}
+
+
+def _compact(value):
+    if isinstance(value, dict):
+        items = ((key, _compact(item)) for key, item in value.items() if key != "id")
+        return {key: item for key, item in items if not _is_empty(item)}
+    if isinstance(value, list):
+        return [_compact(item) for item in value]
+    return value
+
+
+def _columns(definitions: list) -> dict:
+    columns = {field: [definition.get(field) for definition in definitions] for field in DEFINITION_FIELDS}
+    return {field: values for field, values in columns.items() if any(not _is_empty(v) for v in values)}
+
+
+'''
+helper function to encode a payload in the wire format negotiated by the client
+@param payload: the Word.to_dict() payload, with or without the related words
+@param wire_format: full, compact or columnar, anything else is sent full
+@return: the payload to emit, the full payload is returned as is
+'''
+def encode_payload(payload: dict, wire_format: str) -> dict:
+    if wire_format not in (COMPACT, COLUMNAR) or payload is None:
+        return payload
+    encoded = _compact(payload)
+    if wire_format == COLUMNAR:
+        for meaning in encoded.get("meanings", []):
+            if "definitions" in meaning:
+                meaning["definitions"] = _columns(meaning["definitions"])
+    return encoded
+
+
+'''
+helper function to record the size of a Socket.IO response as the client receives it before transport compression,
+a sample of the responses is also deflated like the websocket permessage-deflate extension would so the
+saving of the compression shows next to the plain size
+@param event: the name of the emitted event
+@param wire_format: the wire format of the payload
+@param data: the emitted data
+@param sample: the share of responses measured deflated, 0 to 1
+@return: the size in bytes of the JSON encoded data
+'''
+def observe_size(event: str, wire_format: str, data: dict, sample: float = 0.0) -> int:
+    encoded = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    SOCKET_RESPONSE_BYTES.labels(event=event, format=wire_format, encoding="identity").observe(len(encoded))
+    if sample and random.random() < sample:
+        deflated = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        size = len(deflated.compress(encoded) + deflated.flush(zlib.Z_SYNC_FLUSH))
+        SOCKET_RESPONSE_BYTES.labels(event=event, format=wire_format, encoding="deflate").observe(size)
+    return len(encoded)
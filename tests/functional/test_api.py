@@ -6,9 +6,19 @@ Tests the entire flow from API calls to database storage.
 import pytest
 import requests
 from unittest.mock import patch, Mock, MagicMock
+import json
 import logging
-from src.util.api import process_request, fetch_word, parse_word
-from src.models.model import Word, Phonetic, Meaning, Definition
+import sqlite3
+import threading
+import time
+from sqlalchemy import event, select, update
+from src.util.api import process_request, fetch_word, parse_word, lookup_word, word_variants, word_stems, get_word_payload, search_word
+from src.util.api import store_word, parse_word_orm, related_words, search_many, commit_backfill, WordNotFound
+from src.util.fuzzy import spell_index
+from src.util.cache import word_cache, not_found_cache
+from src.util.metrics import WORD_LOOKUPS, COALESCED_CALLS
+from src.util.upstream import client as upstream
+from src.models.model import Word, Phonetic, Meaning, Definition, WordRelation
 from src.models.extensions import db
 
 
@@ -20,6 +30,9 @@ class TestWordProcessorIntegration:
         """Set up test database for each test"""
         with app.app_context():
             db.create_all()
+            word_cache.clear()
+            not_found_cache.clear()
+            upstream.breaker.reset()
             yield
             db.session.remove()
             db.drop_all()
@@ -97,25 +110,28 @@ class TestWordProcessorIntegration:
     def test_fetch_word_success(self, app, sample_api_response):
         """Test successful API call"""
         with app.app_context():
-            with patch('requests.get') as mock_get:
+            with patch('requests.Session.get') as mock_get:
                 mock_response = Mock()
                 mock_response.json.return_value = sample_api_response
                 mock_response.__bool__ = lambda x: True  # Make response truthy
+                mock_response.status_code = 200
                 mock_get.return_value = mock_response
                 
                 result = fetch_word("hello")
                 
                 mock_get.assert_called_once_with(
-                    "https://api.dictionaryapi.dev/api/v2/entries/en/hello"
+                    "https://api.dictionaryapi.dev/api/v2/entries/en/hello",
+                    timeout=upstream.timeout
                 )
                 assert result == sample_api_response
     
     def test_fetch_word_api_failure(self, app):
         """Test API call failure"""
         with app.app_context():
-            with patch('requests.get') as mock_get:
+            with patch('requests.Session.get') as mock_get:
                 mock_response = Mock()
                 mock_response.__bool__ = lambda x: False  # Make response falsy
+                mock_response.status_code = 404
                 mock_get.return_value = mock_response
                 
                 result = fetch_word("nonexistentword")
@@ -125,12 +141,31 @@ class TestWordProcessorIntegration:
     def test_fetch_word_network_error(self, app):
         """Test network error during API call"""
         with app.app_context():
-            with patch('requests.get') as mock_get:
+            with patch('requests.Session.get') as mock_get:
                 mock_get.side_effect = requests.exceptions.RequestException("Network error")
                 
                 with pytest.raises(requests.exceptions.RequestException):
                     fetch_word("hello")
 
+    def test_fetch_word_retries_transient_errors(self, app, sample_api_response):
+        """Test connection errors and 5xx responses are retried before giving up"""
+        with app.app_context():
+            with patch('requests.Session.get') as mock_get, patch.object(upstream, 'backoff', 0), \
+                    patch.object(upstream.breaker, 'failure_ratio', 0):
+                unavailable = Mock(status_code=503)
+                ok = Mock(status_code=200)
+                ok.json.return_value = sample_api_response
+                mock_get.side_effect = [requests.exceptions.ConnectionError("reset"), unavailable, ok]
+
+                assert fetch_word("hello") == sample_api_response
+                assert mock_get.call_count == 3
+
+                mock_get.reset_mock()
+                mock_get.side_effect = requests.exceptions.Timeout("read timed out")
+                with pytest.raises(requests.exceptions.Timeout):
+                    fetch_word("hello")
+                assert mock_get.call_count == upstream.retries + 1
+
     # Test parse_word function
     
     def test_parse_word_new_word(self, app, sample_api_response):
@@ -198,6 +233,62 @@ class TestWordProcessorIntegration:
             assert len(meaning.definitions) == 1
             assert meaning.definitions[0].definition == "A test definition"
 
+    def test_parse_word_resolves_phonetics_in_one_query(self, app, sample_api_response):
+        """Test phonetics are looked up with a single query and repeated ones are linked once"""
+        response = sample_api_response + [dict(sample_api_response[0], meanings=[])]
+        with app.app_context():
+            _, statements = self.count_queries(parse_word, response)
+
+            phonetic_lookups = [s for s in statements if s.startswith("SELECT") and "FROM phonetic" in s]
+            assert len(phonetic_lookups) == 1
+            assert Phonetic.query.count() == 2
+            assert len(Word.query.filter_by(word="hello").one().phonetics) == 2
+
+    def test_store_word_payload_matches_orm(self, app, sample_api_response):
+        """Test the payload built by the bulk insert is the one the ORM would serialize"""
+        with app.app_context():
+            word = parse_word(sample_api_response)
+            stored_payload = json.loads(word.payload)
+
+            assert stored_payload == word.to_dict()
+
+    def test_store_word_is_idempotent(self, app, sample_api_response):
+        """Test storing the same response twice keeps a single copy of the word and its phonetics"""
+        with app.app_context():
+            first_id, first_created = store_word(sample_api_response)
+            second_id, second_created = store_word(sample_api_response)
+            db.session.commit()
+
+            assert first_id == second_id
+            assert first_created and not second_created
+            assert Word.query.count() == 1
+            assert Phonetic.query.count() == 2
+            assert Meaning.query.count() == 2
+
+    def test_parse_word_orm_fallback(self, app, sample_api_response):
+        """Test databases without ON CONFLICT support store words through the ORM"""
+        with app.app_context():
+            with patch.dict('src.util.api.UPSERT_DIALECTS', clear=True):
+                with patch('src.util.api.parse_word_orm', wraps=parse_word_orm) as mock_orm:
+                    result = parse_word(sample_api_response)
+
+                    mock_orm.assert_called_once()
+            assert result.to_dict() == json.loads(result.payload)
+
+    @pytest.mark.parametrize("upsert", [True, False])
+    def test_parse_word_without_phonetic_text(self, app, upsert):
+        """Test entries without a phonetic or with audio-only phonetics are stored, the textless ones skipped"""
+        response = [{"word": "ghost", "phonetics": [{"audio": "https://example.com/ghost.mp3"}, {"text": "/ɡəʊst/"}],
+                     "meanings": [{"partOfSpeech": "noun", "definitions": [{"definition": "A spirit"}]}]}]
+        with app.app_context():
+            with patch.dict('src.util.api.UPSERT_DIALECTS', clear=not upsert):
+                result = parse_word(response)
+
+            assert result.phonetic == ""
+            assert [p.phonetic for p in result.phonetics] == ["/ɡəʊst/"]
+            assert Phonetic.query.count() == 1
+            assert result.to_dict() == json.loads(result.payload)
+
     # Test process_request function (end-to-end)
     
     def test_process_request_success(self, app, sample_api_response):
@@ -225,6 +316,24 @@ class TestWordProcessorIntegration:
                 with pytest.raises(RuntimeWarning, match="No data found for the given word: nonexistent"):
                     process_request("nonexistent")
     
+    def test_process_request_suggests_stored_words(self, app, sample_api_response):
+        """Test a misspelled word the API does not know is answered with the closest stored words"""
+        with app.app_context():
+            spell_index.clear()
+            parse_word(sample_api_response)
+            with patch('src.util.api.fetch_word') as mock_fetch:
+                mock_fetch.return_value = None
+
+                with pytest.raises(WordNotFound) as error:
+                    process_request("Helo")
+                assert error.value.word == "helo"
+                assert error.value.suggestions == ["hello"]
+
+                with pytest.raises(WordNotFound) as error:
+                    process_request("qwertyuiop")
+                assert error.value.suggestions == []
+            spell_index.clear()
+
     def test_process_request_database_error(self, app, sample_api_response):
         """Test process_request when database operation fails"""
         with app.app_context():
@@ -236,6 +345,387 @@ class TestWordProcessorIntegration:
                     with pytest.raises(Exception, match="Database error"):
                         process_request("hello")
 
+    def test_process_request_db_hit_skips_api(self, app, sample_api_response):
+        """Test a stored word is served from the database without calling the API"""
+        with app.app_context():
+            parse_word(sample_api_response)
+            db_hits = WORD_LOOKUPS.labels(source="db")._value.get()
+            with patch('src.util.api.fetch_word') as mock_fetch:
+                result = process_request("  Hello ")
+
+                mock_fetch.assert_not_called()
+                assert result.word == "hello"
+            assert WORD_LOOKUPS.labels(source="db")._value.get() == db_hits + 1
+
+    def test_lookup_word_resolves_variants(self, app, sample_api_response):
+        """Test case variants resolve to the stored headword but inflections do not"""
+        with app.app_context():
+            parse_word(sample_api_response)
+
+            assert lookup_word(" HELLO ").word == "hello"
+            assert lookup_word("HELLOS") is None
+            assert lookup_word("goodbye") is None
+            assert word_variants("Tries") == ["tries", "Tries", "TRIES"]
+            assert "try" in word_stems("tries")
+
+    @pytest.mark.parametrize("word, stem", [
+        ("news", "new"), ("seed", "see"), ("thing", "the"), ("does", "do"), ("his", "hi"), ("bless", "bl"),
+    ])
+    def test_process_request_prefers_the_exact_word(self, app, word, stem):
+        """Test a stored stem is not served for a word the dictionary API knows"""
+        with app.app_context():
+            parse_word(self.related_response(stem, []))
+            with patch('src.util.api.fetch_word') as mock_fetch:
+                mock_fetch.return_value = self.related_response(word, [])
+                assert search_word(word)["word"] == word
+                mock_fetch.assert_called_once_with(word)
+
+    def test_process_request_falls_back_to_stem(self, app, sample_api_response):
+        """Test an inflection the dictionary API does not know resolves to its stored stem"""
+        with app.app_context():
+            parse_word(sample_api_response)
+            with patch('src.util.api.fetch_word', return_value=None) as mock_fetch:
+                assert process_request("Hellos").word == "hello"
+                assert process_request("hellos").word == "hello"  # answered by the not-found cache
+                assert mock_fetch.call_count == 1
+                with pytest.raises(WordNotFound):
+                    process_request("goodbyes")
+
+    # Test get_word_payload function
+
+    def count_queries(self, func, *args):
+        """Run func and return its result with the statements it executed"""
+        statements = []
+        def count_query(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(db.engine, "before_cursor_execute", count_query)
+        try:
+            return func(*args), statements
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count_query)
+
+    def word_response(self, word, meanings):
+        return [
+            {
+                "word": word,
+                "phonetic": f"/{word}/",
+                "phonetics": [{"text": f"/{word}/"}, {"text": f"/{word}ə/"}],
+                "meanings": [
+                    {
+                        "partOfSpeech": f"pos{i}",
+                        "definitions": [{"definition": f"definition {i}.{j}"} for j in range(3)]
+                    }
+                    for i in range(meanings)
+                ]
+            }
+        ]
+
+    def test_get_word_payload_uses_stored_payload(self, app):
+        """Test the payload written by parse_word is served with a single query"""
+        with app.app_context():
+            parse_word(self.word_response("run", 5))
+            db.session.expunge_all()
+
+            payload, statements = self.count_queries(get_word_payload, "run")
+
+            assert len(statements) == 1
+            assert payload["word"] == "run"
+            assert len(payload["phonetics"]) == 2
+            assert len(payload["meanings"]) == 5
+            assert all(len(m["definitions"]) == 3 for m in payload["meanings"])
+
+    def test_get_word_payload_rebuild_constant_queries(self, app):
+        """Test a missing payload is rebuilt in a fixed number of queries and backfilled"""
+        with app.app_context():
+            parse_word(self.word_response("run", 5))
+            parse_word(self.word_response("go", 1))
+            db.session.execute(update(Word).values(payload=None))
+            db.session.commit()
+            db.session.expunge_all()
+
+            def rebuild(word):
+                payload = get_word_payload(word)
+                commit_backfill()
+                return payload
+
+            big, big_statements = self.count_queries(rebuild, "run")
+            small, small_statements = self.count_queries(rebuild, "go")
+
+            assert len(big_statements) == len(small_statements)
+            assert len(big["meanings"]) == 5
+            assert len(small["meanings"]) == 1
+            assert Word.query.filter_by(word="run").first().payload is not None
+
+    def test_get_word_payload_leaves_the_transaction_to_the_caller(self, app, sample_api_response):
+        """Test the backfilled payload is only written when the caller commits"""
+        with app.app_context():
+            parse_word(sample_api_response)
+            db.session.execute(update(Word).values(payload=None))
+            db.session.commit()
+
+            assert get_word_payload("hello")["word"] == "hello"
+            db.session.rollback()
+            assert db.session.execute(select(Word.payload)).scalar_one() is None
+
+            get_word_payload("hello")
+            commit_backfill()
+            db.session.expunge_all()
+            assert db.session.execute(select(Word.payload)).scalar_one() is not None
+
+    def test_payload_invalidated_on_update(self, app, sample_api_response):
+        """Test changing a definition clears the stored payload of its word"""
+        with app.app_context():
+            word = parse_word(sample_api_response)
+            assert word.payload is not None
+
+            word.meanings[0].definitions[0].example = "hello, world"
+            db.session.commit()
+            assert word.payload is None
+
+            payload = get_word_payload("hello")
+            assert payload["meanings"][0]["definitions"][0]["example"] == "hello, world"
+            assert word.payload is not None
+
+    def test_shared_phonetic_keeps_payloads(self, app):
+        """Test linking a new word to a stored phonetic keeps the payloads of the words already linked to it"""
+        def response(word):
+            return [{"word": word, "phonetic": "/ɹɛd/", "phonetics": [{"text": "/ɹɛd/"}],
+                     "meanings": [{"partOfSpeech": "verb", "definitions": [{"definition": word}]}]}]
+
+        with app.app_context():
+            parse_word_orm(response("red"))
+            parse_word_orm(response("read"))
+            db.session.expunge_all()
+            assert Word.query.filter_by(word="red").one().payload is not None
+
+            phonetic = Phonetic.query.one()
+            phonetic.audio_url = "https://example.com/red.mp3"
+            db.session.commit()
+            assert [word.payload for word in Word.query.all()] == [None, None]
+
+    def test_get_word_payload_missing_word(self, app):
+        """Test a word that is not stored has no payload"""
+        with app.app_context():
+            assert get_word_payload("missing") is None
+
+    def coalesced(self):
+        return COALESCED_CALLS.labels(name="upstream")._value.get()
+
+    def wait_for_waiters(self, target, timeout=2):
+        """Block the in-flight fetch until the other searches wait for it, a fixed sleep is flaky under gc pauses"""
+        deadline = time.monotonic() + timeout
+        while self.coalesced() < target and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    def test_concurrent_requests_coalesced(self, app, sample_api_response):
+        """Test concurrent searches for the same missing word fetch and insert it once"""
+        calls = []
+        waiters = self.coalesced() + 11
+        def slow_fetch(word):
+            calls.append(word)
+            self.wait_for_waiters(waiters)  # let the other searches arrive while this one is in flight
+            return sample_api_response
+
+        results, errors = [], []
+        def search(word):
+            with app.app_context():
+                try:
+                    results.append(process_request(word).word)
+                except Exception as e:
+                    errors.append(e)
+
+        with patch('src.util.api.fetch_word', side_effect=slow_fetch):
+            threads = [threading.Thread(target=search, args=(w,)) for w in ["hello", "Hello", " hello"] * 4]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert errors == []
+        assert results == ["hello"] * 12
+        assert calls == ["hello"]
+        with app.app_context():
+            assert Word.query.filter_by(word="hello").count() == 1
+
+    def test_concurrent_requests_share_errors(self, app):
+        """Test every coalesced search receives the error of the shared fetch"""
+        waiters = self.coalesced() + 4
+        def slow_fetch(word):
+            self.wait_for_waiters(waiters)
+            return None
+
+        errors = []
+        def search():
+            with app.app_context():
+                try:
+                    process_request("nonexistent")
+                except RuntimeWarning as e:
+                    errors.append(e)
+
+        with patch('src.util.api.fetch_word', side_effect=slow_fetch) as mock_fetch:
+            threads = [threading.Thread(target=search) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert len(errors) == 5
+        assert mock_fetch.call_count == 1
+
+    # Test the synonym graph
+
+    def related_response(self, word, synonyms, antonyms=(), definition_synonyms=()):
+        return [{"word": word, "phonetic": "", "phonetics": [], "meanings": [{
+            "partOfSpeech": "adjective", "synonyms": list(synonyms), "antonyms": list(antonyms),
+            "definitions": [{"definition": f"{word}.", "synonyms": list(definition_synonyms), "antonyms": []}],
+        }]}]
+
+    @pytest.mark.parametrize("store", [parse_word, parse_word_orm])
+    def test_relations_stored(self, app, store):
+        """Test the synonyms and antonyms of meanings and definitions are stored once as relations"""
+        with app.app_context():
+            store(self.related_response("happy", ["glad", "joyful", "happy"], ["sad"], ["glad", "cheerful"]))
+            rows = db.session.execute(
+                select(WordRelation.related, WordRelation.kind).order_by(WordRelation.id)
+            ).all()
+            assert [tuple(row) for row in rows] == [
+                ("glad", "synonym"), ("joyful", "synonym"), ("sad", "antonym"), ("cheerful", "synonym"),
+            ]
+
+    def test_related_words_hops(self, app):
+        """Test related words are found in both directions, hop by hop"""
+        with app.app_context():
+            parse_word(self.related_response("happy", ["glad"], ["sad"]))
+            parse_word(self.related_response("joyful", ["happy", "elated"]))
+            parse_word(self.related_response("elated", ["euphoric"]))
+
+            assert related_words("happy") == [{"word": "glad", "hops": 1}, {"word": "joyful", "hops": 1}]
+            assert related_words("happy", hops=3) == [
+                {"word": "glad", "hops": 1}, {"word": "joyful", "hops": 1},
+                {"word": "elated", "hops": 2}, {"word": "euphoric", "hops": 3},
+            ]
+            assert related_words("happy", hops=3, limit=2) == [{"word": "glad", "hops": 1}, {"word": "joyful", "hops": 1}]
+            assert related_words("sad", kind="antonym") == [{"word": "happy", "hops": 1}]
+            assert related_words("unknown", hops=2) == []
+
+            statements = self.count_queries(related_words, "happy", 3)[1]
+            assert len(statements) == 3  # one query per hop
+
+    def test_search_word_includes_related(self, app):
+        """Test the payload lists the related words and is refreshed when a word listing it is stored"""
+        with app.app_context():
+            with patch('src.util.api.fetch_word') as mock_fetch:
+                mock_fetch.return_value = self.related_response("happy", ["glad"], ["sad"])
+                assert search_word("happy")["related"] == {"synonyms": ["glad"], "antonyms": ["sad"]}
+
+                parse_word(self.related_response("cheerful", ["happy"]))
+                assert search_word("happy")["related"]["synonyms"] == ["cheerful", "glad"]
+
+    # Test search_word function
+
+    def test_search_word_served_from_cache(self, app, sample_api_response):
+        """Test repeated searches are answered by the cache without touching the database"""
+        with app.app_context():
+            with patch('src.util.api.fetch_word') as mock_fetch:
+                mock_fetch.return_value = sample_api_response
+                first = search_word("hello")
+
+                with patch('src.util.api.process_request') as mock_process:
+                    second = search_word("Hello")
+                    mock_process.assert_not_called()
+
+                assert second == first
+                assert mock_fetch.call_count == 1
+
+    # Test search_many function
+
+    def test_search_many_resolves_stored_words_in_one_query(self, app):
+        """Test stored words are answered with one IN query whatever their spelling"""
+        with app.app_context():
+            for word in ["cat", "dog"]:
+                parse_word(self.related_response(word, []))
+            with patch('src.util.api.fetch_word') as mock_fetch, patch('src.util.api.with_related', lambda p: p):
+                results, statements = self.count_queries(lambda words: list(search_many(words)), ["Cat", "dog", "DOG"])
+                mock_fetch.assert_not_called()
+            assert [(word, payload["word"]) for word, payload, _ in results] == [("Cat", "cat"), ("dog", "dog")]
+            assert len(statements) == 1
+
+    def test_search_many_fetches_misses_concurrently(self, app):
+        """Test only the misses are fetched, in parallel, and stored with one commit"""
+        in_flight = []
+        peak = []
+
+        def slow_fetch(word):
+            in_flight.append(word)
+            peak.append(len(in_flight))
+            time.sleep(0.05)
+            in_flight.remove(word)
+            return None if word == "xyzzy" else self.related_response(word, [])
+
+        with app.app_context():
+            parse_word(self.related_response("cat", []))
+            with patch('src.util.api.fetch_word', side_effect=slow_fetch) as mock_fetch, \
+                    patch.object(db.session, 'commit', wraps=db.session.commit) as mock_commit:
+                results = list(search_many(["cat", "dog", "owl", "xyzzy"]))
+                assert sorted(call.args[0] for call in mock_fetch.call_args_list) == ["dog", "owl", "xyzzy"]
+                assert mock_commit.call_count == 1
+            assert results[0][0] == "cat"  # stored words are answered before the fetched ones
+            found = {word: payload for word, payload, _ in results}
+            assert found["dog"]["word"] == "dog" and found["owl"]["word"] == "owl"
+            assert found["xyzzy"] is None and "xyzzy" in not_found_cache
+            assert max(peak) == 3
+            assert db.session.execute(select(Word.word).order_by(Word.word)).scalars().all() == ["cat", "dog", "owl"]
+
+    def test_search_many_writes_after_fetching(self, app):
+        """Test no write transaction is open while the batch waits on the API or on its consumer"""
+        database = db.engine.url.database
+
+        def write_elsewhere():
+            # a second connection that does not wait for the lock, it fails if the batch holds it
+            connection = sqlite3.connect(database, timeout=0)
+            try:
+                connection.execute("UPDATE word SET phonetic = phonetic")
+                connection.commit()
+            finally:
+                connection.close()
+
+        def fetch(word):
+            write_elsewhere()
+            return self.related_response(word, [])
+
+        with app.app_context():
+            parse_word(self.related_response("cat", []))
+            with patch('src.util.api.fetch_word', side_effect=fetch):
+                results = search_many(["dog", "owl"])
+                next(results)
+                write_elsewhere()  # the consumer is slow, the first word is already answered
+                assert len(list(results)) == 1
+
+    def test_search_many_caches_after_commit(self, app):
+        """Test nothing fetched is cached when the commit of the batch fails"""
+        with app.app_context():
+            with patch('src.util.api.fetch_word', side_effect=lambda word: self.related_response(word, [])), \
+                    patch.object(db.session, 'commit', side_effect=RuntimeError("disk full")):
+                with pytest.raises(RuntimeError):
+                    list(search_many(["dog"]))
+            assert word_cache.get("dog") is None
+            assert db.session.execute(select(Word.word)).scalars().all() == []
+
+    def test_search_many_limit(self, app):
+        """Test a batch above BATCH_MAX_WORDS is refused before anything is looked up"""
+        with app.app_context(), patch.dict(app.config, {"BATCH_MAX_WORDS": 2}):
+            with pytest.raises(ValueError):
+                next(search_many(["a", "b", "c"]))
+            assert len(list(search_many([]))) == 0
+
+    def test_parse_word_invalidates_cache(self, app, sample_api_response):
+        """Test storing a word drops stale cache entries for it"""
+        with app.app_context():
+            word_cache.set("hello", {"word": "hello", "stale": True})
+            parse_word(sample_api_response)
+
+            assert word_cache.get("hello") is None
+
     # Test complex scenarios
     
     def test_process_multiple_words_with_shared_phonetics(self, app):
@@ -3,6 +3,8 @@
 Tests for Flask HTTP endpoints
 """
 
+import gzip
+import json
 import pytest
 from unittest.mock import patch, Mock
 from flask import Flask
@@ -76,3 +78,290 @@ class TestHTTPEndpoints:
         response_text = response.data.decode('utf-8')
         # Prometheus metrics typically contain '# TYPE' and '# HELP' comments
         assert '# TYPE' in response_text or '# HELP' in response_text or len(response_text) > 0
+
+
+class TestSocketEvents:
+    """Test Socket.IO events of the Flask application"""
+
+    @pytest.fixture(autouse=True)
+    def setup_database(self, app):
+        """Set up test database for each test"""
+        with app.app_context():
+            db.create_all()
+            yield
+            db.session.remove()
+            db.drop_all()
+
+    def test_search_emits_text_and_queues_image(self, app, socketio):
+        """Test a search answers with the text response and hands the image to the background generator"""
+        with patch('app.search_word') as mock_search, patch('app.image_generator') as mock_images:
+            mock_search.return_value = {"word": "hello"}
+            mock_images.choose.return_value = ("full", "webp")
+            client = socketio.test_client(app, namespace='/test')
+            client.emit('search', {'wordInput': 'hello'}, namespace='/test')
+
+            received = client.get_received('/test')
+            assert [msg['name'] for msg in received] == ['text_response']
+            assert received[0]['args'][0] == {"data": {"word": "hello"}}
+            mock_images.submit.assert_called_once()
+            assert mock_images.submit.call_args[0][0] == 'hello'
+            client.disconnect(namespace='/test')
+
+
+    def test_search_unknown_word_emits_did_you_mean(self, app, socketio):
+        """Test a word that cannot be found is answered with suggestions instead of nothing"""
+        from src.util.api import WordNotFound
+        with patch('app.search_word') as mock_search, patch('app.image_generator') as mock_images:
+            mock_search.side_effect = WordNotFound("helo", ["hello", "help"])
+            mock_images.choose.return_value = ("full", "webp")
+            client = socketio.test_client(app, namespace='/test')
+            client.emit('search', {'wordInput': 'helo'}, namespace='/test')
+
+            received = client.get_received('/test')
+            assert [msg['name'] for msg in received] == ['did_you_mean']
+            assert received[0]['args'][0] == {"word": "helo", "suggestions": ["hello", "help"]}
+            mock_images.submit.assert_not_called()
+            client.disconnect(namespace='/test')
+
+    def test_search_compact_wire_format(self, app, socketio):
+        """Test a client connecting with the compact format receives the payload without ids and empty fields"""
+        payload = {"id": 1, "word": "hello", "phonetics": [], "meanings": [{"id": 2, "partOfSpeech": "noun", "synonyms": None}]}
+        with patch('app.search_word', return_value=payload), patch('app.image_generator') as mock_images:
+            mock_images.choose.return_value = ("full", "webp")
+            client = socketio.test_client(app, namespace='/test', auth={"format": "compact"})
+            client.emit('search', {'wordInput': 'hello'}, namespace='/test')
+            received = client.get_received('/test')
+            assert received[0]['args'][0] == {"data": {"word": "hello", "meanings": [{"partOfSpeech": "noun"}]}}
+            client.disconnect(namespace='/test')
+
+            client = socketio.test_client(app, namespace='/test')
+            client.emit('search', {'wordInput': 'hello'}, namespace='/test')
+            assert client.get_received('/test')[0]['args'][0] == {"data": payload}
+            client.disconnect(namespace='/test')
+
+    def test_search_is_observed(self, app, socketio):
+        """Test the search handler reports its latency, outcome and SQL statements to /metrics"""
+        from src.util.metrics import SOCKET_EVENTS, SOCKET_EVENT_QUERIES
+        ok = SOCKET_EVENTS.labels(event="search", status="ok")._value.get()
+        queries = SOCKET_EVENT_QUERIES.labels(event="search")._sum.get()
+        with patch('app.search_word', side_effect=lambda word: {"word": Word.query.filter_by(word=word).count()}), \
+                patch('app.image_generator') as mock_images:
+            mock_images.choose.return_value = ("full", "webp")
+            client = socketio.test_client(app, namespace='/test')
+            client.emit('search', {'wordInput': 'hello'}, namespace='/test')
+            client.disconnect(namespace='/test')
+        assert SOCKET_EVENTS.labels(event="search", status="ok")._value.get() - ok == 1
+        assert SOCKET_EVENT_QUERIES.labels(event="search")._sum.get() - queries == 1
+
+    def test_search_failure_is_counted(self, app, socketio):
+        """Test a search whose handler fails is counted as an error and the client gets no answer"""
+        from src.util.metrics import SOCKET_EVENTS
+        errors = SOCKET_EVENTS.labels(event="search", status="error")._value.get()
+        ok = SOCKET_EVENTS.labels(event="search", status="ok")._value.get()
+        with patch('app.search_word', side_effect=RuntimeError("database is locked")), \
+                patch('app.image_generator') as mock_images:
+            mock_images.choose.return_value = ("full", "webp")
+            client = socketio.test_client(app, namespace='/test')
+            client.emit('search', {'wordInput': 'hello'}, namespace='/test')
+            assert client.get_received('/test') == []
+            client.disconnect(namespace='/test')
+        assert SOCKET_EVENTS.labels(event="search", status="error")._value.get() - errors == 1
+        assert SOCKET_EVENTS.labels(event="search", status="ok")._value.get() == ok
+
+    def test_suggest_completes_stored_words(self, app, socketio):
+        """Test the suggest event answers with the completions of words stored by parse_word"""
+        from src.util.api import parse_word
+        from src.util.suggest import suggest_index
+        suggest_index.clear()
+        for word in ["hello", "help", "world"]:
+            parse_word([{"word": word, "phonetic": "", "phonetics": [],
+                         "meanings": [{"partOfSpeech": "noun", "definitions": [{"definition": word}]}]}])
+        client = socketio.test_client(app, namespace='/test')
+        client.emit('suggest', {'prefix': 'HEL'}, namespace='/test')
+        received = client.get_received('/test')
+        assert [msg['name'] for msg in received] == ['suggestions']
+        assert received[0]['args'][0] == {"prefix": "HEL", "data": ["hello", "help"]}
+        client.disconnect(namespace='/test')
+        suggest_index.clear()
+
+
+class TestBatchLookup:
+    """Test the batch word lookup over HTTP and Socket.IO"""
+
+    @pytest.fixture(autouse=True)
+    def setup_database(self, app):
+        """Set up test database for each test"""
+        with app.app_context():
+            db.create_all()
+            yield
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def results(self):
+        with patch('app.search_many') as mock_search:
+            mock_search.side_effect = lambda words: iter([("hello", {"word": "hello"}, []), ("helo", None, ["hello"])])
+            yield mock_search
+
+    def test_words_route_streams_json_lines(self, client, results):
+        """Test GET and POST /words stream one JSON object per word"""
+        requests = [lambda: client.get('/words?w=hello&words=helo'), lambda: client.post('/words', json={"words": ["hello", "helo"]})]
+        for request in requests:
+            response = request()
+            assert response.status_code == 200
+            assert response.mimetype == 'application/x-ndjson'
+            assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == [
+                {"word": "hello", "found": True, "data": {"word": "hello"}},
+                {"word": "helo", "found": False, "suggestions": ["hello"]},
+            ]
+        assert [call.args[0] for call in results.call_args_list] == [["hello", "helo"], ["hello", "helo"]]
+
+    def test_words_route_rejects_bad_input(self, client):
+        """Test a malformed body and a batch over the limit are answered with 400"""
+        with patch('src.util.api.fetch_word') as mock_fetch:
+            assert client.post('/words', json={"words": "hello"}).status_code == 400
+            assert client.post('/words', json=["hello"]).status_code == 400
+            assert client.post('/words', json={"words": ["hello", 1]}).status_code == 400
+            mock_fetch.assert_not_called()
+        with patch('app.search_many', side_effect=ValueError("too many")):
+            assert client.get('/words?w=a').status_code == 400
+
+    def test_search_many_event(self, app, socketio, results):
+        """Test the search_many event emits a response per word and a final count"""
+        client = socketio.test_client(app, namespace='/test')
+        client.emit('search_many', {'words': ['hello', 'helo']}, namespace='/test')
+        received = client.get_received('/test')
+        assert [msg['name'] for msg in received] == ['search_many_response', 'search_many_response', 'search_many_done']
+        assert received[1]['args'][0] == {"word": "helo", "found": False, "suggestions": ["hello"]}
+        assert received[2]['args'][0] == {"count": 2}
+        client.disconnect(namespace='/test')
+
+    def test_search_many_event_rejects_bad_input(self, app, socketio):
+        """Test a search_many event without a list of words is answered with an error, nothing is searched"""
+        client = socketio.test_client(app, namespace='/test')
+        with patch('src.util.api.fetch_word') as mock_fetch:
+            for data in [{'words': 'cat'}, ['cat'], {'words': [None]}]:
+                client.emit('search_many', data, namespace='/test')
+                received = client.get_received('/test')
+                assert [msg['name'] for msg in received] == ['search_many_done']
+                assert received[0]['args'][0] == {"count": 0, "error": "words must be a list of strings"}
+            mock_fetch.assert_not_called()
+        client.disconnect(namespace='/test')
+
+
+class TestWordRoute:
+    """Test the cacheable JSON endpoint of a word"""
+
+    payload = {"word": "hello", "meanings": [{"partOfSpeech": "noun", "definitions": [{"definition": "A greeting. " * 60}]}]}
+
+    def test_word_served_with_etag(self, client):
+        """Test the payload is served with a strong ETag, Cache-Control and a 304 for a matching If-None-Match"""
+        with patch('app.search_word', return_value=self.payload):
+            response = client.get('/api/words/hello')
+            assert response.status_code == 200
+            assert response.get_json() == self.payload
+            etag, weak = response.get_etag()
+            assert etag and not weak
+            assert response.cache_control.public and response.cache_control.max_age == 300
+            assert 'Accept-Encoding' in response.vary
+
+            revalidated = client.get('/api/words/hello', headers={'If-None-Match': f'"{etag}"'})
+            assert revalidated.status_code == 304
+            assert revalidated.data == b''
+
+        with patch('app.search_word', return_value=dict(self.payload, word="hullo")):
+            assert client.get('/api/words/hello', headers={'If-None-Match': f'"{etag}"'}).status_code == 200
+
+    def test_word_compressed(self, client):
+        """Test gzip is negotiated for large payloads and the compressed representation has its own ETag"""
+        with patch('app.search_word', return_value=self.payload):
+            plain = client.get('/api/words/hello')
+            response = client.get('/api/words/hello', headers={'Accept-Encoding': 'gzip'})
+            assert response.content_encoding == 'gzip'
+            assert len(response.data) < len(plain.data)
+            assert json.loads(gzip.decompress(response.data)) == self.payload
+            assert response.get_etag()[0] != plain.get_etag()[0]
+
+        with patch('app.search_word', return_value={"word": "hi"}):
+            assert client.get('/api/words/hi', headers={'Accept-Encoding': 'gzip'}).content_encoding is None
+
+    def test_word_compressed_with_brotli(self, client):
+        """Test brotli is preferred over gzip when the client accepts both"""
+        brotli = pytest.importorskip("brotli")
+        with patch('app.search_word', return_value=self.payload):
+            gzipped = client.get('/api/words/hello', headers={'Accept-Encoding': 'gzip'})
+            response = client.get('/api/words/hello', headers={'Accept-Encoding': 'gzip, br'})
+            assert response.content_encoding == 'br'
+            assert json.loads(brotli.decompress(response.data)) == self.payload
+            assert response.get_etag()[0] != gzipped.get_etag()[0]
+
+    def test_unknown_word(self, client):
+        """Test an unknown word is a 404 with the suggestions"""
+        from src.util.api import WordNotFound
+        with patch('app.search_word', side_effect=WordNotFound("helo", ["hello"])):
+            response = client.get('/api/words/helo')
+            assert response.status_code == 404
+            assert response.get_json()["suggestions"] == ["hello"]
+
+
+class TestProfiles:
+    """Test the sampling profiler and the admin routes listing its profiles"""
+
+    @pytest.fixture
+    def profiler(self, app, tmp_path):
+        from src.util.profiler import request_profiler
+        settings = {"ADMIN_TOKEN": "secret", "PROFILE_SAMPLE_RATE": 1.0, "PROFILE_DIR": str(tmp_path)}
+        with patch.dict(app.config, settings), \
+                patch.multiple(request_profiler, rate=1.0, directory=str(tmp_path)):
+            yield request_profiler
+
+    def test_requests_profiled_and_downloadable(self, client, profiler):
+        """Test a sampled request is profiled and the profile can be listed and downloaded with the token"""
+        assert client.get('/health').status_code == 200
+        listed = client.get('/admin/profiles', headers={'X-Admin-Token': 'secret'}).get_json()
+        assert listed["enabled"] and "health_check" in listed["profiles"][0]["name"]
+
+        name = listed["profiles"][0]["name"]
+        response = client.get(f'/admin/profiles/{name}', headers={'X-Admin-Token': 'secret'})
+        assert response.status_code == 200
+        assert response.headers['Content-Disposition'].startswith('attachment')
+        assert len(response.data) == listed["profiles"][0]["size"]
+
+    def test_admin_routes_need_the_token(self, client, profiler):
+        """Test the admin routes are hidden without the token and when no token is configured"""
+        assert client.get('/admin/profiles').status_code == 404
+        assert client.get('/admin/profiles', headers={'X-Admin-Token': 'wrong'}).status_code == 404
+        assert client.get('/admin/profiles/../app.py', headers={'X-Admin-Token': 'secret'}).status_code == 404
+        with patch.dict(client.application.config, {"ADMIN_TOKEN": ""}):
+            assert client.get('/admin/profiles', headers={'X-Admin-Token': ''}).status_code == 404
+
+
+class TestImageRoute:
+    """Test the route serving stored images"""
+
+    @pytest.fixture(autouse=True)
+    def image_directory(self, tmp_path):
+        """Store images in a temporary directory"""
+        from app import image_store
+        with patch.object(image_store, 'directory', str(tmp_path)):
+            yield image_store
+
+    def test_image_served_with_cache_headers(self, client, image_directory):
+        """Test stored images are served with an ETag and a long lived Cache-Control"""
+        image_store = image_directory
+        name = image_store.put(image_store.key('hello', 'prompt', 'model') + '.png', b'png')
+
+        response = client.get(f'/images/{name}')
+        assert response.status_code == 200
+        assert response.data == b'png'
+        assert response.headers['ETag']
+        assert 'immutable' in response.headers['Cache-Control']
+        assert 'max-age=31536000' in response.headers['Cache-Control']
+
+        response = client.get(f'/images/{name}', headers={'If-None-Match': response.headers['ETag']})
+        assert response.status_code == 304
+
+    def test_missing_image(self, client):
+        """Test unknown images are not found"""
+        response = client.get('/images/missing.png')
+        assert response.status_code == 404
@@ -0,0 +1,247 @@
+"""
+Tests for the Flask CLI commands
+"""
+
+import gzip
+import json
+import pytest
+import sqlite3
+from unittest.mock import patch
+from src.models.extensions import db
+from src.models.model import Word
+from src.util.api import parse_word, search_word
+from src.util.cache import word_cache
+from src.util.snapshot import word_snapshot
+from src.util.upstream import client as upstream
+
+
+def api_response(word):
+    return [{"word": word, "phonetic": f"/{word}/", "phonetics": [],
+             "meanings": [{"partOfSpeech": "noun", "definitions": [{"definition": f"A {word}"}]}]}]
+
+
+class TestPrewarmCommand:
+    """Test the prewarm command"""
+
+    @pytest.fixture(autouse=True)
+    def setup_database(self, app):
+        """Set up test database for each test"""
+        with app.app_context():
+            db.create_all()
+            yield
+            db.session.remove()
+            db.drop_all()
+
+    @pytest.fixture
+    def word_list(self, tmp_path):
+        path = tmp_path / "words.txt"
+        path.write_text("# lesson 1\nhello\nWorld\n\nhello\ntest\nxyzzy\nbank\n")
+        return path
+
+    def fake_fetch(self, word):
+        return None if word == "xyzzy" else api_response(word)
+
+    def test_prewarm_stores_missing_words(self, app, runner, word_list):
+        """Test words are fetched once, stored words are skipped and the checkpoint is removed"""
+        with app.app_context():
+            parse_word(api_response("test"))
+
+        with patch('src.cli.fetch_word', side_effect=self.fake_fetch) as mock_fetch:
+            result = runner.invoke(args=["prewarm", str(word_list), "--batch-size", "2", "--rate", "0"])
+
+        assert result.exit_code == 0, result.output
+        assert sorted(call.args[0] for call in mock_fetch.call_args_list) == ["bank", "hello", "world", "xyzzy"]
+        assert "stored=3 skipped=1 missing=1 failed=0" in result.output
+        assert not (word_list.parent / "words.txt.checkpoint").exists()
+        with app.app_context():
+            assert sorted(w.word for w in Word.query.all()) == ["bank", "hello", "test", "world"]
+
+    def test_prewarm_resumes_from_checkpoint(self, app, runner, word_list):
+        """Test a run resumes after the words recorded in the checkpoint"""
+        checkpoint = word_list.parent / "words.txt.checkpoint"
+        checkpoint.write_text(json.dumps({"word_list": str(word_list), "position": 3, "failed": []}))
+
+        with patch('src.cli.fetch_word', side_effect=self.fake_fetch) as mock_fetch:
+            result = runner.invoke(args=["prewarm", str(word_list), "--rate", "0"])
+
+        assert result.exit_code == 0, result.output
+        assert "Resuming after 3 of 5 words" in result.output
+        assert sorted(call.args[0] for call in mock_fetch.call_args_list) == ["bank", "xyzzy"]
+
+    def test_prewarm_keeps_checkpoint_with_failures(self, app, runner, word_list):
+        """Test failed words are recorded in the checkpoint while the rest of the batch is stored"""
+        def flaky_fetch(word):
+            if word == "world":
+                raise ConnectionError("reset")
+            if word == "bank":
+                return [{"word": "bank"}]  # malformed
+            return self.fake_fetch(word)
+
+        with patch('src.cli.fetch_word', side_effect=flaky_fetch):
+            result = runner.invoke(args=["prewarm", str(word_list), "--rate", "0"])
+
+        assert result.exit_code == 0, result.output
+        checkpoint = json.loads((word_list.parent / "words.txt.checkpoint").read_text())
+        assert checkpoint["failed"] == ["world"]
+        assert checkpoint["malformed"] == ["bank"]
+        assert checkpoint["position"] == 5
+        with app.app_context():
+            assert sorted(w.word for w in Word.query.all()) == ["hello", "test"]
+
+    def test_prewarm_writes_after_fetching(self, app, runner, word_list):
+        """Test no write transaction is open while a batch waits on the API, a live node can write meanwhile"""
+        with app.app_context():
+            database = db.engine.url.database
+
+        def fetch(word):
+            # a second connection that does not wait for the lock, it fails if the batch holds it
+            connection = sqlite3.connect(database, timeout=0)
+            try:
+                connection.execute("CREATE TABLE IF NOT EXISTS probe (id INTEGER)")
+                connection.execute("INSERT INTO probe VALUES (1)")
+                connection.commit()
+            finally:
+                connection.close()
+            return self.fake_fetch(word)
+
+        with patch('src.cli.fetch_word', side_effect=fetch):
+            result = runner.invoke(args=["prewarm", str(word_list), "--rate", "0", "--concurrency", "1"])
+
+        assert result.exit_code == 0, result.output
+        assert "stored=4 skipped=0 missing=1 failed=0 malformed=0" in result.output
+
+    def test_prewarm_retries_failed_words(self, app, runner, word_list):
+        """Test the words that failed in the previous run are fetched again and the checkpoint removed once they are stored"""
+        checkpoint = word_list.parent / "words.txt.checkpoint"
+        checkpoint.write_text(json.dumps({"word_list": str(word_list), "position": 5, "failed": ["world"]}))
+
+        with patch('src.cli.fetch_word', side_effect=self.fake_fetch) as mock_fetch:
+            result = runner.invoke(args=["prewarm", str(word_list), "--rate", "0"])
+
+        assert result.exit_code == 0, result.output
+        assert [call.args[0] for call in mock_fetch.call_args_list] == ["world"]
+        assert "1/1 retried words stored=1" in result.output
+        assert not checkpoint.exists()
+        with app.app_context():
+            assert [w.word for w in Word.query.all()] == ["world"]
+
+    def test_prewarm_rate_replaces_client_limit(self, app, runner, word_list):
+        """Test --rate is the limit of the dictionary API client during the run, not capped by UPSTREAM_RATE"""
+        limiter = upstream.limiter
+        rates = []
+
+        def fetch(word):
+            rates.append(upstream.limiter.rate)
+            return self.fake_fetch(word)
+
+        with patch('src.cli.fetch_word', side_effect=fetch):
+            result = runner.invoke(args=["prewarm", str(word_list), "--rate", "500"])
+
+        assert result.exit_code == 0, result.output
+        assert set(rates) == {500}
+        assert upstream.limiter is limiter
+
+
+class TestImportDumpCommand:
+    """Test the import-dump command"""
+
+    @pytest.fixture(autouse=True)
+    def setup_database(self, app):
+        """Set up test database for each test"""
+        with app.app_context():
+            db.create_all()
+            yield
+            db.session.remove()
+            db.drop_all()
+
+    def write_dump(self, path, lines, compress=False):
+        data = "\n".join(lines) + "\n"
+        if compress:
+            with gzip.open(path, "wt", encoding="utf-8") as f:
+                f.write(data)
+        else:
+            path.write_text(data)
+        return path
+
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_import_dump(self, app, runner, tmp_path, compress):
+        """Test a plain or gzip JSONL dump is imported, skipping stored words and malformed lines"""
+        with app.app_context():
+            parse_word(api_response("test"))
+        dump = self.write_dump(tmp_path / "dump.jsonl", [
+            json.dumps(api_response("hello")),
+            json.dumps(api_response("world")[0]),  # a single entry object
+            json.dumps(api_response("test")),
+            "{not json",
+            json.dumps([{"word": "broken"}]),
+            json.dumps(api_response("bank")),
+        ], compress)
+
+        result = runner.invoke(args=["import-dump", str(dump), "--batch-size", "2", "--progress-every", "3"])
+
+        assert result.exit_code == 0, result.output
+        assert "3 lines stored=2 skipped=1 malformed=0 invalid=0" in result.output
+        assert "6 lines stored=3 skipped=1 malformed=1 invalid=1" in result.output
+        with app.app_context():
+            assert sorted(w.word for w in Word.query.all()) == ["bank", "hello", "test", "world"]
+
+    def test_import_dump_needs_upsert(self, app, runner, tmp_path):
+        """Test the import stops before reading the dump on a database without ON CONFLICT"""
+        dump = self.write_dump(tmp_path / "dump.jsonl", [json.dumps(api_response("hello"))])
+
+        with patch.dict('src.util.api.UPSERT_DIALECTS', clear=True):
+            result = runner.invoke(args=["import-dump", str(dump)])
+
+        assert result.exit_code != 0
+        assert "ON CONFLICT" in result.output
+        with app.app_context():
+            assert Word.query.count() == 0
+
+    def test_offline_mode_never_calls_api(self, app):
+        """Test a word missing from an imported database is not fetched in offline mode"""
+        from src.util.api import process_request
+        with app.app_context():
+            parse_word(api_response("hello"))
+            with patch.dict(app.config, {"OFFLINE_MODE": True}):
+                with patch('src.util.api.fetch_word') as mock_fetch:
+                    assert process_request("hello").word == "hello"
+                    with pytest.raises(RuntimeWarning):
+                        process_request("world")
+                    mock_fetch.assert_not_called()
+
+
+class TestExportSnapshotCommand:
+    """Test the export-snapshot command"""
+
+    @pytest.fixture(autouse=True)
+    def setup_database(self, app):
+        """Set up test database for each test"""
+        with app.app_context():
+            db.create_all()
+            yield
+            db.session.remove()
+            db.drop_all()
+            word_cache.clear()
+            word_snapshot.close()
+
+    def test_export_snapshot_serves_lookups(self, app, runner, tmp_path):
+        """Test exported words are served from the snapshot without the database, other words still are"""
+        with app.app_context():
+            for word in ["hello", "world", "dog"]:
+                parse_word(api_response(word))
+            Word.query.filter_by(word="world").one().payload = None  # stored before payloads were cached
+            db.session.commit()
+        path = tmp_path / "words.snap"
+
+        result = runner.invoke(args=["export-snapshot", str(path), "--page-size", "2"])
+
+        assert result.exit_code == 0, result.output
+        assert "Exported 3 words" in result.output
+        word_snapshot.open(str(path))
+        with app.app_context():
+            parse_word(api_response("bank"))
+            with patch('src.util.api.process_request') as mock_process:
+                assert search_word(" DOG ")["word"] == "dog"
+                assert search_word("world")["meanings"][0]["definitions"][0]["definition"] == "A world"
+                mock_process.assert_not_called()
+            assert search_word("bank")["word"] == "bank"
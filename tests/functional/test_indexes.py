@@ -0,0 +1,40 @@
+"""
+Tests that the lookups done while storing and serializing words are served by indexes
+"""
+
+import pytest
+from sqlalchemy import text
+from src.models.extensions import db
+
+
+class TestQueryPlans:
+    """Check the query plans of the hot lookups"""
+
+    @pytest.fixture(autouse=True)
+    def setup_database(self, app):
+        """Set up test database for each test"""
+        with app.app_context():
+            db.create_all()
+            yield
+            db.session.remove()
+            db.drop_all()
+
+    def query_plan(self, statement):
+        rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {statement}")).all()
+        return " | ".join(row[-1] for row in rows)
+
+    @pytest.mark.parametrize("statement, index", [
+        ("SELECT * FROM phonetic WHERE phonetic IN ('/a/', '/b/')", "ix_phonetic_phonetic"),
+        ("SELECT * FROM meaning WHERE word_id IN (1, 2)", "ix_meaning_word_id"),
+        ("SELECT * FROM definition WHERE meaning_id IN (1, 2)", "ix_definition_meaning_id"),
+        ("SELECT * FROM word_phonetic_association WHERE word_id = 1", "ix_word_phonetic_association_word_id"),
+        ("SELECT * FROM word_phonetic_association WHERE phonetic_id = 1", "ix_word_phonetic_association_phonetic_id"),
+        ("SELECT * FROM word_relation WHERE word_id IN (1, 2) AND kind = 'synonym'", "sqlite_autoindex_word_relation_1"),
+        ("SELECT * FROM word_relation WHERE related IN ('a', 'b') AND kind = 'synonym'", "ix_word_relation_related"),
+    ])
+    def test_lookup_uses_index(self, app, statement, index):
+        """Test each lookup searches its index instead of scanning the table"""
+        with app.app_context():
+            plan = self.query_plan(statement)
+            assert f"USING INDEX {index}" in plan or f"USING COVERING INDEX {index}" in plan
+            assert "SCAN" not in plan
@@ -0,0 +1,104 @@
+"""
+Tests for the reverse dictionary search over definitions and examples
+"""
+
+import pytest
+from sqlalchemy import text
+from src.models.extensions import db
+from src.models.model import Definition
+from src.util.api import parse_word, parse_word_orm, reverse_search
+
+
+def api_response(word, *definitions):
+    return [{"word": word, "phonetic": f"/{word}/", "phonetics": [],
+             "meanings": [{"partOfSpeech": "noun", "definitions": [
+                 {"definition": definition, "example": example} for definition, example in definitions
+             ]}]}]
+
+
+class TestReverseSearch:
+    """Test the full-text search of the definitions"""
+
+    @pytest.fixture(autouse=True)
+    def setup_database(self, app):
+        """Set up test database with a few words for each test"""
+        with app.app_context():
+            db.create_all()
+            parse_word(api_response("ocean", ("A very large body of salt water.", "They sailed across the ocean.")))
+            parse_word(api_response("lake", ("A body of water surrounded by land.", None)))
+            parse_word_orm(api_response("pond", ("A small body of still water.", "Ducks swim in the pond.")))
+            parse_word(api_response("river", ("A stream flowing to the sea.", "Salt water was far away.")))
+            yield
+            db.session.remove()
+            db.drop_all()
+
+    def test_definitions_are_indexed_on_insert(self, app):
+        """Test words stored by the bulk and the ORM paths are found, ranked by relevance"""
+        with app.app_context():
+            result = reverse_search("body of water")
+            assert result["total"] == 3
+            assert {row["word"] for row in result["results"]} == {"ocean", "lake", "pond"}
+            assert reverse_search("salt water")["results"][0]["word"] == "ocean"  # definition before example
+            assert reverse_search("ducks")["results"] == [{
+                "word": "pond", "partOfSpeech": "noun",
+                "definition": "A small body of still water.", "example": "Ducks swim in the pond.",
+            }]
+
+    def test_query_syntax_is_not_interpreted(self, app):
+        """Test FTS5 operators in the input are searched as plain words"""
+        with app.app_context():
+            assert reverse_search('water" OR NOT "x*')["total"] == 0
+            assert reverse_search("  ?! ")["results"] == []
+            assert reverse_search("WATERS")["total"] == 4  # stemmed and case folded
+
+    def test_pagination(self, app):
+        """Test results are split in pages without overlap"""
+        with app.app_context():
+            first = reverse_search("water", page=1, per_page=3)
+            second = reverse_search("water", page=2, per_page=3)
+            assert first["total"] == second["total"] == 4
+            assert len(first["results"]) == 3 and len(second["results"]) == 1
+            assert not {r["word"] for r in first["results"]} & {r["word"] for r in second["results"]}
+            assert reverse_search("water", per_page=1000)["per_page"] == 50
+
+    def test_index_follows_updates_and_deletes(self, app):
+        """Test changed and deleted definitions are reindexed"""
+        with app.app_context():
+            definition = Definition.query.filter(Definition.definition.like("A stream%")).one()
+            definition.definition = "A natural flow of fresh water."
+            db.session.commit()
+            assert reverse_search("stream")["total"] == 0
+            assert reverse_search("fresh water")["results"][0]["word"] == "river"
+
+            db.session.delete(definition)
+            db.session.commit()
+            assert reverse_search("fresh")["total"] == 0
+
+    def test_rebuild_command(self, app, runner):
+        """Test the index is rebuilt from the definition table"""
+        with app.app_context():
+            db.session.execute(text("INSERT INTO definition_fts(definition_fts) VALUES ('delete-all')"))
+            db.session.commit()
+            assert reverse_search("water")["total"] == 0
+
+        result = runner.invoke(args=["rebuild-fulltext"])
+
+        assert result.exit_code == 0, result.output
+        with app.app_context():
+            assert reverse_search("water")["total"] == 4
+
+    def test_http_endpoint(self, app, client):
+        """Test the endpoint returns a page of results"""
+        response = client.get("/reverse-search?q=body+of+water&page=2&per_page=2")
+        assert response.status_code == 200
+        assert response.json["page"] == 2 and response.json["total"] == 3
+        assert len(response.json["results"]) == 1
+
+    def test_socket_event(self, app, socketio):
+        """Test the reverse_search event answers with the results"""
+        client = socketio.test_client(app, namespace='/test')
+        client.emit('reverse_search', {'query': 'ducks'}, namespace='/test')
+        received = client.get_received('/test')
+        assert [msg['name'] for msg in received] == ['reverse_search_response']
+        assert received[0]['args'][0]["data"]["results"][0]["word"] == "pond"
+        client.disconnect(namespace='/test')
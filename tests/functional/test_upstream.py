@@ -0,0 +1,119 @@
+"""
+Tests of the dictionary API client against a local stub server
+"""
+
+import eventlet
+import eventlet.wsgi
+import json
+import pytest
+import time
+from unittest.mock import patch
+from src.models.extensions import db
+from src.util.api import process_request, WordNotFound
+from src.util.cache import not_found_cache
+from src.util.circuit import OPEN
+from src.util.metrics import CIRCUIT_REJECTED, UPSTREAM_THROTTLE_SECONDS
+from src.util.upstream import client as upstream
+
+
+class StubDictionary:
+    """Answers /entries/en/<word> like the dictionary API, `status` sets the answer of every request"""
+    requests = []
+    status = 200
+
+    def __call__(self, environ, start_response):
+        word = environ["PATH_INFO"].rsplit("/", 1)[-1]
+        StubDictionary.requests.append(word)
+        if word.startswith("slow"):
+            eventlet.sleep(1)  # well past the read timeout of the client
+        if StubDictionary.status != 200 or word.startswith("xyz"):
+            status = 404 if StubDictionary.status == 200 else StubDictionary.status
+            start_response(f"{status} Error", [("Content-Length", "0")])
+            return [b""]
+        body = json.dumps([{"word": word, "phonetic": "", "phonetics": [],
+                            "meanings": [{"partOfSpeech": "noun", "definitions": [{"definition": word}]}]}])
+        start_response("200 OK", [("Content-Type", "application/json")])
+        return [body.encode()]
+
+
+class TestUpstreamClient:
+    """Test the negative cache, rate limiter and circuit breaker in front of the dictionary API"""
+
+    @pytest.fixture(autouse=True)
+    def stub(self, app):
+        # a green server, the app runs monkey patched so a real thread would block the hub
+        listener = eventlet.listen(("127.0.0.1", 0))
+        handlers = eventlet.GreenPool()
+        server = eventlet.spawn(eventlet.wsgi.server, listener, StubDictionary(), log_output=False, custom_pool=handlers)
+        StubDictionary.requests, StubDictionary.status = [], 200
+        settings = {
+            "UPSTREAM_BASE_URL": f"http://127.0.0.1:{listener.getsockname()[1]}",
+            "UPSTREAM_RETRIES": 1,
+            "UPSTREAM_BACKOFF": 0,
+            "UPSTREAM_RATE": 0,
+            "UPSTREAM_BREAKER_MIN_CALLS": 4,
+            "UPSTREAM_BREAKER_RESET": 0.2,
+            "UPSTREAM_READ_TIMEOUT": 0.1,
+        }
+        with app.app_context(), patch.dict(app.config, settings):
+            upstream.init_app(app)
+            not_found_cache.clear()
+            db.create_all()
+            yield
+            db.session.remove()
+            db.drop_all()
+        server.kill()
+        # the requests the client gave up on are still being answered
+        for handler in list(handlers.coroutines_running):
+            handler.kill()
+        listener.close()
+        upstream.init_app(app)
+        not_found_cache.clear()
+
+    def test_not_found_words_are_cached(self, app):
+        """Test a word the API does not know is requested once, and a stored word not at all"""
+        assert process_request("hello").word == "hello"
+        assert process_request("hello").word == "hello"
+        for _ in range(3):
+            with pytest.raises(WordNotFound):
+                process_request("xyzzy")
+        assert StubDictionary.requests == ["hello", "xyzzy"]
+
+    def test_circuit_opens_and_fails_fast(self, app):
+        """Test a failing API is not called while the circuit is open, and is again once it recovers"""
+        StubDictionary.status = 503
+        rejected = CIRCUIT_REJECTED.labels(name="upstream")._value.get()
+        for word in ["one", "two", "three"]:
+            with pytest.raises(WordNotFound):
+                process_request(word)
+        assert upstream.breaker.state == OPEN
+        assert len(StubDictionary.requests) == 4  # two attempts each until the circuit opened
+        assert CIRCUIT_REJECTED.labels(name="upstream")._value.get() > rejected
+        assert "three" not in not_found_cache  # an outage is not a missing word
+
+        StubDictionary.status = 200
+        time.sleep(0.25)
+        assert process_request("three").word == "three"
+        assert upstream.breaker.state != OPEN
+
+    def test_rate_limited(self, app):
+        """Test outbound calls beyond the burst wait for the token bucket"""
+        with patch.dict(app.config, {"UPSTREAM_RATE": 20, "UPSTREAM_BURST": 1}):
+            upstream.init_app(app)
+        throttled = UPSTREAM_THROTTLE_SECONDS._sum.get()
+        start = time.monotonic()
+        for word in ["one", "two", "three"]:
+            process_request(word)
+        assert time.monotonic() - start >= 0.09
+        assert UPSTREAM_THROTTLE_SECONDS._sum.get() - throttled > 0  # the calls themselves refill part of the wait
+
+    def test_upstream_timeout_is_not_found(self, app):
+        """Test an API that answers past the read timeout on every attempt gives a 404 with suggestions, not a 500"""
+        with pytest.raises(WordNotFound):
+            process_request("slowpoke")
+        assert StubDictionary.requests == ["slowpoke", "slowpoke"]
+        assert "slowpoke" not in not_found_cache  # a timeout is not a missing word
+
+        response = app.test_client().get("/api/words/slowcoach")
+        assert response.status_code == 404
+        assert "suggestions" in response.get_json()
@@ -0,0 +1,119 @@
+from src.util.cache import WordCache, NotFoundCache
+from src.util.metrics import WORD_CACHE_EVICTIONS
+
+
+def test_cache_hit_and_miss():
+    """
+    GIVEN an empty WordCache
+    WHEN a payload is stored and read back
+    THEN check misses and hits are counted in the hit ratio
+    """
+    cache = WordCache()
+    assert cache.get('hello') is None
+    cache.set('hello', {'word': 'hello'})
+    assert cache.get('hello') == {'word': 'hello'}
+    assert cache.hit_ratio == 0.5
+
+
+def test_cache_evicts_least_recently_used():
+    """
+    GIVEN an lru WordCache holding two entries
+    WHEN a third entry is stored
+    THEN check the least recently used entry is evicted and counted
+    """
+    cache = WordCache()
+    cache.configure(maxsize=2, policy='lru')
+    evictions = WORD_CACHE_EVICTIONS.labels(reason="size")._value.get()
+    cache.set('a', {'word': 'a'})
+    cache.set('b', {'word': 'b'})
+    cache.get('a')
+    cache.set('c', {'word': 'c'})
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert len(cache) == 2
+    assert WORD_CACHE_EVICTIONS.labels(reason="size")._value.get() == evictions + 1
+
+
+def test_cache_entries_expire():
+    """
+    GIVEN a ttl WordCache driven by a fake clock
+    WHEN the clock moves past the ttl
+    THEN check the entry is gone
+    """
+    now = [0]
+    cache = WordCache()
+    cache.configure(maxsize=10, ttl=5, policy='ttl', timer=lambda: now[0])
+    cache.set('hello', {'word': 'hello'})
+    now[0] = 4
+    assert cache.get('hello') is not None
+    now[0] = 6
+    assert cache.get('hello') is None
+
+
+def test_cache_invalidate_drops_variants():
+    """
+    GIVEN payloads cached under a word and one of its variants
+    WHEN the word is invalidated
+    THEN check both entries are dropped
+    """
+    cache = WordCache()
+    cache.set('dog', {'word': 'dog'})
+    cache.set('dogs', {'word': 'dog'})
+    cache.set('cat', {'word': 'cat'})
+    cache.invalidate('dog')
+    assert cache.get('dog') is None
+    assert cache.get('dogs') is None
+    assert cache.get('cat') is not None
+
+
+def test_cache_disabled():
+    """
+    GIVEN a WordCache configured with maxsize 0
+    WHEN a payload is stored
+    THEN check nothing is cached
+    """
+    cache = WordCache()
+    cache.configure(maxsize=0)
+    cache.set('hello', {'word': 'hello'})
+    assert cache.get('hello') is None
+
+
+def test_not_found_cache_expires_and_discards():
+    """
+    GIVEN a cache of unknown words with a 60 second ttl
+    WHEN words are added, discarded and time passes
+    THEN check a word is only known until it expires or is stored after all
+    """
+    now = [0.0]
+    cache = NotFoundCache()
+    cache.configure(maxsize=10, ttl=60, timer=lambda: now[0])
+    cache.add("helo")
+    cache.add("wrold")
+    cache.discard("Wrold")
+    assert "helo" in cache and "wrold" not in cache
+    now[0] += 61
+    assert "helo" not in cache
+
+    cache.configure(maxsize=0)
+    cache.add("helo")
+    assert "helo" not in cache
+
+
+def test_cache_invalidate_after_eviction():
+    """
+    GIVEN a full LRU WordCache
+    WHEN entries are evicted, overwritten with another headword and invalidated
+    THEN check only the live entries of the headword are dropped and the index does not grow
+    """
+    cache = WordCache()
+    cache.configure(maxsize=2, policy='lru')
+    cache.set('dogs', {'word': 'dog'})
+    cache.set('cat', {'word': 'cat'})
+    cache.set('owl', {'word': 'owl'})  # evicts dogs
+    assert cache._keys == {'cat': {'cat'}, 'owl': {'owl'}}
+    cache.set('cat', {'word': 'Cat'})
+    assert cache._keys == {'Cat': {'cat'}, 'owl': {'owl'}}
+    cache.invalidate('Cat')
+    assert cache.get('cat') is None
+    assert cache.get('owl') is not None
+    assert cache._keys == {'owl': {'owl'}}
@@ -0,0 +1,69 @@
+from src.util.circuit import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_circuit_opens_on_failures_and_recovers():
+    """
+    GIVEN a breaker opening at half of at least 4 calls failing, for 10 seconds
+    WHEN calls fail, time passes and the trial call succeeds
+    THEN check calls are rejected while open, one trial is let through and the circuit closes again
+    """
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_ratio=0.5, window=10, min_calls=4, reset_timeout=10, clock=clock)
+    for success in (True, False, True):
+        assert breaker.allow()
+        breaker.record(success)
+    assert breaker.state == CLOSED  # too few calls to judge
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.now += 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # a single trial at a time
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_circuit_counts_slow_calls_and_reopens():
+    """
+    GIVEN a breaker treating calls over one second as failures
+    WHEN slow calls open it and the trial call is slow too
+    THEN check the circuit opens again for another reset timeout
+    """
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_ratio=1, slow_call=1, min_calls=2, reset_timeout=5, clock=clock)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record(True, duration=3)
+    assert breaker.state == OPEN
+
+    clock.now += 5
+    assert breaker.allow()
+    breaker.record(True, duration=3)
+    assert breaker.state == OPEN
+    clock.now += 4
+    assert not breaker.allow()
+
+
+def test_circuit_disabled():
+    """
+    GIVEN a breaker with a failure ratio of 0
+    WHEN every call fails
+    THEN check calls are never rejected
+    """
+    breaker = CircuitBreaker("test", failure_ratio=0, min_calls=1)
+    for _ in range(5):
+        assert breaker.allow()
+        breaker.record(False)
+    assert breaker.state == CLOSED
@@ -0,0 +1,66 @@
+from sqlalchemy import create_engine, text
+from src.models.extensions import configure_sqlite, sqlite_pragmas, engine_options
+import time
+
+
+def make_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/test.db")
+    configure_sqlite(engine, sqlite_pragmas({"SQLITE_BUSY_TIMEOUT": 2000}))
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE word (id INTEGER PRIMARY KEY, word TEXT)"))
+        connection.execute(text("INSERT INTO word (word) VALUES ('hello')"))
+    return engine
+
+
+def test_pragmas_applied(tmp_path):
+    """
+    GIVEN an engine configured with the default pragmas
+    WHEN a connection is opened
+    THEN check WAL, synchronous=NORMAL and the busy timeout are set
+    """
+    engine = make_engine(tmp_path)
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 2000
+
+
+def test_reads_proceed_during_writes(tmp_path):
+    """
+    GIVEN a writer holding an open write transaction
+    WHEN a reader queries the table and a second writer commits
+    THEN check the reader is not blocked and sees the last committed data
+    """
+    engine = make_engine(tmp_path)
+    writer = engine.raw_connection()
+    reader = engine.raw_connection()
+    try:
+        writer.execute("BEGIN IMMEDIATE")
+        writer.execute("INSERT INTO word (word) VALUES ('world')")
+
+        start = time.perf_counter()
+        count = reader.execute("SELECT COUNT(*) FROM word").fetchone()[0]
+        assert count == 1
+        assert time.perf_counter() - start < 0.5
+
+        # a long running read does not stop the writer from committing either
+        reader.execute("BEGIN")
+        reader.execute("SELECT COUNT(*) FROM word").fetchone()
+        writer.commit()
+        assert reader.execute("SELECT COUNT(*) FROM word").fetchone()[0] == 1
+        reader.commit()
+        assert reader.execute("SELECT COUNT(*) FROM word").fetchone()[0] == 2
+    finally:
+        writer.close()
+        reader.close()
+
+
+def test_engine_options():
+    """
+    GIVEN database uris
+    WHEN the engine options are built
+    THEN check file databases get a sized pool and in-memory ones keep the default
+    """
+    assert engine_options({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"}) == {}
+    options = engine_options({"SQLALCHEMY_DATABASE_URI": "sqlite:///project.db", "DB_POOL_SIZE": 4})
+    assert options["pool_size"] == 4
@@ -0,0 +1,45 @@
+import pytest
+from src.util.fuzzy import SpellIndex, edit_distance
+
+
+@pytest.mark.parametrize("a, b, distance", [
+    ("hello", "hello", 0),
+    ("hello", "helo", 1),
+    ("hello", "hallo", 1),
+    ("hello", "hlelo", 1),  # adjacent letters swapped
+    ("hello", "help", 2),
+    ("hello", "world", 3),  # capped at max_distance + 1
+    ("a", "abcd", 3),
+])
+def test_edit_distance(a, b, distance):
+    assert edit_distance(a, b, 2) == distance
+
+
+def test_spell_index_lookup():
+    """
+    GIVEN an index of stored words allowing two edits
+    WHEN misspelled words are looked up
+    THEN check the closest words are returned first, and nothing for words too far from any
+    """
+    index = SpellIndex()
+    index.max_distance = 2
+    index.load(["hello", "help", "hell", "yellow", "English", "dictionary", "hello"])
+    assert len(index) == 6
+    assert index.lookup("helo")[:2] == [("hell", 1), ("hello", 1)]
+    assert ("help", 1) in index.lookup("helo")
+    assert index.lookup("englsh") == [("English", 1)]
+    assert index.lookup("dictoinary") == [("dictionary", 1)]  # typo after the indexed prefix
+    assert index.lookup("zzzzzz") == []
+    assert len(index.lookup("hel", limit=2)) == 2
+
+
+def test_spell_index_disabled():
+    """
+    GIVEN an index with SPELL_MAX_DISTANCE set to 0
+    WHEN words are added
+    THEN check nothing is indexed or suggested
+    """
+    index = SpellIndex()
+    index.max_distance = 0
+    index.load(["hello"])
+    assert len(index) == 0 and index.lookup("helo") == []
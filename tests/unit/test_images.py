@@ -0,0 +1,151 @@
+from unittest.mock import patch, Mock
+from src.util.images import ImageGenerator, ImageStore, encode_variants
+from PIL import Image
+from io import BytesIO
+import eventlet
+import pytest
+
+
+def png_bytes(width, height):
+    output = BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(output, format='PNG')
+    return output.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ImageStore()
+    store.directory = str(tmp_path)
+    return store
+
+
+def fake_response(data):
+    part = Mock()
+    part.inline_data.data = data
+    candidate = Mock()
+    candidate.content.parts = [part]
+    return Mock(candidates=[candidate])
+
+
+def test_submit_disabled_without_api_key(store):
+    """
+    GIVEN an ImageGenerator without an API key
+    WHEN an image is requested
+    THEN check no job is queued
+    """
+    generator = ImageGenerator(store)
+    assert generator.submit('hello', Mock()) is False
+
+
+def test_jobs_run_in_background_with_shared_client(store):
+    """
+    GIVEN an ImageGenerator with an API key
+    WHEN several images are requested
+    THEN check they are generated by the workers with a single client and stored
+    """
+    generator = ImageGenerator(store)
+    generator.api_key = 'key'
+    images = []
+    with patch('src.util.images.genai.Client') as mock_client:
+        mock_client.return_value.models.generate_content.return_value = fake_response(png_bytes(64, 64))
+        assert generator.submit('hello', images.append)
+        assert generator.submit('world', images.append, 'thumb')
+        assert images == []  # nothing runs until the caller yields
+        with eventlet.Timeout(10):
+            while len(images) < 2:
+                eventlet.sleep(0.01)
+    assert sorted(images) == sorted([generator.image_name('hello'), generator.image_name('world', 'thumb')])
+    assert mock_client.call_count == 1
+    with Image.open(f"{store.directory}/{generator.image_name('hello')}") as image:
+        assert image.format == 'WEBP'
+
+
+def test_stored_image_skips_model(store):
+    """
+    GIVEN an image already in the store
+    WHEN the same word is requested again
+    THEN check the stored file is returned right away without a model call
+    """
+    generator = ImageGenerator(store)
+    store.put(generator.image_name('hello'), b'webp')
+    images = []
+    with patch('src.util.images.genai.Client') as mock_client:
+        assert generator.submit('hello', images.append)
+        assert generator.submit(' Hello ', images.append)  # the same word as typed differently
+    assert images == [generator.image_name('hello')] * 2
+    mock_client.assert_not_called()
+
+
+def test_store_key_depends_on_prompt_and_model(store):
+    """
+    GIVEN the same word
+    WHEN the prompt or the model changes
+    THEN check the store key changes too
+    """
+    key = store.key('hello', 'prompt', 'model')
+    assert key == store.key('hello', 'prompt', 'model')
+    assert key != store.key('hello', 'other prompt', 'model')
+    assert key != store.key('hello', 'prompt', 'other model')
+
+
+def test_submit_rejects_when_queue_full(store):
+    """
+    GIVEN an ImageGenerator whose queue is full
+    WHEN another image is requested
+    THEN check the job is rejected
+    """
+    generator = ImageGenerator(store)
+    generator.api_key = 'key'
+    generator.workers = 0
+    generator.queue_size = 1
+    assert generator.submit('hello', Mock()) is True
+    assert generator.submit('world', Mock()) is False
+
+
+def test_encode_variants_bounds_size():
+    """
+    GIVEN a large generated image
+    WHEN its variants are encoded
+    THEN check each variant fits its bounding box and is smaller than the original
+    """
+    original = png_bytes(2048, 1024)
+    variants = encode_variants(original, {'full': 1024, 'thumb': 256}, ('webp',))
+    assert set(variants) == {'full.webp', 'thumb.webp'}
+    with Image.open(BytesIO(variants['full.webp'])) as image:
+        assert image.size == (1024, 512)
+    with Image.open(BytesIO(variants['thumb.webp'])) as image:
+        assert image.size == (256, 128)
+    assert len(variants['thumb.webp']) < len(variants['full.webp']) < len(original)
+
+
+def test_encode_does_not_block_hub(store):
+    """
+    GIVEN an ImageGenerator encoding a large image
+    WHEN another greenlet runs meanwhile
+    THEN check it keeps being scheduled while the image is encoded
+    """
+    generator = ImageGenerator(store)
+    ticks = []
+    def ticker():
+        while True:
+            ticks.append(1)
+            eventlet.sleep(0)
+    thread = eventlet.spawn(ticker)
+    variants = generator.encode(png_bytes(2048, 2048))
+    thread.kill()
+    assert set(variants) == {'full.webp', 'thumb.webp'}
+    assert len(ticks) > 1
+
+
+def test_choose_variant():
+    """
+    GIVEN the formats a client accepts
+    WHEN the variant to serve is chosen
+    THEN check unsupported formats and sizes fall back to the full webp image
+    """
+    generator = ImageGenerator(ImageStore())
+    assert generator.choose() == ('full', 'webp')
+    assert generator.choose('thumb', ['avif', 'webp']) == ('thumb', 'webp')
+    assert generator.choose('huge', ['gif']) == ('full', 'webp')
+    generator.avif = True
+    assert generator.choose('thumb', ['avif', 'webp']) == ('thumb', 'avif')
@@ -0,0 +1,59 @@
+import eventlet
+import eventlet.event
+from sqlalchemy import create_engine, text
+from src.util.instrumentation import observed, count_greenlets, greenlet_sampler
+from src.util.metrics import SOCKET_EVENTS, SOCKET_EVENT_QUERIES, SOCKET_EVENT_SECONDS, ACTIVE_GREENLETS
+
+
+def test_observed_counts_queries_and_outcome():
+    """
+    GIVEN a handler executing two SQL statements and one failing after one
+    WHEN both are called through the observed decorator
+    THEN check the latency, outcome and statements of each call are recorded for its event only
+    """
+    engine = create_engine("sqlite://")
+
+    @observed("test_ok")
+    def handler(count):
+        with engine.connect() as connection:
+            for _ in range(count):
+                connection.execute(text("SELECT 1"))
+        return count
+
+    @observed("test_error")
+    def failing():
+        handler(1)
+        raise ValueError("failed")
+
+    queries = SOCKET_EVENT_QUERIES.labels(event="test_ok")._sum.get()
+    latency = SOCKET_EVENT_SECONDS.labels(event="test_error")._sum.get()
+    ok = SOCKET_EVENTS.labels(event="test_ok", status="ok")._value.get()
+    errors = SOCKET_EVENTS.labels(event="test_error", status="error")._value.get()
+
+    assert handler(2) == 2
+    assert failing() is None  # logged and counted, not propagated
+
+    assert SOCKET_EVENT_QUERIES.labels(event="test_ok")._sum.get() - queries == 3
+    assert SOCKET_EVENT_QUERIES.labels(event="test_error")._sum.get() == 1
+    assert SOCKET_EVENT_SECONDS.labels(event="test_error")._sum.get() > latency
+    assert SOCKET_EVENTS.labels(event="test_ok", status="ok")._value.get() - ok == 2
+    assert SOCKET_EVENTS.labels(event="test_error", status="error")._value.get() - errors == 1
+
+
+def test_count_greenlets():
+    """
+    GIVEN greenlets parked on an event
+    WHEN the greenlets are sampled
+    THEN check they are counted while alive and not once finished
+    """
+    done = eventlet.event.Event()
+    eventlet.sleep(0)  # the hub greenlet is started by the first switch
+    before = count_greenlets()
+    threads = [eventlet.spawn(done.wait) for _ in range(5)]
+    eventlet.sleep(0)
+    assert greenlet_sampler.sample() >= before + 5
+    assert ACTIVE_GREENLETS._value.get() >= before + 5
+    done.send()
+    for thread in threads:
+        thread.wait()
+    assert count_greenlets() <= before
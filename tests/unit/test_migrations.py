@@ -0,0 +1,120 @@
+from sqlalchemy import create_engine, inspect, text
+from src.models.extensions import db
+from src.models.migrations import upgrade
+
+
+def test_upgrade_adds_missing_columns():
+    """
+    GIVEN a database created before the word.payload column existed
+    WHEN upgrade is run
+    THEN check the column is added and running it again is a no-op
+    """
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE word (id INTEGER PRIMARY KEY, word VARCHAR(45), phonetic VARCHAR)'))
+    upgrade(engine)
+    upgrade(engine)
+    columns = {column['name'] for column in inspect(engine).get_columns('word')}
+    assert 'payload' in columns
+
+
+def test_upgrade_merges_phonetics_and_creates_indexes():
+    """
+    GIVEN a database created before the indexes existed, with a phonetic stored twice
+    WHEN upgrade is run
+    THEN check the duplicate is merged into the first row and every model index is created
+    """
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE word (id INTEGER PRIMARY KEY, word VARCHAR(45) UNIQUE, phonetic VARCHAR, payload TEXT)'))
+        connection.execute(text('CREATE TABLE phonetic (id INTEGER PRIMARY KEY, phonetic VARCHAR, audio_url VARCHAR)'))
+        connection.execute(text('CREATE TABLE word_phonetic_association (word_id INTEGER, phonetic_id INTEGER)'))
+        connection.execute(text('CREATE TABLE meaning (id INTEGER PRIMARY KEY, "partOfSpeech" VARCHAR(30), synonyms TEXT, antonyms TEXT, word_id INTEGER)'))
+        connection.execute(text('CREATE TABLE definition (id INTEGER PRIMARY KEY, definition VARCHAR, example VARCHAR, synonyms TEXT, antonyms TEXT, meaning_id INTEGER)'))
+        connection.execute(text("INSERT INTO word VALUES (1, 'read', '/riːd/', NULL), (2, 'reed', '/riːd/', NULL)"))
+        connection.execute(text("INSERT INTO phonetic VALUES (1, '/riːd/', NULL), (2, '/riːd/', NULL)"))
+        connection.execute(text('INSERT INTO word_phonetic_association VALUES (1, 1), (2, 2)'))
+
+    upgrade(engine)
+
+    with engine.connect() as connection:
+        assert connection.execute(text('SELECT id FROM phonetic')).scalars().all() == [1]
+        assert connection.execute(text('SELECT phonetic_id FROM word_phonetic_association')).scalars().all() == [1, 1]
+    inspector = inspect(engine)
+    indexes = {index['name']: index for table in ('phonetic', 'meaning', 'definition', 'word_phonetic_association')
+               for index in inspector.get_indexes(table)}
+    assert indexes['ix_phonetic_phonetic']['unique']
+    assert {'ix_meaning_word_id', 'ix_definition_meaning_id',
+            'ix_word_phonetic_association_word_id', 'ix_word_phonetic_association_phonetic_id'} <= set(indexes)
+
+
+def test_upgrade_merges_phonetics_linked_twice():
+    """
+    GIVEN a word linked to two copies of the same phonetic
+    WHEN upgrade is run
+    THEN check the word is linked once to the merged phonetic and its payload is cleared
+    """
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE word (id INTEGER PRIMARY KEY, word VARCHAR(45) UNIQUE, phonetic VARCHAR, payload TEXT)'))
+        connection.execute(text('CREATE TABLE phonetic (id INTEGER PRIMARY KEY, phonetic VARCHAR, audio_url VARCHAR)'))
+        connection.execute(text('CREATE TABLE word_phonetic_association (word_id INTEGER, phonetic_id INTEGER)'))
+        connection.execute(text("INSERT INTO word VALUES (1, 'read', '/riːd/', '{}'), (2, 'lead', '/liːd/', '{}')"))
+        connection.execute(text("INSERT INTO phonetic VALUES (1, '/riːd/', NULL), (2, '/riːd/', NULL), (3, '/liːd/', NULL)"))
+        connection.execute(text('INSERT INTO word_phonetic_association VALUES (1, 1), (1, 2), (2, 3)'))
+
+    upgrade(engine)
+
+    with engine.connect() as connection:
+        links = connection.execute(text('SELECT word_id, phonetic_id FROM word_phonetic_association ORDER BY word_id')).all()
+        assert [tuple(link) for link in links] == [(1, 1), (2, 3)]
+        payloads = connection.execute(text('SELECT payload FROM word ORDER BY id')).scalars().all()
+        assert payloads == [None, '{}']
+
+
+def test_upgrade_indexes_stored_definitions():
+    """
+    GIVEN a database created before the full-text index existed, with a definition stored
+    WHEN upgrade is run
+    THEN check the index is created, filled with the stored definition and kept in sync afterwards
+    """
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE word (id INTEGER PRIMARY KEY, word VARCHAR(45) UNIQUE, phonetic VARCHAR, payload TEXT)'))
+        connection.execute(text('CREATE TABLE definition (id INTEGER PRIMARY KEY, definition VARCHAR, example VARCHAR, synonyms TEXT, antonyms TEXT, meaning_id INTEGER)'))
+        connection.execute(text("INSERT INTO definition (id, definition, example) VALUES (1, 'A body of water', NULL)"))
+
+    upgrade(engine)
+    upgrade(engine)
+
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO definition (id, definition, example) VALUES (2, 'Salt water', 'The sea')"))
+        match = "SELECT rowid FROM definition_fts WHERE definition_fts MATCH :query ORDER BY rowid"
+        assert connection.execute(text(match), {"query": "water"}).scalars().all() == [1, 2]
+        assert connection.execute(text(match), {"query": "sea"}).scalars().all() == [2]
+
+
+def test_upgrade_backfills_relations():
+    """
+    GIVEN a database created before the word_relation table existed, with synonyms stored as JSON lists
+    WHEN the table is created and upgrade is run
+    THEN check every listed synonym and antonym is indexed once
+    """
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE word (id INTEGER PRIMARY KEY, word VARCHAR(45) UNIQUE, phonetic VARCHAR, payload TEXT)'))
+        connection.execute(text('CREATE TABLE meaning (id INTEGER PRIMARY KEY, "partOfSpeech" VARCHAR(30), synonyms TEXT, antonyms TEXT, word_id INTEGER)'))
+        connection.execute(text('CREATE TABLE definition (id INTEGER PRIMARY KEY, definition VARCHAR, example VARCHAR, synonyms TEXT, antonyms TEXT, meaning_id INTEGER)'))
+        connection.execute(text("INSERT INTO word VALUES (1, 'happy', '', NULL), (2, 'sad', '', NULL)"))
+        connection.execute(text("""INSERT INTO meaning VALUES (1, 'adjective', '["glad", "joyful"]', '["sad"]', 1), (2, 'adjective', '[]', NULL, 2)"""))
+        connection.execute(text("""INSERT INTO definition VALUES (1, 'Feeling joy.', NULL, '["glad", "cheerful"]', '[]', 1)"""))
+    db.metadata.tables['word_relation'].create(engine)
+
+    upgrade(engine)
+    upgrade(engine)
+
+    with engine.connect() as connection:
+        rows = connection.execute(text('SELECT word_id, related, kind FROM word_relation ORDER BY related')).all()
+    assert [tuple(row) for row in rows] == [
+        (1, 'cheerful', 'synonym'), (1, 'glad', 'synonym'), (1, 'joyful', 'synonym'), (1, 'sad', 'antonym'),
+    ]
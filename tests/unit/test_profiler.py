@@ -0,0 +1,75 @@
+import eventlet
+import os
+import pstats
+import time
+from src.util.profiler import RequestProfiler
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def profiler_in(directory, rate=1.0, keep=50):
+    profiler = RequestProfiler()
+    profiler.rate, profiler.directory, profiler.keep = rate, str(directory), keep
+    return profiler
+
+
+def test_profile_written_and_rotated(tmp_path):
+    """
+    GIVEN a profiler sampling every event and keeping 2 profiles
+    WHEN 3 events are profiled
+    THEN check the newest 2 are kept and hold the stats of the profiled code
+    """
+    profiler = profiler_in(tmp_path, keep=2)
+    for name in ["one", "two", "three"]:
+        with profiler.profile("socket", name):
+            busy(0.01)
+        time.sleep(0.01)
+    profiles = profiler.list()
+    assert [p["name"].split("-")[2] for p in profiles] == ["three", "two"]
+    assert sorted(os.listdir(tmp_path)) == sorted(p["name"] for p in profiles)
+    stats = pstats.Stats(str(tmp_path / profiles[0]["name"]))
+    assert any(function == "busy" for _, _, function in stats.stats)
+
+
+def test_profile_disabled_and_fast_events(tmp_path):
+    """
+    GIVEN a disabled profiler and one only writing events slower than 50ms
+    WHEN events are run through them
+    THEN check nothing is written
+    """
+    with profiler_in(tmp_path, rate=0).profile("socket", "search"):
+        busy(0.01)
+    profiler = profiler_in(tmp_path)
+    profiler.min_seconds = 0.05
+    with profiler.profile("socket", "search"):
+        busy(0.01)
+    assert profiler.list() == []
+
+
+def test_profile_only_sampled_greenlet(tmp_path):
+    """
+    GIVEN two events running concurrently in greenlets
+    WHEN both are sampled
+    THEN check a single profile is written and it leaves out the work of the other greenlet
+    """
+    profiler = profiler_in(tmp_path)
+
+    def sampled():
+        with profiler.profile("socket", "sampled"):
+            eventlet.sleep(0.05)  # the other greenlet runs while this one waits
+
+    def other():
+        with profiler.profile("socket", "other"):
+            busy(0.02)
+
+    threads = [eventlet.spawn(sampled), eventlet.spawn(other)]
+    for thread in threads:
+        thread.wait()
+    profiles = profiler.list()
+    assert len(profiles) == 1 and "sampled" in profiles[0]["name"]
+    stats = pstats.Stats(str(tmp_path / profiles[0]["name"]))
+    assert not any(function == "busy" for _, _, function in stats.stats)
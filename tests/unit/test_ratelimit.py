@@ -0,0 +1,36 @@
+from src.util.ratelimit import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_bucket_allows_burst_then_limits():
+    """
+    GIVEN a token bucket of 2 per second with a burst of 3
+    WHEN tokens are taken without waiting
+    THEN check the burst is allowed and the next token needs half a second
+    """
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock, sleep=clock.sleep)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    assert bucket.acquire() == 0.5
+    clock.now += 10
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_bucket_disabled():
+    """
+    GIVEN a token bucket with a rate of 0
+    WHEN many tokens are taken
+    THEN check none of them wait
+    """
+    bucket = TokenBucket(rate=0)
+    assert all(bucket.try_acquire() for _ in range(100))
@@ -0,0 +1,53 @@
+import json
+import pytest
+from src.util.snapshot import WordSnapshot, write_snapshot
+
+
+def payload(word):
+    return json.dumps({"word": word, "meanings": []}, ensure_ascii=False).encode("utf-8")
+
+
+def test_snapshot_round_trip(tmp_path):
+    """
+    GIVEN words written to a snapshot in no particular order
+    WHEN the snapshot is memory-mapped
+    THEN check every word is found by binary search and missing words are not
+    """
+    path = tmp_path / "words.snap"
+    words = ["zebra", "apple", "Bank", "naïve", "mango", "a"]
+    assert write_snapshot(str(path), ((word, payload(word)) for word in words)) == len(words)
+
+    snapshot = WordSnapshot()
+    snapshot.open(str(path))
+    try:
+        assert len(snapshot) == len(words)
+        for word in words:
+            assert snapshot.get(word) == {"word": word, "meanings": []}
+        assert isinstance(snapshot.raw("apple"), memoryview)
+        for missing in ["", "bank", "aa", "zzz", "0"]:
+            assert snapshot.get(missing) is None
+        assert snapshot.lookup(["bank", "Bank"])["word"] == "Bank"
+    finally:
+        snapshot.close()
+    assert not snapshot.enabled
+    assert snapshot.get("apple") is None
+
+
+def test_snapshot_empty_and_invalid(tmp_path):
+    """
+    GIVEN an empty snapshot and a file that is not a snapshot
+    WHEN they are opened
+    THEN check the empty one has no words and the other one is rejected
+    """
+    path = tmp_path / "empty.snap"
+    write_snapshot(str(path), [])
+    snapshot = WordSnapshot()
+    snapshot.open(str(path))
+    assert len(snapshot) == 0 and snapshot.get("apple") is None
+    snapshot.close()
+
+    invalid = tmp_path / "invalid.snap"
+    invalid.write_bytes(b"not a snapshot at all")
+    with pytest.raises(ValueError):
+        snapshot.open(str(invalid))
+    assert not snapshot.enabled
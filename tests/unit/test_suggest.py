@@ -0,0 +1,53 @@
+from src.util.suggest import PrefixIndex
+
+
+def test_suggest_completes_prefix():
+    """
+    GIVEN an index loaded with words in no particular order
+    WHEN a prefix is completed
+    THEN check the completions are the indexed words starting with it, alphabetical and limited
+    """
+    index = PrefixIndex()
+    index.load(["dog", "door", "English", "do", "doghouse", "cat", "dog"])
+    assert len(index) == 6
+    assert index.suggest("do") == ["do", "dog", "doghouse", "door"]
+    assert index.suggest("DOG ", limit=1) == ["dog"]
+    assert index.suggest("eng") == ["English"]
+    assert index.suggest("x") == [] and index.suggest("  ") == []
+    assert index.suggest("doorway") == []
+
+
+def test_suggest_add_and_bounds():
+    """
+    GIVEN an index limited to 3 words and 2 completions
+    WHEN words are added
+    THEN check new words are completed, duplicates are ignored and the index stops growing when full
+    """
+    index = PrefixIndex()
+    index.max_words, index.limit = 3, 2
+    index.load(["apple"])
+    index.add("apricot")
+    index.add("Apple")
+    index.add("avocado")
+    index.add("banana")
+    assert len(index) == 3
+    assert index.suggest("a", limit=10) == ["apple", "apricot"]
+    assert index.suggest("b") == []
+
+    before = index.memory_bytes
+    index.max_words = 4
+    index.add("banana")
+    assert index.memory_bytes > before
+
+
+def test_suggest_disabled():
+    """
+    GIVEN an index with SUGGEST_MAX_WORDS set to 0
+    WHEN words are loaded and added
+    THEN check nothing is indexed
+    """
+    index = PrefixIndex()
+    index.max_words = 0
+    index.load(["apple"])
+    index.add("apricot")
+    assert len(index) == 0 and index.suggest("a") == []
@@ -0,0 +1,60 @@
+from src.util.metrics import SOCKET_RESPONSE_BYTES
+from src.util.wire import encode_payload, observe_size
+
+
+PAYLOAD = {
+    "id": 1, "word": "hello", "phonetic": "", "phonetics": [{"id": 2, "phonetic": "/həˈloʊ/", "audio_url": None}],
+    "meanings": [{"id": 3, "partOfSpeech": "noun", "synonyms": None, "antonyms": [], "definitions": [
+        {"id": 4, "definition": "A greeting.", "example": None, "synonyms": None, "antonyms": None},
+        {"id": 5, "definition": "A call.", "example": "hello there", "synonyms": ["hi"], "antonyms": None},
+    ]}],
+    "related": {"synonyms": ["hi"], "antonyms": []},
+}
+
+
+def test_compact_payload():
+    """
+    GIVEN a stored word payload
+    WHEN it is encoded compact
+    THEN check ids, nulls and empty lists are dropped and everything else is kept
+    """
+    assert encode_payload(PAYLOAD, "full") is PAYLOAD
+    assert encode_payload(PAYLOAD, "unknown") is PAYLOAD
+    assert encode_payload(PAYLOAD, "compact") == {
+        "word": "hello", "phonetic": "", "phonetics": [{"phonetic": "/həˈloʊ/"}],
+        "meanings": [{"partOfSpeech": "noun", "definitions": [
+            {"definition": "A greeting."},
+            {"definition": "A call.", "example": "hello there", "synonyms": ["hi"]},
+        ]}],
+        "related": {"synonyms": ["hi"]},
+    }
+    assert PAYLOAD["id"] == 1  # the stored payload is not modified
+
+
+def test_columnar_payload():
+    """
+    GIVEN a stored word payload
+    WHEN it is encoded columnar
+    THEN check the definitions are aligned lists per field and the empty fields are left out
+    """
+    encoded = encode_payload(PAYLOAD, "columnar")
+    assert encoded["meanings"][0]["definitions"] == {
+        "definition": ["A greeting.", "A call."],
+        "example": [None, "hello there"],
+        "synonyms": [None, ["hi"]],
+    }
+
+
+def test_observe_size():
+    """
+    GIVEN a response
+    WHEN its size is observed with every response sampled
+    THEN check the plain and the deflated sizes are recorded and the deflated one is smaller
+    """
+    data = {"data": encode_payload(PAYLOAD, "full")}
+    plain = SOCKET_RESPONSE_BYTES.labels(event="test", format="full", encoding="identity")
+    deflated = SOCKET_RESPONSE_BYTES.labels(event="test", format="full", encoding="deflate")
+    before = plain._sum.get(), deflated._sum.get()
+    size = observe_size("test", "full", data, sample=1.0)
+    assert plain._sum.get() - before[0] == size
+    assert 0 < deflated._sum.get() - before[1] < size